@@ -0,0 +1,10 @@
+python example/deploy/offline_eval_batch.py \
+    --policy "model"\
+    --model_name "test_policy"\
+    --model_class "TestModel"\
+    --model_path "test/path/"\
+    --task_name "test"\
+    --data_path "save/test_robot/"\
+    --batch_size 16\
+    --num_workers 4\
+    --output "save/offline_eval/test_policy.hdf5"
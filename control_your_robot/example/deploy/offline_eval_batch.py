@@ -0,0 +1,353 @@
+"""
+Batched, multi-process variant of offline_eval.py.
+
+Frames are streamed lazily from each HDF5 episode instead of materializing the whole episode with
+hdf5_groups_to_dict + dict_to_list, several observations are evaluated per policy call, and episodes are
+spread across worker processes. Per-episode metrics and the predicted/recorded trajectories are written to
+a single columnar HDF5 results file (one dataset per column).
+
+input_transform / compare_transform / compute_similarity are shared with offline_eval.py, so edits made in
+"THE PLACE YOU COULD MODIFY" there apply here as well.
+
+Policies:
+    model     : policy/{model_name}/inference_model.py wrapper. Uses model.get_action_batch(img_arrs, states)
+                when the wrapper provides it, otherwise falls back to update_observation_window + get_action.
+    openpi    : openpi Policy created from --train_config_name and --model_path, queried with Policy.infer_batch.
+    websocket : remote openpi policy server at --host/--port, queried with WebsocketClientPolicy.infer_batch.
+"""
+import sys
+sys.path.append('./')
+
+import os
+import argparse
+import glob
+import json
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import h5py
+import numpy as np
+
+from utils.data_handler import debug_print
+from example.deploy.offline_eval import (
+    input_transform,
+    compare_transform,
+    compute_similarity,
+    get_class,
+    plot_trajectories_subplots,
+)
+
+# per worker process policy, set by _init_worker
+_WORKER = {}
+
+class LazyEpisode:
+    '''
+    按需读取HDF5 episode中的帧, 不会一次性把整个episode展开成逐帧的嵌套字典
+    低维数据(关节, 夹爪, 时间戳等)在打开时整体读入, 图像等大数据只在需要时按帧读取
+    输入:
+    hdf5_path: episode路径
+    '''
+    def __init__(self, hdf5_path):
+        self.file = h5py.File(hdf5_path, "r")
+        self.low_dim = {}
+        self.lazy = {}
+
+        for group_name, group in self.file.items():
+            if not isinstance(group, h5py.Group):
+                continue
+            for key, dataset in group.items():
+                if not isinstance(dataset, h5py.Dataset):
+                    continue
+                if dataset.ndim >= 3 or dataset.dtype.kind in ("S", "O"):
+                    self.lazy.setdefault(group_name, {})[key] = dataset
+                else:
+                    self.low_dim.setdefault(group_name, {})[key] = dataset[()]
+
+        lengths = [v.shape[0] for g in (self.low_dim, self.lazy) for items in g.values() for v in items.values()]
+        if len(lengths) == 0:
+            raise ValueError(f"No dataset found in {hdf5_path}")
+        self.length = min(lengths)
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def low_dim_frames(self, start, end):
+        return [
+            {group: {key: value[i] for key, value in items.items()} for group, items in self.low_dim.items()}
+            for i in range(start, end)
+        ]
+
+    def frames(self, indices):
+        '''
+        读取一组等间隔帧, 每个大数据集只做一次切片读取
+        '''
+        step = indices[1] - indices[0] if len(indices) > 1 else 1
+        selection = slice(indices[0], indices[-1] + 1, step)
+
+        frames = [{} for _ in indices]
+        for group, items in self.low_dim.items():
+            for key, value in items.items():
+                for frame, v in zip(frames, value[selection]):
+                    frame.setdefault(group, {})[key] = v
+        for group, items in self.lazy.items():
+            for key, dataset in items.items():
+                for frame, v in zip(frames, dataset[selection]):
+                    frame.setdefault(group, {})[key] = v
+        return frames
+
+def load_instruction(task_name):
+    json_path = os.path.join("task_instructions", f"{task_name}.json")
+    with open(json_path, 'r') as f_instr:
+        instruction_dict = json.load(f_instr)
+    return np.random.choice(instruction_dict['instructions'])
+
+class ModelBatchPolicy:
+    '''
+    包装 policy/*/inference_model.py 中的模型, 统一成批量接口
+    '''
+    def __init__(self, model):
+        self.model = model
+
+    def infer_batch(self, img_arrs, states):
+        if hasattr(self.model, "get_action_batch"):
+            return list(self.model.get_action_batch(img_arrs, states))
+
+        actions = []
+        for img_arr, state in zip(img_arrs, states):
+            self.model.update_observation_window(img_arr, state)
+            actions.append(self.model.get_action())
+        return actions
+
+class OpenpiBatchPolicy:
+    '''
+    包装 openpi 的 Policy / WebsocketClientPolicy, 构造与 PI0_DUAL 相同的观测并批量推理
+    '''
+    def __init__(self, policy, instruction):
+        self.policy = policy
+        self.instruction = instruction
+
+    def infer_batch(self, img_arrs, states):
+        obs_batch = []
+        for img_arr, state in zip(img_arrs, states):
+            img_front, img_right, img_left = img_arr[0], img_arr[1], img_arr[2]
+            obs_batch.append({
+                "state": state,
+                "images": {
+                    "cam_high": np.transpose(img_front, (2, 0, 1)),
+                    "cam_left_wrist": np.transpose(img_left, (2, 0, 1)),
+                    "cam_right_wrist": np.transpose(img_right, (2, 0, 1)),
+                },
+                "prompt": self.instruction,
+            })
+        return [result["actions"] for result in self.policy.infer_batch(obs_batch)]
+
+def build_policy(args):
+    if args["policy"] == "model":
+        model_class = get_class(f"policy.{args['model_name']}.inference_model", args["model_class"])
+        return ModelBatchPolicy(model_class(args["model_path"], args["task_name"]))
+
+    instruction = load_instruction(args["task_name"])
+    if args["policy"] == "openpi":
+        from openpi.policies import policy_config as _policy_config
+        from openpi.training import config as _config
+
+        config = _config.get_config(args["train_config_name"])
+        policy = _policy_config.create_trained_policy(config, args["model_path"])
+    elif args["policy"] == "websocket":
+        from openpi_client import websocket_client_policy
+
+        policy = websocket_client_policy.WebsocketClientPolicy(host=args["host"], port=args["port"])
+    else:
+        raise ValueError(f"policy type is not allow: {args['policy']}")
+    return OpenpiBatchPolicy(policy, instruction)
+
+def _init_worker(args):
+    os.environ["INFO_LEVEL"] = args["info_level"]
+    _WORKER["args"] = args
+    _WORKER["policy"] = build_policy(args)
+
+def eval_episode(episode_path):
+    args = _WORKER["args"]
+    policy = _WORKER["policy"]
+    chunk_size, skip, batch_size = args["chunk_size"], args["skip_frame"], args["batch_size"]
+
+    action_chunk_preds, action_chunk_reals, time_step_chunks, similaritys = [], [], [], []
+    infer_time = 0.
+
+    with LazyEpisode(episode_path) as episode:
+        starts = list(range(0, len(episode), skip))
+        for b in range(0, len(starts), batch_size):
+            batch_starts = starts[b:b + batch_size]
+            inputs = [input_transform((frame, frame)) for frame in episode.frames(batch_starts)]
+            img_arrs = [img_arr for img_arr, _ in inputs]
+            states = [state for _, state in inputs]
+
+            start_time = time.monotonic()
+            preds = policy.infer_batch(img_arrs, states)
+            infer_time += time.monotonic() - start_time
+
+            for start, action_chunk_pred in zip(batch_starts, preds):
+                end = min(len(episode), start + chunk_size)
+                chunk = episode.low_dim_frames(start, end)
+                action_chunk_real = compare_transform((chunk, chunk))
+                action_chunk_pred = np.asarray(action_chunk_pred)
+                steps = min(action_chunk_real.shape[0], action_chunk_pred.shape[0])
+                action_chunk_pred, action_chunk_real = action_chunk_pred[:steps], action_chunk_real[:steps]
+
+                similaritys.append(compute_similarity(action_chunk_pred, action_chunk_real))
+                action_chunk_preds.append(action_chunk_pred)
+                action_chunk_reals.append(action_chunk_real)
+                time_step_chunks.append((start, start + steps))
+
+    if args["draw"] and len(action_chunk_preds) > 0:
+        os.makedirs(args["draw_dir"], exist_ok=True)
+        pic_name = os.path.basename(episode_path).split(".")[0] + ".png"
+        plot_trajectories_subplots(action_chunk_preds, action_chunk_reals, time_step_chunks,
+                                   os.path.join(args["draw_dir"], pic_name))
+
+    pred = np.concatenate(action_chunk_preds, axis=0)
+    real = np.concatenate(action_chunk_reals, axis=0)
+    diff = pred - real
+    return {
+        "episode": episode_path,
+        "frame_index": np.concatenate([np.arange(a, b) for a, b in time_step_chunks]),
+        "pred": pred,
+        "real": real,
+        "chunk_bounds": np.array(time_step_chunks, dtype=np.int64),
+        "chunk_similarity": np.array(similaritys, dtype=np.float64),
+        "metrics": {
+            "num_chunks": len(similaritys),
+            "mean_similarity": float(np.mean(similaritys)),
+            "mse": float(np.mean(diff ** 2)),
+            "mae": float(np.mean(np.abs(diff))),
+            "max_abs_err": float(np.max(np.abs(diff))),
+            "infer_ms_per_obs": infer_time * 1000 / len(similaritys),
+        },
+    }
+
+def write_results(results, output_path, args):
+    '''
+    以列存储的方式保存结果: 每个指标/轨迹字段是一个数据集, 轨迹按 episode_index 拼接
+    '''
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    results = sorted(results, key=lambda r: r["episode"])
+
+    with h5py.File(output_path, "w") as f:
+        for key in ("policy", "model_name", "model_class", "model_path", "train_config_name", "task_name"):
+            if args.get(key) is not None:
+                f.attrs[key] = str(args[key])
+        f.attrs["chunk_size"] = args["chunk_size"]
+        f.attrs["skip_frame"] = args["skip_frame"]
+
+        episodes = f.create_group("episodes")
+        episodes.create_dataset("name", data=np.array([r["episode"] for r in results], dtype="S"))
+        for metric in results[0]["metrics"].keys():
+            episodes.create_dataset(metric, data=np.array([r["metrics"][metric] for r in results]))
+
+        chunks = f.create_group("chunks")
+        chunks.create_dataset("episode_index", data=np.concatenate(
+            [np.full(len(r["chunk_similarity"]), i, dtype=np.int64) for i, r in enumerate(results)]))
+        chunks.create_dataset("bounds", data=np.concatenate([r["chunk_bounds"] for r in results]))
+        chunks.create_dataset("similarity", data=np.concatenate([r["chunk_similarity"] for r in results]))
+
+        trajectories = f.create_group("trajectories")
+        trajectories.create_dataset("episode_index", data=np.concatenate(
+            [np.full(len(r["frame_index"]), i, dtype=np.int64) for i, r in enumerate(results)]))
+        for key in ("frame_index", "pred", "real"):
+            trajectories.create_dataset(key, data=np.concatenate([r[key] for r in results]),
+                                        compression="gzip")
+
+    debug_print("offline_eval", f"write results of {len(results)} episodes to {output_path}", "INFO")
+
+def run(args, episodes):
+    results = []
+    start_time = time.monotonic()
+
+    if args["num_workers"] <= 0:
+        _init_worker(args)
+        for episode in episodes:
+            results.append(eval_episode(episode))
+            debug_print("offline_eval", f"{episode}: {results[-1]['metrics']}", "INFO")
+    else:
+        # spawn: every worker owns its model / connection, CUDA can not be forked
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args["num_workers"], mp_context=ctx,
+                                 initializer=_init_worker, initargs=(args,)) as executor:
+            futures = {executor.submit(eval_episode, episode): episode for episode in episodes}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    debug_print("offline_eval", f"{futures[future]} failed: {e}", "ERROR")
+                    continue
+                debug_print("offline_eval", f"{futures[future]}: {results[-1]['metrics']}", "INFO")
+
+    if len(results) == 0:
+        raise RuntimeError("no episode was evaluated successfully")
+
+    debug_print("offline_eval", f"evaluated {len(results)} episodes in {time.monotonic() - start_time:.1f}s, "
+                f"mean similarity {np.mean([r['metrics']['mean_similarity'] for r in results]):.4f}, "
+                f"mean mse {np.mean([r['metrics']['mse'] for r in results]):.6f}", "INFO")
+    write_results(results, args["output"], args)
+    return results
+
+def init():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--policy", type=str, default="model", choices=["model", "openpi", "websocket"],
+                        help="model: policy/*/inference_model.py, openpi: openpi Policy, websocket: openpi policy server")
+    parser.add_argument("--model_name", type=str, required=False, help="Name of the policy folder, e.g. test_policy")
+    parser.add_argument("--model_class", type=str, required=False, help="Name of the model class")
+    parser.add_argument("--model_path", type=str, required=False, help="model path, e.g., policy/RDT/checkpoints/checkpoint-10000")
+    parser.add_argument("--train_config_name", type=str, required=False, help="openpi train config name, used by --policy openpi")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="policy server host, used by --policy websocket")
+    parser.add_argument("--port", type=int, default=8000, help="policy server port, used by --policy websocket")
+    parser.add_argument("--task_name", type=str, required=True, help="task name, read intructions from task_instuctions/{task_name}.json")
+    parser.add_argument("--data_path", type=str, required=True, help="the data you want to eval")
+    parser.add_argument("--episode_num", type=int, default=-1, help="how many episode you want to eval, -1 for all")
+    parser.add_argument("--chunk_size", type=int, default=3, help="compared action chunk length")
+    parser.add_argument("--skip_frame", type=int, default=20, help="stride between evaluated frames")
+    parser.add_argument("--batch_size", type=int, default=16, help="observations per policy call")
+    parser.add_argument("--num_workers", type=int, default=1, help="worker processes, 0 runs in the main process")
+    parser.add_argument("--output", type=str, default="save/offline_eval/results.hdf5", help="columnar results file")
+    parser.add_argument("--draw", action="store_true", help="also save a trajectory figure per episode")
+    parser.add_argument("--draw_dir", type=str, default="save/picture/test/")
+
+    args = vars(parser.parse_args())
+    args["info_level"] = os.environ.get("INFO_LEVEL", "INFO")
+
+    if args["policy"] == "model" and (args["model_name"] is None or args["model_class"] is None):
+        parser.error("--policy model requires --model_name and --model_class")
+    if args["policy"] == "openpi" and (args["train_config_name"] is None or args["model_path"] is None):
+        parser.error("--policy openpi requires --train_config_name and --model_path")
+
+    data_path = args["data_path"]
+    if os.path.isfile(data_path):
+        return args, [data_path]
+
+    all_files = sorted(glob.glob(os.path.join(data_path, "*.hdf5")))
+    episode_num = args["episode_num"]
+    if episode_num < 0:
+        return args, all_files
+    if episode_num > len(all_files):
+        raise IndexError(f"episode_num > data_num : {episode_num} > {len(all_files)}")
+
+    # 随机选取
+    return args, random.sample(all_files, episode_num)
+
+if __name__ == "__main__":
+    os.environ["INFO_LEVEL"] = "INFO" # DEBUG , INFO, ERROR
+
+    args, episodes = init()
+    run(args, episodes)
@@ -0,0 +1,96 @@
+from typing import Dict, Optional, Tuple
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+class DeviceObsHistory:
+    """
+    Keeps the last n_steps observations on the policy device.
+
+    rgb observations are given as uint8 (H, W, C) frames, straight from the camera.
+    Each frame is uploaded once, through a pinned staging buffer, into a preallocated
+    uint8 ring buffer. Conversion to (C, H, W) float in [0, 1] and resizing to the
+    shape the policy expects happen on the device when the history is read.
+    Other observations are stored in the policy dtype.
+
+    Like DPRunner.stack_last_n_obs, the oldest frame is repeated while fewer than
+    n_steps observations have been pushed.
+    """
+
+    def __init__(
+        self,
+        n_steps: int,
+        device: torch.device,
+        dtype: torch.dtype = torch.float32,
+        rgb_shapes: Optional[Dict[str, Tuple[int, int, int]]] = None,
+    ):
+        """
+        rgb_shapes: (C, H, W) expected by the policy for each rgb key, a negative
+            H or W means the frame is passed at its own resolution.
+        """
+        self.n_steps = n_steps
+        self.device = torch.device(device)
+        self.dtype = dtype
+        self.rgb_shapes = dict(rgb_shapes or {})
+        self.pin_memory = self.device.type == "cuda"
+        self.buffers = dict()
+        self.staging = dict()
+        self.upload_events = dict()
+        self.count = 0
+
+    def reset(self):
+        # buffers are kept, they are overwritten by the next observations
+        self.count = 0
+
+    def _is_raw_rgb(self, key, value):
+        return key in self.rgb_shapes and value.dtype == np.uint8 and value.shape[-1] == self.rgb_shapes[key][0]
+
+    def _allocate(self, key, value):
+        if self._is_raw_rgb(key, value):
+            self.buffers[key] = torch.empty((self.n_steps, ) + value.shape, dtype=torch.uint8, device=self.device)
+            if self.pin_memory:
+                self.staging[key] = torch.empty(value.shape, dtype=torch.uint8, pin_memory=True)
+                self.upload_events[key] = None
+        else:
+            self.buffers[key] = torch.empty((self.n_steps, ) + value.shape, dtype=self.dtype, device=self.device)
+
+    def push(self, obs: Dict[str, np.ndarray]):
+        slot = self.count % self.n_steps
+        for key, value in obs.items():
+            value = np.asarray(value)
+            if key not in self.buffers or self.buffers[key].shape[1:] != value.shape:
+                self._allocate(key, value)
+            buffer = self.buffers[key]
+            if key in self.staging:
+                # the previous upload must have left the staging buffer before it is reused
+                if self.upload_events[key] is not None:
+                    self.upload_events[key].synchronize()
+                staging = self.staging[key]
+                staging.numpy()[...] = value
+                buffer[slot].copy_(staging, non_blocking=True)
+                event = torch.cuda.Event()
+                event.record(torch.cuda.current_stream(self.device))
+                self.upload_events[key] = event
+            else:
+                buffer[slot].copy_(torch.from_numpy(np.ascontiguousarray(value)))
+        self.count += 1
+
+    def get(self) -> Dict[str, torch.Tensor]:
+        """
+        Returns the stacked history of every key as (1, n_steps, ...) tensors.
+        """
+        assert self.count > 0, "no observation is recorded, please update obs first"
+        order = [max(self.count - self.n_steps + i, 0) % self.n_steps for i in range(self.n_steps)]
+        index = torch.tensor(order, device=self.device)
+        result = dict()
+        for key, buffer in self.buffers.items():
+            value = buffer.index_select(0, index)
+            if buffer.dtype == torch.uint8:
+                # (T, H, W, C) uint8 -> (T, C, H, W) in [0, 1]
+                value = value.permute(0, 3, 1, 2).to(dtype=self.dtype).div_(255)
+                _, h, w = self.rgb_shapes[key]
+                if h > 0 and w > 0 and value.shape[-2:] != (h, w):
+                    value = F.interpolate(value, size=(h, w), mode="bilinear", align_corners=False, antialias=True)
+            result[key] = value.unsqueeze(0)
+        return result
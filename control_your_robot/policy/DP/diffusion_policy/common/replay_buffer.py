@@ -94,6 +94,8 @@ class ReplayBuffer:
         for key, value in root["data"].items():
             assert value.shape[0] == root["meta"]["episode_ends"][-1]
         self.root = root
+        # set by create_from_mmap, the arrays are reopened instead of copied when pickled
+        self._mmap_path = None
 
     # ============= create constructors ===============
     @classmethod
@@ -143,6 +145,42 @@ class ReplayBuffer:
         group = zarr.open(os.path.expanduser(zarr_path), mode)
         return cls.create_from_group(group, **kwargs)
 
+    @staticmethod
+    def is_mmap_path(mmap_path):
+        """
+        Whether the path holds a dataset in the layout written by save_to_mmap.
+        """
+        return os.path.isfile(os.path.join(os.path.expanduser(mmap_path), "meta", "episode_ends.npy"))
+
+    @classmethod
+    def create_from_mmap(cls, mmap_path, keys=None):
+        """
+        Open a dataset written by save_to_mmap (see scripts/convert_zarr_to_mmap.py) without loading it.
+        Arrays are read-only np.memmap of uncompressed .npy files, pages are read on demand and
+        shared by all processes (e.g. DataLoader workers) through the page cache.
+        """
+        mmap_path = os.path.expanduser(mmap_path)
+        meta_dir = os.path.join(mmap_path, "meta")
+        data_dir = os.path.join(mmap_path, "data")
+        meta = dict()
+        for name in sorted(os.listdir(meta_dir)):
+            if name.endswith(".npy"):
+                meta[name[:-len(".npy")]] = np.load(os.path.join(meta_dir, name))
+        if keys is None:
+            keys = sorted(name[:-len(".npy")] for name in os.listdir(data_dir) if name.endswith(".npy"))
+        data = dict()
+        for key in keys:
+            data[key] = np.load(os.path.join(data_dir, key + ".npy"), mmap_mode="r")
+        buffer = cls(root={"meta": meta, "data": data})
+        buffer._mmap_path = mmap_path
+        return buffer
+
+    def __reduce_ex__(self, protocol):
+        if self._mmap_path is not None:
+            # don't copy the mapped data into the pickle (e.g. for spawned DataLoader workers)
+            return (self.create_from_mmap, (self._mmap_path, list(self.keys())))
+        return super().__reduce_ex__(protocol)
+
     # ============= copy constructors ===============
     @classmethod
     def copy_from_store(
@@ -315,6 +353,46 @@ class ReplayBuffer:
         store = zarr.DirectoryStore(os.path.expanduser(zarr_path))
         return self.save_to_store(store, chunks=chunks, compressors=compressors, if_exists=if_exists, **kwargs)
 
+    def save_to_mmap(self, mmap_path, keys=None, block_bytes=2**28):
+        """
+        Write the buffer uncompressed in the layout read by create_from_mmap:
+        <mmap_path>/data/<key>.npy and <mmap_path>/meta/<key>.npy.
+        Arrays are copied in blocks of about block_bytes, so zarr arrays are never fully in memory.
+        meta/episode_ends.npy is written last and marks the dataset as complete.
+        """
+        mmap_path = os.path.expanduser(mmap_path)
+        meta_dir = os.path.join(mmap_path, "meta")
+        data_dir = os.path.join(mmap_path, "data")
+        os.makedirs(meta_dir, exist_ok=True)
+        os.makedirs(data_dir, exist_ok=True)
+        episode_ends_path = os.path.join(meta_dir, "episode_ends.npy")
+        if os.path.exists(episode_ends_path):
+            os.remove(episode_ends_path)
+
+        if keys is None:
+            keys = list(self.keys())
+        for key in keys:
+            value = self.data[key]
+            row_bytes = max(int(np.prod(value.shape[1:])) * value.dtype.itemsize, 1)
+            block_length = max(int(block_bytes // row_bytes), 1)
+            if isinstance(value, zarr.Array):
+                # read whole chunks only
+                chunk_length = value.chunks[0]
+                block_length = max(block_length // chunk_length, 1) * chunk_length
+            tmp_path = os.path.join(data_dir, key + ".npy.tmp")
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=value.dtype, shape=value.shape)
+            for start in range(0, value.shape[0], block_length):
+                out[start:start + block_length] = value[start:start + block_length]
+            out.flush()
+            del out
+            os.replace(tmp_path, os.path.join(data_dir, key + ".npy"))
+
+        for key, value in self.meta.items():
+            if key != "episode_ends":
+                np.save(os.path.join(meta_dir, key + ".npy"), np.asarray(value[...]))
+        np.save(episode_ends_path, np.asarray(self.episode_ends[:]))
+        return mmap_path
+
     @staticmethod
     def resolve_compressor(compressor="default"):
         if compressor == "default":
@@ -31,11 +31,13 @@ class RobotImageDataset(BaseImageDataset):
     ):
 
         super().__init__()
-        self.replay_buffer = ReplayBuffer.copy_from_path(
-            zarr_path,
-            # keys=['head_camera', 'front_camera', 'left_camera', 'right_camera', 'state', 'action'],
-            keys=["head_camera", "state", "action"],
-        )
+        # keys=['head_camera', 'front_camera', 'left_camera', 'right_camera', 'state', 'action'],
+        keys = ["head_camera", "state", "action"]
+        if ReplayBuffer.is_mmap_path(zarr_path):
+            # converted with scripts/convert_zarr_to_mmap.py: the data stays on disk and is shared by all workers
+            self.replay_buffer = ReplayBuffer.create_from_mmap(zarr_path, keys=keys)
+        else:
+            self.replay_buffer = ReplayBuffer.copy_from_path(zarr_path, keys=keys)
 
         val_mask = get_val_mask(n_episodes=self.replay_buffer.n_episodes, val_ratio=val_ratio, seed=seed)
         train_mask = ~val_mask
@@ -11,6 +11,7 @@ import importlib
 import dill
 from argparse import ArgumentParser
 from diffusion_policy.common.pytorch_util import dict_apply
+from diffusion_policy.common.obs_history import DeviceObsHistory
 from diffusion_policy.policy.base_image_policy import BaseImagePolicy
 
 
@@ -37,6 +38,8 @@ class DPRunner:
         self.tqdm_interval_sec = tqdm_interval_sec
 
         self.obs = deque(maxlen=n_obs_steps + 1)
+        # created on the first get_action, when the policy device is known
+        self.obs_history = None
         self.env = None
 
     def stack_last_n_obs(self, all_obs, n_steps):
@@ -62,9 +65,26 @@ class DPRunner:
 
     def reset_obs(self):
         self.obs.clear()
+        if self.obs_history is not None:
+            self.obs_history.reset()
 
     def update_obs(self, current_obs):
         self.obs.append(current_obs)
+        if self.obs_history is not None:
+            self.obs_history.push(current_obs)
+
+    def get_obs_history(self, policy: BaseImagePolicy):
+        if self.obs_history is None:
+            obs_encoder = policy.obs_encoder
+            self.obs_history = DeviceObsHistory(
+                self.n_obs_steps,
+                device=policy.device,
+                dtype=policy.dtype,
+                rgb_shapes={key: obs_encoder.key_shape_map[key] for key in obs_encoder.rgb_keys},
+            )
+            for obs in self.obs:
+                self.obs_history.push(obs)
+        return self.obs_history
 
     def get_n_steps_obs(self):
         assert len(self.obs) > 0, "no observation is recorded, please update obs first"
@@ -76,23 +96,18 @@ class DPRunner:
         return result
 
     def get_action(self, policy: BaseImagePolicy, observaton=None):
-        device, dtype = policy.device, policy.dtype
         if observaton is not None:
-            self.obs.append(observaton)  # update
-        obs = self.get_n_steps_obs()
-
-        # create obs dict
-        np_obs_dict = dict(obs)
-        # device transfer
-        obs_dict = dict_apply(np_obs_dict, lambda x: torch.from_numpy(x).to(device=device))
+            self.update_obs(observaton)  # update
+        # stacked on the device, (1, n_obs_steps, ...) per key
+        obs_dict = self.get_obs_history(policy).get()
         # run policy
         with torch.no_grad():
             obs_dict_input = {}  # flush unused keys
-            obs_dict_input["head_cam"] = obs_dict["head_cam"].unsqueeze(0)
-            # obs_dict_input['front_cam'] = obs_dict['front_cam'].unsqueeze(0)
-            # obs_dict_input["left_cam"] = obs_dict["left_cam"].unsqueeze(0)
-            # obs_dict_input["right_cam"] = obs_dict["right_cam"].unsqueeze(0)
-            obs_dict_input["agent_pos"] = obs_dict["agent_pos"].unsqueeze(0)
+            obs_dict_input["head_cam"] = obs_dict["head_cam"]
+            # obs_dict_input['front_cam'] = obs_dict['front_cam']
+            # obs_dict_input["left_cam"] = obs_dict["left_cam"]
+            # obs_dict_input["right_cam"] = obs_dict["right_cam"]
+            obs_dict_input["agent_pos"] = obs_dict["agent_pos"]
 
             action_dict = policy.predict_action(obs_dict_input)
 
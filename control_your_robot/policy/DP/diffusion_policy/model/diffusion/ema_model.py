@@ -2,6 +2,9 @@ import copy
 import torch
 from torch.nn.modules.batchnorm import _BatchNorm
 
+# The multi-tensor kernels are private and only exist in newer torch versions (_foreach_copy_ since 2.1).
+_HAS_FOREACH = hasattr(torch, "_foreach_lerp_") and hasattr(torch, "_foreach_copy_")
+
 
 class EMAModel:
     """
@@ -42,6 +45,11 @@ class EMAModel:
         self.decay = 0.0
         self.optimization_step = 0
 
+        # Parameter groups for the foreach updates, see `_group_params`.
+        self._signature = None
+        self._averaged_groups = []
+        self._copied_groups = []
+
     def get_decay(self, optimization_step):
         """
         Compute the decay factor for the exponential moving average.
@@ -54,36 +62,50 @@ class EMAModel:
 
         return max(self.min_value, min(value, self.max_value))
 
-    @torch.no_grad()
-    def step(self, new_model):
-        self.decay = self.get_decay(self.optimization_step)
-
-        # old_all_dataptrs = set()
-        # for param in new_model.parameters():
-        #     data_ptr = param.data_ptr()
-        #     if data_ptr != 0:
-        #         old_all_dataptrs.add(data_ptr)
-
-        all_dataptrs = set()
+    def _group_params(self, new_model):
+        """
+        Pairs the parameters of `new_model` with those of the averaged model. Parameters of batchnorms and parameters
+        that do not require grad are copied, all others are averaged. The pairs are grouped by device and dtype so that
+        each group can be updated with a single multi-tensor (foreach) kernel.
+        """
+        averaged, copied = {}, {}
         for module, ema_module in zip(new_model.modules(), self.averaged_model.modules()):
             for param, ema_param in zip(module.parameters(recurse=False), ema_module.parameters(recurse=False)):
                 # iterative over immediate parameters only.
                 if isinstance(param, dict):
                     raise RuntimeError("Dict parameter not supported")
+                groups = copied if isinstance(module, _BatchNorm) or not param.requires_grad else averaged
+                ema_params, params = groups.setdefault((ema_param.device, ema_param.dtype, param.dtype), ([], []))
+                ema_params.append(ema_param)
+                params.append(param)
+        return list(averaged.values()), list(copied.values())
 
-                # data_ptr = param.data_ptr()
-                # if data_ptr != 0:
-                #     all_dataptrs.add(data_ptr)
+    @torch.no_grad()
+    def step(self, new_model):
+        self.decay = self.get_decay(self.optimization_step)
 
-                if isinstance(module, _BatchNorm):
-                    # skip batchnorms
-                    ema_param.copy_(param.to(dtype=ema_param.dtype).data)
-                elif not param.requires_grad:
-                    ema_param.copy_(param.to(dtype=ema_param.dtype).data)
-                else:
+        # The grouping only changes if parameters are frozen or unfrozen (e.g. `freeze_encoder`).
+        signature = (id(new_model), tuple(p.requires_grad for p in new_model.parameters()))
+        if self._signature != signature:
+            self._signature = signature
+            self._averaged_groups, self._copied_groups = self._group_params(new_model)
+
+        for ema_params, params in self._averaged_groups:
+            if params[0].dtype != ema_params[0].dtype:
+                params = [param.to(dtype=ema_params[0].dtype) for param in params]
+            # ema = decay * ema + (1 - decay) * param
+            if _HAS_FOREACH:
+                torch._foreach_lerp_(ema_params, params, 1 - self.decay)
+            else:
+                for ema_param, param in zip(ema_params, params):
                     ema_param.mul_(self.decay)
-                    ema_param.add_(param.data.to(dtype=ema_param.dtype), alpha=1 - self.decay)
+                    ema_param.add_(param.data, alpha=1 - self.decay)
+
+        for ema_params, params in self._copied_groups:
+            if _HAS_FOREACH:
+                torch._foreach_copy_(ema_params, params)
+            else:
+                for ema_param, param in zip(ema_params, params):
+                    ema_param.copy_(param.to(dtype=ema_param.dtype).data)
 
-        # verify that iterating over module and then parameters is identical to parameters recursively.
-        # assert old_all_dataptrs == all_dataptrs
         self.optimization_step += 1
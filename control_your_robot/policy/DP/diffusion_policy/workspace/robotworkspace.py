@@ -153,7 +153,13 @@ class RobotWorkspace(BaseWorkspace):
                     self.model.obs_encoder.eval()
                     self.model.obs_encoder.requires_grad_(False)
 
-                train_losses = list()
+                # losses are accumulated on the device and only copied to the host every `log_every` steps,
+                # since `.item()` waits for the GPU to finish the step.
+                log_every = cfg.training.get("log_every", 1)
+                epoch_loss_sum = torch.zeros((), device=device)
+                interval_loss_sum = torch.zeros((), device=device)
+                num_interval_steps = 0
+                num_train_steps = 0
                 with tqdm.tqdm(
                         train_dataloader,
                         desc=f"Training epoch {self.epoch}",
@@ -180,11 +186,12 @@ class RobotWorkspace(BaseWorkspace):
                             ema.step(self.model)
 
                         # logging
-                        raw_loss_cpu = raw_loss.item()
-                        tepoch.set_postfix(loss=raw_loss_cpu, refresh=False)
-                        train_losses.append(raw_loss_cpu)
+                        raw_loss = raw_loss.detach()
+                        epoch_loss_sum += raw_loss
+                        interval_loss_sum += raw_loss
+                        num_interval_steps += 1
+                        num_train_steps += 1
                         step_log = {
-                            "train_loss": raw_loss_cpu,
                             "global_step": self.global_step,
                             "epoch": self.epoch,
                             "lr": lr_scheduler.get_last_lr()[0],
@@ -192,8 +199,14 @@ class RobotWorkspace(BaseWorkspace):
 
                         is_last_batch = batch_idx == (len(train_dataloader) - 1)
                         if not is_last_batch:
-                            # log of last step is combined with validation and rollout
-                            json_logger.log(step_log)
+                            if num_interval_steps >= log_every:
+                                # train_loss is the average over the last `log_every` steps
+                                step_log["train_loss"] = interval_loss_sum.item() / num_interval_steps
+                                tepoch.set_postfix(loss=step_log["train_loss"], refresh=False)
+                                interval_loss_sum.zero_()
+                                num_interval_steps = 0
+                                # log of last step is combined with validation and rollout
+                                json_logger.log(step_log)
                             self.global_step += 1
 
                         if (cfg.training.max_train_steps
@@ -202,7 +215,7 @@ class RobotWorkspace(BaseWorkspace):
 
                 # at the end of each epoch
                 # replace train_loss with epoch average
-                train_loss = np.mean(train_losses)
+                train_loss = epoch_loss_sum.item() / max(num_train_steps, 1)
                 step_log["train_loss"] = train_loss
 
                 # ========= eval for this epoch ==========
@@ -235,7 +248,7 @@ class RobotWorkspace(BaseWorkspace):
                                         is not None) and batch_idx >= (cfg.training.max_val_steps - 1):
                                     break
                         if len(val_losses) > 0:
-                            val_loss = torch.mean(torch.tensor(val_losses)).item()
+                            val_loss = torch.stack(val_losses).mean().item()
                             # log epoch average validation loss
                             step_log["val_loss"] = val_loss
 
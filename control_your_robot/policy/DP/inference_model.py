@@ -33,9 +33,10 @@ class MYDP:
         head_cam = img_arr[0]
         # left_cam = img_arr[1]
         # right_cam = img_arr[2]
-        head_cam = np.moveaxis(head_cam, -1, 0) / 255.0
-        # left_cam = np.moveaxis(left_cam, -1, 0) / 255.0
-        # right_cam = np.moveaxis(right_cam, -1, 0) / 255.0
+        # 保持相机原始的uint8 (H, W, C)格式, 由DPRunner在GPU上转换为(C, H, W)并归一化
+        head_cam = np.asarray(head_cam, dtype=np.uint8)
+        # left_cam = np.asarray(left_cam, dtype=np.uint8)
+        # right_cam = np.asarray(right_cam, dtype=np.uint8)
         qpos = state
         self.observation_window =dict(
             head_cam=head_cam,
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import argparse
+import copy
+import time
+
+import torch
+from torch.nn.modules.batchnorm import _BatchNorm
+
+from diffusion_policy.model.diffusion.conditional_unet1d import ConditionalUnet1D
+from diffusion_policy.model.diffusion.ema_model import EMAModel
+
+'''
+    Compares the per-step time of EMAModel.step with the previous per-tensor update.
+    usage: python scripts/benchmark_ema.py --device cuda:0
+'''
+
+
+@torch.no_grad()
+def reference_step(ema: EMAModel, new_model):
+    # The previous implementation: one pair of kernels per parameter tensor.
+    ema.decay = ema.get_decay(ema.optimization_step)
+    for module, ema_module in zip(new_model.modules(), ema.averaged_model.modules()):
+        for param, ema_param in zip(module.parameters(recurse=False), ema_module.parameters(recurse=False)):
+            if isinstance(module, _BatchNorm) or not param.requires_grad:
+                ema_param.copy_(param.to(dtype=ema_param.dtype).data)
+            else:
+                ema_param.mul_(ema.decay)
+                ema_param.add_(param.data.to(dtype=ema_param.dtype), alpha=1 - ema.decay)
+    ema.optimization_step += 1
+
+
+def benchmark(step_fn, ema, model, device, num_steps):
+    for _ in range(10):
+        step_fn(ema, model)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        step_fn(ema, model)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    return (time.perf_counter() - start) / num_steps * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cuda:0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--num_steps", type=int, default=100)
+    parser.add_argument("--down_dims", type=int, nargs="+", default=[256, 512, 1024])
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    # Same UNet as robot_dp_14.yaml.
+    model = ConditionalUnet1D(
+        input_dim=14,
+        global_cond_dim=2 * 512,
+        diffusion_step_embed_dim=128,
+        down_dims=args.down_dims,
+        kernel_size=5,
+        n_groups=8,
+        cond_predict_scale=True,
+    ).to(device)
+    num_tensors = len(list(model.parameters()))
+    num_params = sum(p.numel() for p in model.parameters())
+    print(f"{num_tensors} parameter tensors, {num_params / 1e6:.1f}M parameters, device {device}")
+
+    reference_ema = EMAModel(copy.deepcopy(model))
+    foreach_ema = EMAModel(copy.deepcopy(model))
+    reference_ms = benchmark(reference_step, reference_ema, model, device, args.num_steps)
+    foreach_ms = benchmark(EMAModel.step, foreach_ema, model, device, args.num_steps)
+    print(f"per-tensor EMA step: {reference_ms:.3f} ms")
+    print(f"foreach EMA step:    {foreach_ms:.3f} ms ({reference_ms / foreach_ms:.1f}x)")
+
+    for ref, new in zip(reference_ema.averaged_model.parameters(), foreach_ema.averaged_model.parameters()):
+        torch.testing.assert_close(ref, new)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+import torch
+
+from diffusion_policy.common.obs_history import DeviceObsHistory
+
+'''
+    Compares the per-step observation preprocessing of DPRunner with the previous host-side path
+    (float64 normalization per frame, stacking on the host, copy of the stacked history to the device).
+    usage: python scripts/benchmark_obs_preprocess.py --device cuda:0
+'''
+
+
+def stack_last_n(all_obs, n_steps):
+    all_obs = list(all_obs)
+    start_idx = -min(n_steps, len(all_obs))
+    result = np.zeros((n_steps, ) + all_obs[-1].shape, dtype=all_obs[-1].dtype)
+    result[start_idx:] = np.array(all_obs[start_idx:])
+    if n_steps > len(all_obs):
+        result[:start_idx] = result[start_idx]
+    return result
+
+
+def reference_step(history, frame, state, n_steps, device):
+    # The previous implementation: MYDP.update_observation_window + DPRunner.get_action.
+    history.append(dict(head_cam=np.moveaxis(frame, -1, 0) / 255.0, agent_pos=state))
+    obs = {key: stack_last_n([o[key] for o in history], n_steps) for key in history[0]}
+    return {key: torch.from_numpy(value).to(device=device).unsqueeze(0) for key, value in obs.items()}
+
+
+def device_step(history, frame, state, n_steps, device):
+    history.push(dict(head_cam=frame, agent_pos=state))
+    return history.get()
+
+
+def benchmark(step_fn, history, frames, state, n_steps, device, num_steps):
+    for i in range(10):
+        step_fn(history, frames[i % len(frames)], state, n_steps, device)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    start = time.perf_counter()
+    for i in range(num_steps):
+        obs = step_fn(history, frames[i % len(frames)], state, n_steps, device)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    return (time.perf_counter() - start) / num_steps * 1000, obs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cuda:0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--num_steps", type=int, default=100)
+    parser.add_argument("--n_obs_steps", type=int, default=3)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--width", type=int, default=640)
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    frames = [np.random.randint(0, 256, size=(args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+    state = np.random.rand(14)
+    print(f"{args.width}x{args.height} head_cam, n_obs_steps {args.n_obs_steps}, device {device}")
+
+    reference_ms, reference_obs = benchmark(reference_step, deque(maxlen=args.n_obs_steps + 1), frames, state,
+                                            args.n_obs_steps, device, args.num_steps)
+    history = DeviceObsHistory(args.n_obs_steps, device, rgb_shapes={"head_cam": (3, -1, -1)})
+    device_ms, device_obs = benchmark(device_step, history, frames, state, args.n_obs_steps, device, args.num_steps)
+    print(f"host float64 preprocessing: {reference_ms:.3f} ms")
+    print(f"device uint8 history:       {device_ms:.3f} ms ({reference_ms / device_ms:.1f}x)")
+
+    for key in reference_obs:
+        torch.testing.assert_close(device_obs[key].double(), reference_obs[key], atol=1e-6, rtol=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import argparse
+import time
+
+import zarr
+
+from diffusion_policy.common.replay_buffer import ReplayBuffer
+
+'''
+    Converts the zarr output of process_data.py into the uncompressed memory-mapped layout.
+    RobotImageDataset opens such a directory without loading it into memory, pass it as zarr_path.
+    usage: python scripts/convert_zarr_to_mmap.py <zarr_path> <output_dir> [--keys head_camera state action]
+    example: python scripts/convert_zarr_to_mmap.py processed_data/test_data-100.zarr/ processed_data/test_data-100.mmap/
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a zarr dataset to the memory-mapped layout")
+    parser.add_argument("zarr_path", type=str)
+    parser.add_argument("output_dir", type=str)
+    parser.add_argument("--keys", type=str, nargs="+", default=None, help="data keys to convert, default: all")
+    args = parser.parse_args()
+
+    start = time.time()
+    replay_buffer = ReplayBuffer.create_from_group(zarr.open(os.path.expanduser(args.zarr_path), "r"))
+    print(f"Converting {replay_buffer.n_episodes} episodes, {replay_buffer.n_steps} steps")
+    replay_buffer.save_to_mmap(args.output_dir, keys=args.keys)
+
+    converted = ReplayBuffer.create_from_mmap(args.output_dir)
+    for key, value in converted.items():
+        print(f"{key}: {value.shape} {value.dtype}, {value.nbytes / 1e9:.2f} GB")
+    print(f"Done in {time.time() - start:.1f}s: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
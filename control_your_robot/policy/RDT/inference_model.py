@@ -27,7 +27,7 @@ from PIL import Image as PImage
 import cv2
 
 from policy.RDT.scripts.agilex_model import create_model
-from models.multimodal_encoder.t5_encoder import T5Embedder
+from models.multimodal_encoder.lang_embed_cache import LangEmbedCache
 global_path = parent_dir.parent
 
 class RDT:
@@ -70,16 +70,18 @@ class RDT:
         GPU = 0
         MODEL_PATH = os.path.join(self.global_path,"weights/RDT/t5-v1_1-xxl")
         CONFIG_PATH = os.path.join(self.global_path,"RDT/configs/base.yaml")
+        CACHE_DIR = os.path.join(self.global_path,"weights/RDT/lang_embed_cache")
         with open(CONFIG_PATH, "r") as fp:
             config = yaml.safe_load(fp)
         device = torch.device(f"cuda:{GPU}")
-        text_embedder = T5Embedder(
-            from_pretrained=MODEL_PATH, 
-            model_max_length=config["dataset"]["tokenizer_max_length"], 
+        # T5 is only loaded when an instruction is not in the cache,
+        # fill the cache in advance with scripts/build_lang_cache.py
+        self.lang_cache = LangEmbedCache(
+            cache_dir=CACHE_DIR,
+            encoder_path=MODEL_PATH,
             device=device,
-            use_offload_folder=None
+            model_max_length=config["dataset"]["tokenizer_max_length"],
         )
-        self.tokenizer, self.text_encoder = text_embedder.tokenizer, text_embedder.model
     
     # set language randomly
     def random_set_language(self):
@@ -102,15 +104,7 @@ class RDT:
             self.lang_embeddings = lang_dict["embeddings"]
             print("loading instruction from pre-embed path")
         else:
-            tokens = self.tokenizer(
-                language_instruction, return_tensors="pt",
-                padding="longest",
-                truncation=True
-            )["input_ids"].to(0)
-
-            tokens = tokens.view(1, -1)
-            with torch.no_grad():
-                pred = self.text_encoder(tokens).last_hidden_state.detach().cpu()
+            pred = self.lang_cache.get_or_encode(language_instruction, name=task_name)
             if save_dir != None:
                 save_path = os.path.join(save_dir,f"{task_name}.pt")
                 torch.save({
@@ -225,8 +219,8 @@ def inference_fn(config, policy,lang_embeddings,observation_window):
             observation_window[-1]['images'][config['camera_names'][2]]
         ]
 
-        images = [PImage.fromarray(arr) if arr is not None else None
-                  for arr in image_arrs]
+        # pass the arrays themselves, so that the frames of t-1 are recognized and not encoded again
+        images = image_arrs
 
         # get last qpos in shape [14, ]
         proprio = observation_window[-1]['qpos']
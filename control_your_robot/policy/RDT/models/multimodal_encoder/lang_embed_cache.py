@@ -0,0 +1,130 @@
+import hashlib
+import os
+import tempfile
+
+import torch
+
+
+class LangEmbedCache:
+    """A disk-backed cache of T5 instruction embeddings.
+
+    Every embedding is stored in its own file, named by the hash of the instruction text
+    and the identity of the encoder, so that caches filled by different machines or
+    scripts can simply be merged. The files use the same format as scripts/encode_lang.py:
+        {"name": ..., "instruction": ..., "embeddings": (1, L, D) tensor}
+
+    The text encoder is only loaded on the first cache miss.
+    """
+    def __init__(
+        self,
+        cache_dir,
+        encoder_path,
+        device="cuda",
+        model_max_length=120,
+        encoder_id=None,
+    ):
+        """
+        Args:
+            cache_dir: directory of the cached embeddings
+            encoder_path: name or path of the T5 encoder, loaded on a cache miss
+            device: device of the T5 encoder
+            model_max_length: max token length of the tokenizer
+            encoder_id: identity of the encoder in the cache keys, defaults to the
+                name of the encoder directory. Set it when the same weights are stored
+                under different names.
+        """
+        self.cache_dir = cache_dir
+        self.encoder_path = encoder_path
+        self.device = device
+        self.model_max_length = model_max_length
+        self.encoder_id = encoder_id or os.path.basename(os.path.normpath(encoder_path))
+        self.tokenizer = None
+        self.text_encoder = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, instruction):
+        content = f"{self.encoder_id}\n{self.model_max_length}\n{instruction}"
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def path(self, instruction):
+        return os.path.join(self.cache_dir, f"{self.key(instruction)}.pt")
+
+    def __contains__(self, instruction):
+        return os.path.isfile(self.path(instruction))
+
+    def get(self, instruction):
+        """Returns the cached embeddings (1, L, D) of the instruction, or None."""
+        path = self.path(instruction)
+        if not os.path.isfile(path):
+            return None
+        return torch.load(path, map_location="cpu")["embeddings"]
+
+    def put(self, instruction, embeddings, name=None):
+        # Write to a temporary file first, so that readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            torch.save({
+                    "name": name or self.encoder_id,
+                    "instruction": instruction,
+                    "embeddings": embeddings.detach().cpu(),
+                }, tmp_path
+            )
+            os.replace(tmp_path, self.path(instruction))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def encode(self, instructions, batch_size=16, name=None):
+        """
+        Returns the embeddings of all instructions, a list of (1, L_i, D) tensors.
+        Only the instructions that are not cached yet are encoded, in batches.
+        """
+        results = [self.get(instruction) for instruction in instructions]
+        missing = list(dict.fromkeys(
+            instruction for instruction, embeds in zip(instructions, results) if embeds is None))
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            for instruction, embeds in zip(batch, self._encode_batch(batch)):
+                self.put(instruction, embeds, name=name)
+        return [
+            embeds if embeds is not None else self.get(instruction)
+            for instruction, embeds in zip(instructions, results)
+        ]
+
+    def get_or_encode(self, instruction, name=None):
+        embeds = self.get(instruction)
+        if embeds is None:
+            embeds = self.encode([instruction], name=name)[0]
+        return embeds
+
+    def _load_encoder(self):
+        if self.text_encoder is None:
+            # Imported here so that a fully cached inference never needs transformers' T5
+            from models.multimodal_encoder.t5_encoder import T5Embedder
+            print(f"Loading the text encoder from {self.encoder_path}")
+            text_embedder = T5Embedder(
+                from_pretrained=self.encoder_path,
+                model_max_length=self.model_max_length,
+                device=self.device,
+                use_offload_folder=None
+            )
+            self.tokenizer, self.text_encoder = text_embedder.tokenizer, text_embedder.model
+
+    def _encode_batch(self, instructions):
+        self._load_encoder()
+        tokenized_res = self.tokenizer(
+            instructions, return_tensors="pt",
+            padding="longest",
+            truncation=True
+        )
+        tokens = tokenized_res["input_ids"].to(self.device)
+        attn_mask = tokenized_res["attention_mask"].to(self.device)
+        with torch.no_grad():
+            text_embeds = self.text_encoder(
+                input_ids=tokens,
+                attention_mask=attn_mask
+            )["last_hidden_state"].detach().cpu()
+        attn_mask = attn_mask.cpu().bool()
+        # Drop the padding, so that the embeddings match those of a single instruction
+        return [text_embeds[i][attn_mask[i]].unsqueeze(0) for i in range(len(instructions))]
@@ -99,14 +99,25 @@ class CrossAttention(nn.Module):
         self.proj = nn.Linear(dim, dim)
         self.proj_drop = nn.Dropout(proj_drop)
     
+    def compute_kv(self, c: torch.Tensor):
+        """
+        Project the condition tokens to keys and values, (B, num_heads, L, head_dim) each.
+        The result only depends on the condition and can be reused for several queries.
+        """
+        B, L, _ = c.shape
+        kv = self.kv(c).reshape(B, L, 2, self.num_heads, self.head_dim).permute(2, 0, 3, 1, 4)
+        k, v = kv.unbind(0)
+        return self.k_norm(k), v
+
     def forward(self, x: torch.Tensor, c: torch.Tensor, 
-                mask: torch.Tensor | None = None) -> torch.Tensor:
+                mask: torch.Tensor | None = None,
+                kv: tuple | None = None) -> torch.Tensor:
         B, N, C = x.shape
-        _, L, _ = c.shape
         q = self.q(x).reshape(B, N, self.num_heads, self.head_dim).permute(0, 2, 1, 3)
-        kv = self.kv(c).reshape(B, L, 2, self.num_heads, self.head_dim).permute(2, 0, 3, 1, 4)
-        k, v = kv.unbind(0)
-        q, k = self.q_norm(q), self.k_norm(k)
+        # kv: precomputed `compute_kv(c)`, c is not used then
+        k, v = kv if kv is not None else self.compute_kv(c)
+        L = k.shape[2]
+        q = self.q_norm(q)
 
         # Prepare attn mask (B, L) to mask the conditioion
         if mask is not None:
@@ -164,7 +175,7 @@ class RDTBlock(nn.Module):
             act_layer=approx_gelu, drop=0)
         self.norm3 = RmsNorm(hidden_size, eps=1e-6)
 
-    def forward(self, x, c, mask=None):
+    def forward(self, x, c, mask=None, kv=None):
         origin_x = x
         x = self.norm1(x)
         x = self.attn(x)
@@ -172,7 +183,7 @@ class RDTBlock(nn.Module):
         
         origin_x = x
         x = self.norm2(x)
-        x = self.cross_attn(x, c, mask)
+        x = self.cross_attn(x, c, mask, kv=kv)
         x = x + origin_x
                 
         origin_x = x
@@ -123,7 +123,25 @@ class RDT(nn.Module):
         # Move all the params to given data type:
         self.to(self.dtype)
 
-    def forward(self, x, freq, t, lang_c, img_c, lang_mask=None, img_mask=None):
+    def precompute_conditions(self, lang_c, img_c, lang_mask=None, img_mask=None):
+        """
+        Precompute the cross-attention keys and values of the condition tokens for all blocks.
+        They do not change between denoising steps, pass the result as `cond_cache` to `forward`.
+
+        lang_c: (B, L_lang, D), language condition tokens.
+        img_c: (B, L_img, D), image condition tokens.
+        lang_mask: (B, L_lang) or None, language condition mask (True for valid).
+        img_mask: (B, L_img) or None, image condition mask (True for valid).
+        """
+        lang_c = lang_c + self.lang_cond_pos_embed[:, :lang_c.shape[1]]
+        img_c = img_c + self.img_cond_pos_embed
+        conds = [lang_c, img_c]
+        return {
+            "kv": [block.cross_attn.compute_kv(conds[i%2]) for i, block in enumerate(self.blocks)],
+            "masks": [lang_mask, img_mask],
+        }
+
+    def forward(self, x, freq, t, lang_c, img_c, lang_mask=None, img_mask=None, cond_cache=None):
         """
         Forward pass of RDT.
         
@@ -137,6 +155,8 @@ class RDT(nn.Module):
             dimension D is assumed to be the same as the hidden size.
         lang_mask: (B, L_lang) or None, language condition mask (True for valid).
         img_mask: (B, L_img) or None, image condition mask (True for valid).
+        cond_cache: the result of `precompute_conditions`, or None. If given, lang_c, img_c
+            and the masks are not used.
         """
         t = self.t_embedder(t).unsqueeze(1)             # (B, 1, D) or (1, 1, D)
         freq = self.freq_embedder(freq).unsqueeze(1)    # (B, 1, D)
@@ -147,16 +167,21 @@ class RDT(nn.Module):
         
         # Add multimodal position embeddings
         x = x + self.x_pos_embed
-        # Note the lang is of variable length
-        lang_c = lang_c + self.lang_cond_pos_embed[:, :lang_c.shape[1]]
-        img_c = img_c + self.img_cond_pos_embed
+        if cond_cache is None:
+            # Note the lang is of variable length
+            lang_c = lang_c + self.lang_cond_pos_embed[:, :lang_c.shape[1]]
+            img_c = img_c + self.img_cond_pos_embed
+            conds = [lang_c, img_c]
+            masks = [lang_mask, img_mask]
+        else:
+            conds = [None, None]
+            masks = cond_cache["masks"]
 
         # Forward pass
-        conds = [lang_c, img_c]
-        masks = [lang_mask, img_mask]
         for i, block in enumerate(self.blocks):
             c, mask = conds[i%2], masks[i%2]
-            x = block(x, c, mask)                       # (B, T+1, D)
+            kv = cond_cache["kv"][i] if cond_cache is not None else None
+            x = block(x, c, mask, kv=kv)                # (B, T+1, D)
         # Inject the language condition at the final layer
         x = self.final_layer(x)                         # (B, T+1, out_channels)
 
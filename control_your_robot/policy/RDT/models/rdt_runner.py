@@ -70,7 +70,8 @@ class RDTRunner(
         )
 
         self.num_train_timesteps = noise_scheduler_config['num_train_timesteps']
-        self.num_inference_timesteps = noise_scheduler_config['num_inference_timesteps']
+        self.num_inference_timesteps = self.validate_num_inference_timesteps(
+            noise_scheduler_config['num_inference_timesteps'])
         self.prediction_type = noise_scheduler_config['prediction_type']
 
         self.pred_horizon = pred_horizon
@@ -102,6 +103,25 @@ class RDTRunner(
 
         return projector
     
+    def validate_num_inference_timesteps(self, num_inference_timesteps):
+        '''
+        Check a number of denoising steps for sampling. Fewer steps are faster but less
+        accurate, use scripts/eval_sampling_steps.py to compare them against the full schedule.
+        '''
+        if (isinstance(num_inference_timesteps, bool)
+                or not isinstance(num_inference_timesteps, int)
+                or not 1 <= num_inference_timesteps <= self.num_train_timesteps):
+            raise ValueError(
+                f"num_inference_timesteps must be an integer in [1, {self.num_train_timesteps}], "
+                f"got {num_inference_timesteps!r}")
+        return num_inference_timesteps
+
+    def set_num_inference_timesteps(self, num_inference_timesteps):
+        '''
+        Set the default number of denoising steps used by `predict_action`.
+        '''
+        self.num_inference_timesteps = self.validate_num_inference_timesteps(num_inference_timesteps)
+
     def adapt_conditions(self, lang_tokens, img_tokens, state_tokens):
         '''
         lang_tokens: (batch_size, lang_len, lang_token_dim)
@@ -117,7 +137,8 @@ class RDTRunner(
         return adpated_lang, adpated_img, adpated_state
 
     def conditional_sample(self, lang_cond, lang_attn_mask, img_cond, 
-                           state_traj, action_mask, ctrl_freqs):
+                           state_traj, action_mask, ctrl_freqs,
+                           num_inference_timesteps=None, noise=None):
         '''
         lang_cond: language conditional data, (batch_size, lang_len, hidden_size).
         lang_attn_mask: (batch_size, lang_len), a mask for valid language tokens,
@@ -127,18 +148,31 @@ class RDTRunner(
         action_mask: (batch_size, 1, action_dim), a 0-1 **float** tensor
             indicating the valid action dimensions.
         ctrl_freqs: (batch_size,), control frequency for each sample.
+        num_inference_timesteps: the number of denoising steps, default `self.num_inference_timesteps`.
+        noise: (batch_size, horizon, action_dim) or None, the initial noise.
         
         return: (batch_size, horizon, action_dim)
         '''
         device = state_traj.device
         dtype = state_traj.dtype
-        noisy_action = torch.randn(
-            size=(state_traj.shape[0], self.pred_horizon, self.action_dim), 
-            dtype=dtype, device=device)
+        if noise is None:
+            noisy_action = torch.randn(
+                size=(state_traj.shape[0], self.pred_horizon, self.action_dim), 
+                dtype=dtype, device=device)
+        else:
+            noisy_action = noise.to(device, dtype=dtype)
         action_mask = action_mask.expand(-1, self.pred_horizon, -1)
     
         # Set step values
-        self.noise_scheduler_sample.set_timesteps(self.num_inference_timesteps)
+        if num_inference_timesteps is None:
+            num_inference_timesteps = self.num_inference_timesteps
+        self.noise_scheduler_sample.set_timesteps(
+            self.validate_num_inference_timesteps(num_inference_timesteps))
+
+        # The conditions are the same for all denoising steps, so the cross-attention
+        # keys and values are only computed once
+        cond_cache = self.model.precompute_conditions(
+            lang_cond, img_cond, lang_mask=lang_attn_mask)
         
         for t in self.noise_scheduler_sample.timesteps:
             # Prepare state-action trajectory
@@ -149,7 +183,8 @@ class RDTRunner(
             # Predict the model output
             model_output = self.model(state_action_traj, ctrl_freqs,
                                     t.unsqueeze(-1).to(device),
-                                    lang_cond, img_cond, lang_mask=lang_attn_mask)
+                                    lang_cond, img_cond, lang_mask=lang_attn_mask,
+                                    cond_cache=cond_cache)
             
             # Compute previous actions: x_t -> x_t-1
             noisy_action = self.noise_scheduler_sample.step(
@@ -218,7 +253,7 @@ class RDTRunner(
     
     # ========= Inference  ============
     def predict_action(self, lang_tokens, lang_attn_mask, img_tokens, state_tokens,
-                       action_mask, ctrl_freqs):
+                       action_mask, ctrl_freqs, num_inference_timesteps=None, noise=None):
         '''
         lang_tokens: (batch_size, lang_len, lang_token_dim)
         lang_attn_mask: (batch_size, lang_len), a mask for valid language tokens,
@@ -228,6 +263,8 @@ class RDTRunner(
         action_mask: (batch_size, 1, action_dim),
             which should be a 0-1 **float** tensor.
         ctrl_freqs: (batch_size,), control frequency for each sample.
+        num_inference_timesteps: the number of denoising steps, default `self.num_inference_timesteps`.
+        noise: (batch_size, horizon, action_dim) or None, the initial noise.
         
         return: (batch_size, horizon, action_dim), predicted action sequence
         '''
@@ -240,6 +277,7 @@ class RDTRunner(
         action_pred = self.conditional_sample(
             lang_cond, lang_attn_mask, img_cond, 
             state_traj, action_mask, ctrl_freqs,
+            num_inference_timesteps=num_inference_timesteps, noise=noise,
         )
         
         return action_pred
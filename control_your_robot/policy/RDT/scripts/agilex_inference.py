@@ -185,8 +185,8 @@ def inference_fn(args, config, policy, t):
         #     image_arrs[i] = cv2.imdecode(np.frombuffer(image_arrs[i], np.uint8), cv2.IMREAD_COLOR)
         # proprio = torch.from_numpy(preload_images['qpos'][t]).float().cuda()
         
-        images = [PImage.fromarray(arr) if arr is not None else None
-                  for arr in image_arrs]
+        # pass the arrays themselves, so that the frames of t-1 are recognized and not encoded again
+        images = image_arrs
         
         # for i, pos in enumerate(['f', 'r', 'l'] * 2):
         #     images[i].save(f'{t}-{i}-{pos}.png')
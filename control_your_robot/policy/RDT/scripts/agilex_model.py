@@ -2,8 +2,7 @@ import os
 
 import numpy as np
 import torch
-from PIL import Image
-from torchvision import transforms
+import torch.nn.functional as F
 
 from configs.state_vec import STATE_VEC_IDX_MAPPING
 from models.multimodal_encoder.siglip_encoder import SiglipVisionTower
@@ -125,6 +124,9 @@ class RoboticDiffusionTransformerModel(object):
         # self.text_model = self.text_model.to(device, dtype=weight_dtype)
         self.vision_model = self.vision_model.to(device, dtype=weight_dtype)
 
+        # Vision embeddings of the latest frame of each camera, see `_encode_images`
+        self.image_embeds_cache = {}
+
     def load_pretrained_weights(self, pretrained=None):
         if pretrained is None:
             return 
@@ -205,70 +207,125 @@ class RoboticDiffusionTransformerModel(object):
         
         return joints
 
+    def _preprocess_images(self, images):
+        """
+        Preprocess a batch of images on the device, equivalent to the per-image PIL pipeline:
+        optional resize to `image_size`, brightness adjustment, padding to a square with the
+        mean color and SigLIP's resize / rescale / normalize.
+
+        Args:
+            images: list of RGB images of the same size, np.ndarray (H, W, 3) uint8 or PIL images
+
+        Returns:
+            pixel_values (torch.Tensor): (N, 3, height, width) in `self.dtype`
+        """
+        processor = self.image_processor
+        x = torch.from_numpy(np.stack([np.asarray(image) for image in images]))
+        x = x.to(self.device, non_blocking=True).permute(0, 3, 1, 2).float() / 255.0
+
+        if self.image_size is not None:
+            # Same as transforms.Resize: an int resizes the shorter edge
+            h, w = x.shape[-2:]
+            if isinstance(self.image_size, int):
+                scale = self.image_size / min(h, w)
+                size = (int(h * scale), int(w * scale))
+            else:
+                size = tuple(self.image_size)
+            x = F.interpolate(x, size=size, mode="bilinear", antialias=True, align_corners=False).clamp_(0, 1)
+
+        if self.args["dataset"].get("auto_adjust_image_brightness", False):
+            # Brighten dark images, like ColorJitter(brightness=(1.75, 1.75))
+            dark = x.mean(dim=(1, 2, 3)) <= 0.15
+            factor = torch.where(dark, 1.75, 1.0).view(-1, 1, 1, 1)
+            x = (x * factor).clamp_(0, 1)
+
+        mean = torch.tensor(processor.image_mean, device=x.device).view(1, 3, 1, 1)
+        if self.args["dataset"].get("image_aspect_ratio", "pad") == "pad":
+            h, w = x.shape[-2:]
+            if h != w:
+                side = max(h, w)
+                background = torch.tensor([int(m * 255) for m in processor.image_mean], device=x.device) / 255.0
+                padded = background.view(1, 3, 1, 1).repeat(x.shape[0], 1, side, side)
+                top, left = (side - h) // 2, (side - w) // 2
+                padded[:, :, top:top + h, left:left + w] = x
+                x = padded
+
+        size = (processor.size["height"], processor.size["width"])
+        if tuple(x.shape[-2:]) != size:
+            x = F.interpolate(x, size=size, mode="bicubic", antialias=True, align_corners=False).clamp_(0, 1)
+        std = torch.tensor(processor.image_std, device=x.device).view(1, 3, 1, 1)
+        x = (x - mean) / std
+        return x.to(self.dtype)
+
+    def _encode_images(self, images):
+        """
+        Encode the images with the vision model, reusing the embeddings of frames that were
+        already encoded. The frames of timestep t-1 are the frames of timestep t of the previous
+        call, so usually only the new frames of each camera are encoded.
+
+        A frame is recognized by object identity: pass the same array (or PIL image) object again
+        for a frame that was already seen, and don't modify frames in place.
+
+        Args:
+            images: list of images ordered by timestep, then camera (see `step`), None for missing images
+
+        Returns:
+            image_embeds (torch.Tensor): (len(images), num_patches, hidden_size)
+        """
+        num_cameras = self.args["common"]["num_cameras"]
+        background_color = np.array([int(x * 255) for x in self.image_processor.image_mean], dtype=np.uint8)
+        background_image = np.ones(
+            (self.image_processor.size["height"], self.image_processor.size["width"], 3), dtype=np.uint8
+        ) * background_color.reshape(1, 1, 3)
+
+        embeds = [None] * len(images)
+        to_encode = []
+        for i, image in enumerate(images):
+            cached = self.image_embeds_cache.get(i % num_cameras)
+            if cached is not None and cached[0] is image:
+                embeds[i] = cached[1]
+            else:
+                to_encode.append(i)
+
+        # Batch the new frames by size, missing images are replaced by the background image
+        groups = {}
+        for i in to_encode:
+            image = background_image if images[i] is None else np.asarray(images[i])
+            groups.setdefault(image.shape, []).append((i, image))
+        for group in groups.values():
+            pixel_values = self._preprocess_images([image for _, image in group])
+            group_embeds = self.vision_model(pixel_values).detach()
+            for (i, _), embed in zip(group, group_embeds):
+                embeds[i] = embed
+
+        # Keep the latest frame of each camera, the reference also keeps its identity unique
+        for i in range(len(images) - num_cameras, len(images)):
+            self.image_embeds_cache[i % num_cameras] = (images[i], embeds[i])
+        return torch.stack(embeds, dim=0)
+
     @torch.no_grad()
-    def step(self, proprio, images, text_embeds):
+    def step(self, proprio, images, text_embeds, num_inference_timesteps=None, noise=None):
         """
         Predict the next action chunk given the 
         proprioceptive states, images, and instruction embeddings.
 
         Args:
             proprio: proprioceptive states
-            images: RGB images, the order should be
+            images: RGB images (np.ndarray or PIL images), the order should be
                 [ext_{t-1}, right_wrist_{t-1}, left_wrist_{t-1}, 
                 ext_{t}, right_wrist_{t}, left_wrist_{t}]
+                Frames that are passed again (as the same object) are not encoded again
             text_embeds: instruction embeddings
+            num_inference_timesteps: the number of denoising steps, default from the config
+            noise: the initial noise of the sampling, (1, action_chunk_size, state_dim) or None
 
         Returns:
             action: predicted action
         """
         device = self.device
         dtype = self.dtype
-        
-        # The background image used for padding
-        background_color = np.array([
-            int(x*255) for x in self.image_processor.image_mean
-        ], dtype=np.uint8).reshape(1, 1, 3)
-        background_image = np.ones((
-            self.image_processor.size["height"], 
-            self.image_processor.size["width"], 3), dtype=np.uint8
-        ) * background_color
-        
-        # Preprocess the images by order and encode them
-        image_tensor_list = []
-        for image in images:
-            if image is None:
-                # Replace it with the background image
-                image = Image.fromarray(background_image)
-            
-            if self.image_size is not None:
-                image = transforms.Resize(self.data_args.image_size)(image)
-            
-            if self.args["dataset"].get("auto_adjust_image_brightness", False):
-                pixel_values = list(image.getdata())
-                average_brightness = sum(sum(pixel) for pixel in pixel_values) / (len(pixel_values) * 255.0 * 3)
-                if average_brightness <= 0.15:
-                    image = transforms.ColorJitter(brightness=(1.75,1.75))(image)
-                    
-            if self.args["dataset"].get("image_aspect_ratio", "pad") == 'pad':
-                def expand2square(pil_img, background_color):
-                    width, height = pil_img.size
-                    if width == height:
-                        return pil_img
-                    elif width > height:
-                        result = Image.new(pil_img.mode, (width, width), background_color)
-                        result.paste(pil_img, (0, (width - height) // 2))
-                        return result
-                    else:
-                        result = Image.new(pil_img.mode, (height, height), background_color)
-                        result.paste(pil_img, ((height - width) // 2, 0))
-                        return result
-                image = expand2square(image, tuple(int(x*255) for x in self.image_processor.image_mean))
-            image = self.image_processor.preprocess(image, return_tensors='pt')['pixel_values'][0]
-            image_tensor_list.append(image)
-
-        image_tensor = torch.stack(image_tensor_list, dim=0).to(device, dtype=dtype)
-
-        image_embeds = self.vision_model(image_tensor).detach()
+
+        image_embeds = self._encode_images(images)
         image_embeds = image_embeds.reshape(-1, self.vision_model.hidden_size).unsqueeze(0)
 
         # Prepare the proprioception states and the control frequency
@@ -289,7 +346,9 @@ class RoboticDiffusionTransformerModel(object):
             img_tokens=image_embeds,
             state_tokens=states,
             action_mask=state_elem_mask.unsqueeze(1),  
-            ctrl_freqs=ctrl_freqs
+            ctrl_freqs=ctrl_freqs,
+            num_inference_timesteps=num_inference_timesteps,
+            noise=noise,
         )
         trajectory = self._unformat_action_to_joint(trajectory).to(torch.float32)
 
@@ -0,0 +1,56 @@
+"""
+Fill the language embedding cache used by inference_model.RDT with the
+instructions of the task_instructions JSON files, so that inference does not
+need to load T5 at all.
+
+Run from policy/RDT:
+    python -m scripts.build_lang_cache --tasks fold_towels place_shoe
+"""
+
+import argparse
+import glob
+import json
+import os
+
+import torch
+import yaml
+
+from models.multimodal_encoder.lang_embed_cache import LangEmbedCache
+
+
+def main(args):
+    with open(args.config_path, "r") as fp:
+        config = yaml.safe_load(fp)
+
+    if args.tasks:
+        task_paths = [os.path.join(args.instructions_dir, f"{task}.json") for task in args.tasks]
+    else:
+        task_paths = sorted(glob.glob(os.path.join(args.instructions_dir, "*.json")))
+
+    cache = LangEmbedCache(
+        cache_dir=args.cache_dir,
+        encoder_path=args.model_path,
+        device=torch.device(f"cuda:{args.gpu}"),
+        model_max_length=config["dataset"]["tokenizer_max_length"],
+    )
+    for task_path in task_paths:
+        task_name = os.path.splitext(os.path.basename(task_path))[0]
+        with open(task_path, 'r') as f_instr:
+            instructions = json.load(f_instr)['instructions']
+        num_missing = sum(instruction not in cache for instruction in instructions)
+        cache.encode(instructions, batch_size=args.batch_size, name=task_name)
+        print(f"{task_name}: {len(instructions)} instructions, {num_missing} newly encoded")
+    print(f"Language embeddings are cached in {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-encode task instructions into the language embedding cache.")
+    parser.add_argument("--tasks", type=str, nargs="*", default=None,
+                        help="Task names to encode, all JSON files of instructions_dir by default")
+    parser.add_argument("--instructions_dir", type=str, default="../../task_instructions")
+    parser.add_argument("--cache_dir", type=str, default="../weights/RDT/lang_embed_cache")
+    parser.add_argument("--model_path", type=str, default="../weights/RDT/t5-v1_1-xxl")
+    parser.add_argument("--config_path", type=str, default="configs/base.yaml")
+    parser.add_argument("--gpu", type=int, default=0)
+    parser.add_argument("--batch_size", type=int, default=16)
+    main(parser.parse_args())
@@ -0,0 +1,156 @@
+"""
+Offline report of how few denoising steps RDT needs.
+
+Samples observations from recorded agilex-format episodes and predicts their action chunks
+with each candidate number of DPM-Solver steps and with a long reference schedule, starting
+from the same initial noise. Reports the MSE of every candidate against the reference and
+against the recorded actions, together with the mean latency of a prediction.
+
+Example:
+    python -m scripts.eval_sampling_steps \
+        --config_path configs/base.yaml \
+        --pretrained_model_name_or_path checkpoints/rdt-finetune-1b/pytorch_model.bin \
+        --lang_embeddings_path outs/handover_pan.pt \
+        --dataset_dir data/datasets/agilex/rdt_data/handover_pan \
+        --steps 1 2 3 5 --reference_steps 100
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import cv2
+import h5py
+import numpy as np
+import torch
+import yaml
+
+from scripts.agilex_model import create_model
+
+
+CAMERA_NAMES = ['cam_high', 'cam_right_wrist', 'cam_left_wrist']
+
+
+def load_images(f, step_id):
+    # The images of the previous and the current step, in the order expected by the model
+    images = []
+    for i in (max(step_id - 1, 0), step_id):
+        for cam in CAMERA_NAMES:
+            img = f['observations']['images'][cam][i]
+            images.append(cv2.imdecode(np.frombuffer(img, np.uint8), cv2.IMREAD_COLOR))
+    return images
+
+
+def sync(device):
+    if torch.device(device).type == 'cuda':
+        torch.cuda.synchronize()
+
+
+def main(args):
+    with open(args.config_path, "r") as fp:
+        config = yaml.safe_load(fp)
+    torch.manual_seed(args.seed)
+    rng = np.random.default_rng(args.seed)
+
+    model = create_model(
+        args=config,
+        dtype=torch.bfloat16,
+        pretrained=args.pretrained_model_name_or_path,
+        pretrained_vision_encoder_name_or_path=args.pretrained_vision_encoder_name_or_path,
+        control_frequency=args.ctrl_freq,
+    )
+    text_embeds = torch.load(args.lang_embeddings_path)["embeddings"]
+
+    chunk_size = config['common']['action_chunk_size']
+    noise_shape = (1, chunk_size, config['common']['state_dim'])
+    all_steps = sorted(set(args.steps)) + [args.reference_steps]
+
+    episodes = sorted(glob.glob(os.path.join(args.dataset_dir, "**", "*.hdf5"), recursive=True))
+    if args.max_episodes > 0:
+        episodes = episodes[:args.max_episodes]
+    if not episodes:
+        raise ValueError(f"No hdf5 episodes found in {args.dataset_dir}")
+
+    errors = {n: {"reference": [], "ground_truth": []} for n in all_steps}
+    latencies = {n: [] for n in all_steps}
+    for path in episodes:
+        with h5py.File(path, 'r') as f:
+            qpos = f['observations']['qpos'][:]
+            actions = f['action'][:]
+            num_steps = min(args.samples_per_episode, len(qpos))
+            for step_id in np.sort(rng.choice(len(qpos), num_steps, replace=False)):
+                images = load_images(f, step_id)
+                proprio = torch.from_numpy(qpos[step_id]).float().unsqueeze(0)
+                target = actions[step_id:step_id + chunk_size]
+                # All schedules start from the same noise, so the difference only comes from the number of steps
+                noise = torch.randn(noise_shape)
+
+                model.reset()
+                preds = {}
+                for n in all_steps:
+                    sync(model.device)
+                    start = time.monotonic()
+                    pred = model.step(proprio, images, text_embeds, num_inference_timesteps=n, noise=noise)
+                    sync(model.device)
+                    latencies[n].append(time.monotonic() - start)
+                    preds[n] = pred[0].cpu().numpy()
+
+                for n in all_steps:
+                    errors[n]["reference"].append(np.mean((preds[n] - preds[args.reference_steps]) ** 2))
+                    errors[n]["ground_truth"].append(np.mean((preds[n][:len(target)] - target) ** 2))
+        print(f"Evaluated {path}")
+
+    report = {}
+    print(f"\n{'steps':>6} {'mse_vs_ref':>12} {'max_mse_vs_ref':>15} {'mse_vs_gt':>12} {'latency_ms':>11}")
+    for n in all_steps:
+        # The first prediction of every sample also encodes its images, so report the median latency
+        report[n] = {
+            "mse_vs_reference": float(np.mean(errors[n]["reference"])),
+            "max_mse_vs_reference": float(np.max(errors[n]["reference"])),
+            "mse_vs_ground_truth": float(np.mean(errors[n]["ground_truth"])),
+            "latency_ms": float(np.median(latencies[n]) * 1000),
+        }
+        r = report[n]
+        print(f"{n:>6} {r['mse_vs_reference']:>12.6f} {r['max_mse_vs_reference']:>15.6f} "
+              f"{r['mse_vs_ground_truth']:>12.6f} {r['latency_ms']:>11.1f}")
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump({"reference_steps": args.reference_steps, "results": report}, fp, indent=2)
+        print(f"Saved the report to {args.output}")
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config_path', type=str, default="configs/base.yaml",
+                        help='Path to the config file')
+    parser.add_argument('--pretrained_model_name_or_path', type=str, required=True,
+                        help='Name or path to the pretrained model')
+    parser.add_argument('--pretrained_vision_encoder_name_or_path', type=str,
+                        default="google/siglip-so400m-patch14-384",
+                        help='Name or path to the vision encoder')
+    parser.add_argument('--lang_embeddings_path', type=str, required=True,
+                        help='Path to the pre-encoded language instruction embeddings')
+    parser.add_argument('--dataset_dir', type=str, required=True,
+                        help='Directory of the recorded hdf5 episodes')
+    parser.add_argument('--ctrl_freq', type=int, default=25,
+                        help='The control frequency of the robot')
+    parser.add_argument('--steps', type=int, nargs='+', default=[1, 2, 3, 5],
+                        help='Candidate numbers of denoising steps')
+    parser.add_argument('--reference_steps', type=int, default=100,
+                        help='Number of denoising steps of the reference schedule')
+    parser.add_argument('--samples_per_episode', type=int, default=8,
+                        help='Number of observations sampled from every episode')
+    parser.add_argument('--max_episodes', type=int, default=0,
+                        help='Evaluate at most this many episodes, 0 for all')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed of the sampled observations and noise')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Optional path of a json file to write the report to')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(get_arguments())
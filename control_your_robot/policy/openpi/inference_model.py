@@ -84,6 +84,14 @@ class PI0_DUAL:
         assert (self.observation_window is not None), "update observation_window first!"
         return self.policy.infer(self.observation_window)["actions"]
 
+    # infer several independent observations in one policy call, used by offline_eval_batch.py
+    def get_action_batch(self, img_arrs, states):
+        obs_batch = []
+        for img_arr, state in zip(img_arrs, states):
+            self.update_observation_window(img_arr, state)
+            obs_batch.append(self.observation_window)
+        return [result["actions"] for result in self.policy.infer_batch(obs_batch)]
+
     def reset_obsrvationwindows(self):
         self.instruction = None
         self.observation_window = None
@@ -0,0 +1,95 @@
+import sys
+sys.path.append('./')
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from sensor.Vitac3D import Vitac3D, make_fake_stream, parse_frames
+from utils.replay_serial import ReplaySerial
+
+
+def legacy_read(serDev, stop, frames):
+    '''原来的读取方式: 轮询in_waiting, 逐行readline, split/int解析'''
+    current = []
+    while not stop.is_set():
+        if serDev.in_waiting > 0:
+            line = serDev.readline().decode('utf-8', errors='ignore').strip()
+            if len(line) < 10:
+                if len(current) == 16:
+                    frames.append(np.array(current, dtype=np.int16))
+                current = []
+                continue
+            str_values = line.split()
+            if len(str_values) != 16:
+                continue
+            current.append([int(val) for val in str_values])
+
+
+def measure_cpu(run, seconds):
+    '''运行run(stop)指定时间, 返回进程CPU占用率(%)'''
+    stop = threading.Event()
+    thread = threading.Thread(target=run, args=(stop,), daemon=True)
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return (time.process_time() - cpu_start) / (time.monotonic() - wall_start) * 100
+
+
+def main(args):
+    data = ReplaySerial.from_file(args.record).data if args.record else make_fake_stream(args.num_frames)
+
+    # 1. 解析速度: 数据全部可读时每秒能解析的帧数
+    serDev = ReplaySerial(data, realtime=False, loop=False)
+    legacy_frames = []
+    start = time.perf_counter()
+    stop = threading.Event()
+    reader = threading.Thread(target=legacy_read, args=(serDev, stop, legacy_frames), daemon=True)
+    reader.start()
+    while serDev.in_waiting > 0:
+        time.sleep(0.01)
+    stop.set()
+    reader.join()
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames, _ = parse_frames(bytearray(data), len(data))
+    new_time = time.perf_counter() - start
+    assert all(np.array_equal(a, b) for a, b in zip(legacy_frames, frames)), "parsers disagree"
+    print(f"parse: legacy {len(legacy_frames) / legacy_time:.0f} frames/s, "
+          f"vectorized {len(frames) / new_time:.0f} frames/s")
+
+    # 2. 实时读取时的CPU占用, 数据按波特率到达
+    legacy_frames = []
+    legacy_cpu = measure_cpu(
+        lambda stop: legacy_read(ReplaySerial(data, baudrate=args.baud, timeout=0.1), stop, legacy_frames),
+        args.seconds)
+    print(f"legacy reader:  {legacy_cpu:.1f}% CPU, {len(legacy_frames) / args.seconds:.0f} frames/s")
+
+    sensors = []
+    def run_new(stop):
+        for i in range(args.num_sensors):
+            sensor = Vitac3D(f"fake_{i}")
+            sensor.set_up("replay", is_show=False, serial_device=ReplaySerial(data, baudrate=args.baud, timeout=0.1))
+            sensors.append(sensor)
+        stop.wait()
+        for sensor in sensors:
+            sensor.close()
+    new_cpu = measure_cpu(run_new, args.seconds)
+    rate = sum(s.frame_count for s in sensors) / args.seconds
+    print(f"new reader x{args.num_sensors}: {new_cpu:.1f}% CPU, {rate:.0f} frames/s in total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Vitac3D serial reader on a replayed serial stream.")
+    parser.add_argument("--record", type=str, default=None,
+                        help="Raw serial data recorded from the sensor, synthetic frames by default")
+    parser.add_argument("--num_frames", type=int, default=200)
+    parser.add_argument("--baud", type=int, default=2000000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--num_sensors", type=int, default=2)
+    main(parser.parse_args())
@@ -4,10 +4,14 @@ sys.path.append('./')
 from my_robot.test_robot import TestRobot
 
 from utils.bisocket import BiSocket
-from utils.data_handler import debug_print
+from utils.data_handler import debug_print, is_enter_pressed
 
+import argparse
 import socket
 import time
+from collections import deque
+
+import cv2
 import numpy as np
 
 def images_encoding(imgs):
@@ -136,6 +140,14 @@ class Client:
 if __name__ == "__main__":
     import os
     os.environ["INFO_LEVEL"] = "DEBUG"
+
+    parser = argparse.ArgumentParser()
+    # msgpack: 使用MsgpackSocket, 服务端也需要使用msgpack
+    parser.add_argument("--transport", type=str, choices=["pickle", "msgpack"], default="pickle")
+    args = parser.parse_args()
+    transport = BiSocket
+    if args.transport == "msgpack":
+        from utils.msgpack_socket import MsgpackSocket as transport
     
     ip = "127.0.0.1"
     port = 10000
@@ -149,7 +161,7 @@ if __name__ == "__main__":
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     client_socket.connect((ip, port))
 
-    bisocket = BiSocket(client_socket, client.processor)
+    bisocket = transport(client_socket, client.processor)
     client.set_up(bisocket)
 
     while True:
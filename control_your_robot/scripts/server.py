@@ -1,9 +1,13 @@
 import sys
 sys.path.append('./')
 
+import argparse
 import socket
 import time
 
+import cv2
+import numpy as np
+
 from utils.bisocket import BiSocket
 from policy.test_policy.inference_model import TestModel
 from utils.data_handler import debug_print
@@ -22,6 +26,7 @@ class Server:
 
         img_arr, state = message["img_arr"], message["state"]
 
+        imgs_array = []
         for data in img_arr:
             jpeg_bytes = np.array(data).tobytes().rstrip(b"\0")
             nparr = np.frombuffer(jpeg_bytes, dtype=np.uint8)
@@ -40,6 +45,14 @@ if __name__ == "__main__":
     import os
     os.environ["INFO_LEVEL"] = "DEBUG"
 
+    parser = argparse.ArgumentParser()
+    # msgpack: 使用MsgpackSocket, 客户端也需要使用msgpack
+    parser.add_argument("--transport", type=str, choices=["pickle", "msgpack"], default="pickle")
+    args = parser.parse_args()
+    transport = BiSocket
+    if args.transport == "msgpack":
+        from utils.msgpack_socket import MsgpackSocket as transport
+
     ip = "127.0.0.1"
     port = 10000
 
@@ -61,12 +74,14 @@ if __name__ == "__main__":
             conn, addr = server_socket.accept()
             debug_print("Server",f"Connected by {addr}","INFO")
 
-            bisocket = BiSocket(conn, server.infer, send_back=True)
+            bisocket = transport(conn, server.infer, send_back=True)
             server.set_up(bisocket)
 
             while bisocket.running.is_set():
                 time.sleep(0.5)
 
+            if hasattr(bisocket, "stats"):
+                debug_print("Server",f"Transport stats: {bisocket.stats()}","INFO")
             debug_print("Server","Client disconnected. Waiting for next client...","WARNING")
 
     except KeyboardInterrupt:
@@ -12,13 +12,33 @@ os.environ["NUMEXPR_NUM_THREADS"] = "1"
 
 import argparse
 import glob
+import json
+import shutil
 import cv2
 import h5py
 import numpy as np
 import time
-from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from tqdm import tqdm
 
+# 图像数据集的对应关系: (源数据集的候选路径, 目标数据集路径)
+# 解压: 压缩文件中的JPEG数据(在observations组或根目录下) -> 原始图像
+DECODE_IMAGES = [
+    (["cam_high", "cam_head"], "cam_head/color"),
+    (["cam_left_wrist"], "cam_left_wrist/color"),
+    (["cam_right_wrist"], "cam_right_wrist/color"),
+]
+# 压缩: 原始图像 -> JPEG数据, 生成的文件可以直接用解压模式还原
+ENCODE_IMAGES = [
+    (["cam_head/color", "cam_high/color"], "cam_high"),
+    (["cam_left_wrist/color"], "cam_left_wrist"),
+    (["cam_right_wrist/color"], "cam_right_wrist"),
+]
+ARMS = ["left_arm", "right_arm"]
+MANIFEST_NAME = ".upload_manifest.json"
+PARTS_DIR_NAME = ".parts"
+
 # --- 子进程初始化函数 ---
 def worker_init():
     # 再次强制当前子进程只用一个线程
@@ -28,20 +48,6 @@ def worker_init():
         pass
 
 # --- 辅助函数 ---
-def hdf5_groups_to_dict(hdf5_path):
-    result = {}
-    with h5py.File(hdf5_path, 'r') as f:
-        def visit_handler(name, obj):
-            if isinstance(obj, h5py.Dataset):
-                parts = name.split('/')
-                curr = result
-                for part in parts[:-1]:
-                    if part not in curr: curr[part] = {}
-                    curr = curr[part]
-                curr[parts[-1]] = obj[()]
-        f.visititems(visit_handler)
-    return result
-
 def images_decoding(encoded_data, valid_len=None):
     imgs = []
     for data in encoded_data:
@@ -70,61 +76,123 @@ def images_encoding(imgs):
     padded_data = [d.ljust(max_len, b"\0") for d in encode_data]
     return padded_data, max_len
 
-# --- 核心处理任务 ---
-def process_single_file(args_pack):
-    hdf5_file, output_path, do_encode = args_pack
+def source_signature(hdf5_file):
+    stat = os.stat(hdf5_file)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def load_manifest(output_path, mode):
+    '''
+    清单记录已经完成的文件及其源文件的修改时间和大小, 中断后重新运行时跳过这些文件
+    '''
+    path = os.path.join(output_path, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("mode") == mode:
+            return manifest
+    return {"mode": mode, "episodes": {}}
+
+def save_manifest(output_path, manifest):
+    path = os.path.join(output_path, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+def find_dataset(group, candidates):
+    for name in candidates:
+        obj = group.get(name)
+        if isinstance(obj, h5py.Dataset):
+            return obj
+    return None
+
+# --- 任务划分 ---
+def plan_episode(hdf5_file, output_path, do_encode, chunk_size):
+    '''
+    把一个文件的图像按帧划分成多个块, 每块是一个可以在任意进程执行的任务
+    每块的结果保存为单独的.npy文件, 已经存在的块在中断后重新运行时不用再处理
+    '''
     dataset_name = os.path.basename(hdf5_file)
-    target_file = os.path.join(output_path, dataset_name)
+    signature = source_signature(hdf5_file)
+    # 源文件改变后, 之前的块作废
+    parts_dir = os.path.join(output_path, PARTS_DIR_NAME,
+                             f"{dataset_name}_{signature['mtime_ns']}_{signature['size']}")
+    job = {
+        "name": dataset_name,
+        "src": hdf5_file,
+        "target": os.path.join(output_path, dataset_name),
+        "parts_dir": parts_dir,
+        "signature": signature,
+        "encode": do_encode,
+        "images": [],
+    }
+    with h5py.File(hdf5_file, "r") as f:
+        # 1. 尝试定位 observations 组
+        source = f if do_encode else f.get("observations", f)
+        for candidates, target in (ENCODE_IMAGES if do_encode else DECODE_IMAGES):
+            # 容错查找：先找 cam_high，找不到找 cam_head ...
+            data = find_dataset(source, candidates)
+            if data is None:
+                continue
+            chunks = []
+            for start in range(0, len(data), chunk_size):
+                end = min(start + chunk_size, len(data))
+                part = os.path.join(parts_dir, f"{target.replace('/', '_')}_{start}_{end}.npy")
+                chunks.append((start, end, part))
+            job["images"].append({"src": data.name, "target": target, "chunks": chunks})
+    return job
 
-    try:
-        # 读数据
-        ep = hdf5_groups_to_dict(hdf5_file)
-        
-        with h5py.File(target_file, "w") as root:
-            if do_encode:
-                # 压缩模式逻辑 (根据你的需求简写了，如需完整请参考之前版本)
-                pass 
+def process_chunk(hdf5_file, dataset_path, start, end, part_path, do_encode):
+    '''
+    只读取一块帧, 解码(或编码)后保存为.npy, 内存占用与文件长度无关
+    '''
+    with h5py.File(hdf5_file, "r") as f:
+        data = f[dataset_path][start:end]
+    if do_encode:
+        encoded, max_len = images_encoding(data)
+        result = np.array(encoded, dtype=f"S{max(max_len, 1)}")
+    else:
+        result = np.array(images_decoding(data))
+    # 写完再改名, 中断时不会留下不完整的块
+    tmp_path = part_path[:-len(".npy")] + ".tmp.npy"
+    np.save(tmp_path, result)
+    os.replace(tmp_path, part_path)
+
+def assemble_episode(job):
+    '''
+    把一个文件的所有块按顺序写入目标文件, 每次只读取一块
+    '''
+    tmp_target = job["target"] + ".tmp"
+    with h5py.File(job["src"], "r") as f, h5py.File(tmp_target, "w") as root:
+        # 2. 处理图像
+        for image in job["images"]:
+            if not image["chunks"]:
+                root.create_dataset(image["target"], data=np.zeros((0,), dtype=np.uint8))
+                continue
+            parts = [np.load(part, mmap_mode="r") for _, _, part in image["chunks"]]
+            total = image["chunks"][-1][1]
+            if job["encode"]:
+                # JPEG数据按所有帧中最长的长度补0, 与images_encoding相同
+                dtype = f"S{max(part.dtype.itemsize for part in parts)}"
+                shape = (total,)
             else:
-                # ================= 解压逻辑 =================
-                # 1. 尝试定位 observations 组
-                source = ep.get("observations", ep)
-
-                # 2. 处理图像
-                img_mapping = {
-                    "cam_high": "cam_head",
-                    "cam_left_wrist": "cam_left_wrist",
-                    "cam_right_wrist": "cam_right_wrist"
-                }
-                
-                # 图像写入
-                for src_k, target_grp in img_mapping.items():
-                    # 容错查找：先找 cam_high，找不到找 cam_head ...
-                    data = source.get(src_k)
-                    if data is None and src_k == "cam_high": data = source.get("cam_head")
-                    
-                    if data is not None:
-                        # 解码
-                        decoded = images_decoding(data)
-                        decoded_np = np.array(decoded)
-                        
-                        grp = root.create_group(target_grp)
-                        grp.create_dataset("color", data=decoded_np)
-
-                # 3. 处理机械臂状态 (Joints, qpos 等)
-                for arm in ["left_arm", "right_arm"]:
-                    arm_data = source.get(arm, ep.get(arm)) # 双重查找
-                    if arm_data:
-                        arm_grp = root.create_group(arm)
-                        for k, v in arm_data.items():
-                            # 只存非图像的数组
-                            if isinstance(v, np.ndarray) and v.ndim < 3:
-                                arm_grp.create_dataset(k, data=v)
-
-        return None # 成功
-
-    except Exception as e:
-        if os.path.exists(target_file): os.remove(target_file)
-        return f"Error {dataset_name}: {str(e)}"
+                dtype = parts[0].dtype
+                shape = (total,) + parts[0].shape[1:]
+            dataset = root.create_dataset(image["target"], shape=shape, dtype=dtype)
+            for (start, end, _), part in zip(image["chunks"], parts):
+                # 先用numpy补齐长度, h5py转换定长字符串时会在JPEG数据中的第一个0处截断
+                dataset[start:end] = np.asarray(part, dtype=dtype)
+
+        # 3. 处理机械臂状态 (Joints, qpos 等)
+        source = f if job["encode"] else f.get("observations", f)
+        for arm in ARMS:
+            arm_data = source.get(arm, f.get(arm)) # 双重查找
+            if isinstance(arm_data, h5py.Group):
+                for k, v in arm_data.items():
+                    # 只存非图像的数组
+                    if isinstance(v, h5py.Dataset) and v.ndim < 3:
+                        root.create_dataset(f"{arm}/{k}", data=v[()])
+    os.replace(tmp_target, job["target"])
+    shutil.rmtree(job["parts_dir"], ignore_errors=True)
 
 # --- 主程序 ---
 def main(args):
@@ -133,35 +201,100 @@ def main(args):
         output_path = hdf5_paths + "_zip"
     else:
         output_path = hdf5_paths.replace("_zip", "")
-    
+
     if output_path == hdf5_paths:
         output_path = hdf5_paths + "_unzipped"
 
     os.makedirs(output_path, exist_ok=True)
-    hdf5_files = glob.glob(f"{hdf5_paths}/*.hdf5")
-    
+    hdf5_files = sorted(glob.glob(f"{hdf5_paths}/*.hdf5"))
+
     # ----------------------------------------------------
     # ⚠️ 安全模式：先用 8 个核心跑，确保不死锁
     # ----------------------------------------------------
-    max_workers = 16
-    
+    max_workers = args.num_workers
+
     print(f"检测到 CPU 核心数: {os.cpu_count()}")
     print(f"输入: {hdf5_paths}")
     print(f"输出: {output_path}")
     print(f">>> 安全模式启动: 使用 {max_workers} 个进程 (防止OpenCV死锁)")
-    print(">>> 正在初始化进程池... (如卡住请等待10秒)")
 
-    task_args = [(f, output_path, args.encode) for f in hdf5_files]
+    mode = "encode" if args.encode else "decode"
+    manifest = load_manifest(output_path, mode)
     errors = []
+    jobs = []
+    for hdf5_file in hdf5_files:
+        dataset_name = os.path.basename(hdf5_file)
+        target_file = os.path.join(output_path, dataset_name)
+        if (not args.force and os.path.exists(target_file)
+                and manifest["episodes"].get(dataset_name) == source_signature(hdf5_file)):
+            continue
+        try:
+            jobs.append(plan_episode(hdf5_file, output_path, args.encode, args.chunk_size))
+        except Exception as e:
+            errors.append(f"Error {dataset_name}: {str(e)}")
+    if len(jobs) < len(hdf5_files):
+        print(f">>> 跳过 {len(hdf5_files) - len(jobs) - len(errors)} 个已完成的文件")
+
+    # 所有文件的块放在同一个队列中, 长文件的块也能分到所有进程上
+    pending = deque()
+    remaining = {}
+    ready = deque()
+    for i, job in enumerate(jobs):
+        os.makedirs(job["parts_dir"], exist_ok=True)
+        todo = [(image["src"], chunk) for image in job["images"] for chunk in image["chunks"]
+                if not os.path.exists(chunk[2])]
+        pending.extend((i, src, chunk) for src, chunk in todo)
+        remaining[i] = len(todo)
+        if not todo:
+            ready.append(i)
+    failed = set()
 
-    # 这里的 initializer 非常关键
+    # 同时提交的任务数有上限, 合并任务可以及时执行, 已完成的块不会在磁盘上堆积
+    max_in_flight = max_workers * 2
+    pbar = tqdm(total=len(pending), desc="chunks")
     with ProcessPoolExecutor(max_workers=max_workers, initializer=worker_init) as executor:
-        results = list(tqdm(executor.map(process_single_file, task_args), total=len(hdf5_files)))
-        
-        for res in results:
-            if res is not None:
-                errors.append(res)
-    
+        running = {}
+        while pending or ready or running:
+            while len(running) < max_in_flight and (ready or pending):
+                if ready:
+                    i = ready.popleft()
+                    running[executor.submit(assemble_episode, jobs[i])] = ("assemble", i)
+                    continue
+                i, src, (start, end, part) = pending.popleft()
+                if i in failed:
+                    pbar.update(1)
+                    continue
+                future = executor.submit(process_chunk, jobs[i]["src"], src, start, end, part, args.encode)
+                running[future] = ("chunk", i)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, i = running.pop(future)
+                job = jobs[i]
+                try:
+                    future.result()
+                except Exception as e:
+                    if i not in failed:
+                        failed.add(i)
+                        errors.append(f"Error {job['name']}: {str(e)}")
+                        for path in (job["target"], job["target"] + ".tmp"):
+                            if os.path.exists(path): os.remove(path)
+                    if kind == "chunk":
+                        pbar.update(1)
+                    continue
+                if kind == "chunk":
+                    pbar.update(1)
+                    remaining[i] -= 1
+                    if remaining[i] == 0 and i not in failed:
+                        ready.append(i)
+                else:
+                    manifest["episodes"][job["name"]] = job["signature"]
+                    save_manifest(output_path, manifest)
+    pbar.close()
+    parts_root = os.path.join(output_path, PARTS_DIR_NAME)
+    if os.path.isdir(parts_root) and not os.listdir(parts_root):
+        os.rmdir(parts_root)
+
     print("-" * 30)
     if errors:
         print(f"❌ 完成，但有 {len(errors)} 个文件失败！前3个错误:")
@@ -173,5 +306,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("input", type=str)
     parser.add_argument("--encode", action="store_true")
+    parser.add_argument("--num_workers", type=int, default=16)
+    parser.add_argument("--chunk_size", type=int, default=64, help="每个任务处理的帧数")
+    parser.add_argument("--force", action="store_true", help="忽略清单, 重新处理所有文件")
     args = parser.parse_args()
-    main(args)
\ No newline at end of file
+    main(args)
@@ -16,6 +16,162 @@ import subprocess
 
 import sys
 
+import argparse
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append('./')
+
+from utils.tactile_hand import TactileHandRenderer, render_tactile_grid
+
+
+
+# 触觉视频每批渲染的帧数
+
+TACTILE_BATCH_SIZE = 64
+
+# 相机视频每次从HDF5读取的帧数
+
+CAMERA_CHUNK_SIZE = 64
+
+# 处理完成后写入输出目录的标记文件, 记录源文件的修改时间和大小, 用于跳过已是最新的episode
+
+DONE_MARKER = ".visualized.json"
+
+
+
+def stream_to_ffmpeg(chunks, video_path, pix_fmt, fps=30, total=None, desc=None, verbose=False):
+
+    """
+
+    把帧按块直接写入FFmpeg的stdin编码成视频, 不在内存中保存所有帧, 也不写临时图片
+
+
+
+    Parameters:
+
+        chunks: 产生(N, H, W, C)或(N, H, W)的uint8数组的迭代器
+
+        video_path: 输出视频路径
+
+        pix_fmt: 输入帧的像素格式, 如 'rgb24', 'bgr24', 'gray'
+
+        total: 总帧数, 只用于显示进度
+
+    """
+
+    # 先写入临时文件, 完成后再替换, 中断时不会留下不完整的视频
+
+    tmp_path = video_path[:-len('.mp4')] + '.tmp.mp4'
+
+    proc = None
+
+    try:
+
+        with tqdm(total=total, desc=desc, disable=not verbose) as pbar:
+
+            for chunk in chunks:
+
+                if proc is None:
+
+                    height, width = chunk.shape[1:3]
+
+                    cmd = [
+
+                        'ffmpeg',
+
+                        '-y',  # 覆盖现有文件
+
+                        '-loglevel', 'error',  # 只显示错误信息
+
+                        '-f', 'rawvideo',
+
+                        '-pix_fmt', pix_fmt,
+
+                        '-s', f'{width}x{height}',
+
+                        '-framerate', str(fps),
+
+                        '-i', '-',
+
+                        # yuv420p要求宽高为偶数
+
+                        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+
+                        '-c:v', 'libx264',
+
+                        '-crf', '23',
+
+                        '-preset', 'medium',
+
+                        '-pix_fmt', 'yuv420p',
+
+                        tmp_path
+
+                    ]
+
+                    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+                proc.stdin.write(np.ascontiguousarray(chunk).data)
+
+                pbar.update(len(chunk))
+
+        if proc is None:
+
+            return False
+
+        proc.stdin.close()
+
+        if proc.wait() != 0:
+
+            raise subprocess.CalledProcessError(proc.returncode, 'ffmpeg')
+
+        os.replace(tmp_path, video_path)
+
+        return True
+
+    finally:
+
+        if proc is not None and proc.poll() is None:
+
+            proc.kill()
+
+            proc.wait()
+
+        if os.path.exists(tmp_path):
+
+            os.remove(tmp_path)
+
+
+
+def _source_signature(hdf5_path):
+
+    stat = os.stat(hdf5_path)
+
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+
+def is_up_to_date(hdf5_path, output_dir):
+
+    """输出目录中的结果是否由当前版本的HDF5文件生成"""
+
+    marker_path = os.path.join(output_dir, DONE_MARKER)
+
+    if not os.path.exists(marker_path):
+
+        return False
+
+    try:
+
+        with open(marker_path, 'r') as f:
+
+            return json.load(f) == _source_signature(hdf5_path)
+
+    except (OSError, ValueError):
+
+        return False
+
 
 
 def visualize_hdf5(hdf5_path, output_dir="output", verbose=False):
@@ -44,6 +200,14 @@ def visualize_hdf5(hdf5_path, output_dir="output", verbose=False):
 
     os.makedirs(output_dir, exist_ok=True)
 
+    # 处理中断时不能被当作已完成
+
+    marker_path = os.path.join(output_dir, DONE_MARKER)
+
+    if os.path.exists(marker_path):
+
+        os.remove(marker_path)
+
     camera_dir = os.path.join(output_dir, "video/camera")
 
     tactile_dir = os.path.join(output_dir, "video/tactile")
@@ -134,6 +298,8 @@ def visualize_hdf5(hdf5_path, output_dir="output", verbose=False):
 
         # Read camera data - dynamically discover camera keys (support multiple naming conventions)
 
+        # 只保存dataset的引用, 保存视频时再按块读取
+
         camera_data = {}
 
         for key in f.keys():
@@ -144,15 +310,15 @@ def visualize_hdf5(hdf5_path, output_dir="output", verbose=False):
 
                 if key in f and 'color' in f[key]:
 
-                    camera_data[key] = f[key]['color'][:]
+                    camera_data[key] = f[key]['color']
 
                 elif key in f and 'rgb' in f[key]:
 
-                    camera_data[key] = f[key]['rgb'][:]
+                    camera_data[key] = f[key]['rgb']
 
                 elif key in f and 'image' in f[key]:
 
-                    camera_data[key] = f[key]['image'][:]
+                    camera_data[key] = f[key]['image']
 
        
 
@@ -164,9 +330,9 @@ def visualize_hdf5(hdf5_path, output_dir="output", verbose=False):
 
             if 'tactile' in key.lower() or 'force' in key.lower() or 'pressure' in key.lower():
 
-                if key in f:
+                if key in f and isinstance(f[key], h5py.Dataset):
 
-                    tactile_data[key] = f[key][:]
+                    tactile_data[key] = f[key]
 
        
 
@@ -324,165 +490,143 @@ def visualize_hdf5(hdf5_path, output_dir="output", verbose=False):
 
        
 
-        # 视频保存函数
-
-        def save_with_ffmpeg(frames, filename, output_path, fps=30, is_tactile=False):
-
-            """使用FFmpeg保存视频（需要系统安装FFmpeg）"""
-
-            if len(frames) == 0:
+        # 编码失败的视频, 有失败时不写入完成标记, 下次运行会重新处理
 
-                return
-
-               
+        failed_videos = []
 
-            # 创建临时目录存储帧图像
 
-            temp_dir = os.path.join(output_path, "temp_frames")
 
-            os.makedirs(temp_dir, exist_ok=True)
-
-           
-
-            # 保存所有帧为PNG图像
+        # 视频保存函数
 
-            for i, frame in enumerate(tqdm(frames, desc=f"Saving {filename} frames", disable=not verbose)):
+        def save_with_ffmpeg(chunks, filename, output_path, pix_fmt, total, fps=30):
 
-                if is_tactile:
+            """使用FFmpeg保存视频（需要系统安装FFmpeg）, 帧按块流式写入"""
 
-                    # 处理触觉数据
+            if total == 0:
 
-                    # 归一化到0-255范围
+                return
 
-                    normalized = cv2.normalize(frame, None, 0, 255, cv2.NORM_MINMAX)
+            video_path = os.path.join(output_path, f"{filename}.mp4")
 
-                    # 转换为uint8类型
+            try:
 
-                    normalized = normalized.astype(np.uint8)
+                if stream_to_ffmpeg(chunks, video_path, pix_fmt, fps=fps, total=total,
 
-                    # 应用颜色映射
+                                    desc=f"Saving {filename} frames", verbose=verbose):
 
-                    colormap = cv2.applyColorMap(normalized, cv2.COLORMAP_VIRIDIS)
+                    if verbose:
 
-                    # 放大图像以便观看 (16x16 -> 256x256)
+                        print(f"Saved video: {video_path}")
 
-                    resized = cv2.resize(colormap, (256, 256), interpolation=cv2.INTER_NEAREST)
+            except (subprocess.CalledProcessError, OSError) as e:
 
-                    # 添加标题
+                failed_videos.append(filename)
 
-                    cv2.putText(resized, f"Tactile: {filename}", (10, 30),
+                if verbose:
 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                    print(f"FFmpeg error: {e}")
 
-                    cv2.imwrite(os.path.join(temp_dir, f"frame_{i:06d}.png"), resized)
 
-                else:
 
-                    # 处理相机数据
+        def camera_chunks(dataset):
 
-                    if frame.dtype != np.uint8:
+            for start in range(0, len(dataset), CAMERA_CHUNK_SIZE):
 
-                        # 如果数据不是uint8，进行归一化
+                frames = dataset[start:start + CAMERA_CHUNK_SIZE]
 
-                        frame = cv2.normalize(frame, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+                if frames.dtype != np.uint8:
 
-                   
+                    # 如果数据不是uint8，进行归一化
 
-                    # 检查是否需要颜色空间转换
+                    frames = np.stack([cv2.normalize(frame, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8) for frame in frames])
 
-                    if len(frame.shape) == 3 and frame.shape[2] == 3:
+                yield frames
 
-                        # 假设是RGB格式，转换为BGR
 
-                        frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
 
-                    else:
+        def tactile_chunks(dataset, filename, hand_renderer=None):
 
-                        frame_bgr = frame
+            # 触觉数据按批渲染, 不逐帧调用cv2
 
-                   
+            for start in range(0, len(dataset), TACTILE_BATCH_SIZE):
 
-                    cv2.imwrite(os.path.join(temp_dir, f"frame_{i:06d}.png"), frame_bgr)
+                batch = dataset[start:start + TACTILE_BATCH_SIZE]
 
-           
+                if hand_renderer is not None:
 
-            # 使用FFmpeg创建视频
+                    yield hand_renderer.render_batch(batch)
 
-            video_path = os.path.join(output_path, f"{filename}.mp4")
-
-            cmd = [
-
-                    'ffmpeg',
+                else:
 
-                    '-y',  # 覆盖现有文件
+                    # 16x16 -> 256x256, 带标题
 
-                    '-loglevel', 'error',  # 只显示错误信息
+                    yield render_tactile_grid(batch, size=256, title=f"Tactile: {filename}")
 
-                    '-framerate', str(fps),
+       
 
-                    '-i', os.path.join(temp_dir, 'frame_%06d.png'),
+        # Save camera videos
 
-                    '-c:v', 'libx264',
+        for camera_name, camera_frames in camera_data.items():
 
-                    '-crf', '23',
+            # 假设彩色图像是RGB格式, 灰度图没有通道维度
 
-                    '-preset', 'medium',
+            if camera_frames.ndim == 4 and camera_frames.shape[3] == 3:
 
-                    '-pix_fmt', 'yuv420p',
+                pix_fmt = 'rgb24'
 
-                    video_path
+            elif camera_frames.ndim == 4 and camera_frames.shape[3] == 4:
 
-                ]
+                pix_fmt = 'bgra'
 
-           
+            elif camera_frames.ndim == 3:
 
-            try:
+                pix_fmt = 'gray'
 
-                subprocess.run(cmd, check=True)
+            else:
 
                 if verbose:
 
-                    print(f"Saved video: {video_path}")
+                    print(f"Warning: Unexpected camera data shape {camera_frames.shape} for {camera_name}")
 
-            except subprocess.CalledProcessError as e:
+                continue
 
-                if verbose:
+            save_with_ffmpeg(camera_chunks(camera_frames), f"{camera_name}_video", camera_dir, pix_fmt, len(camera_frames))
 
-                    print(f"FFmpeg error: {e}")
+       
 
-            finally:
+        # Save tactile force videos
 
-                # 清理临时文件
+        for data_type, data in tactile_data.items():
 
-                for file in os.listdir(temp_dir):
+            filename = f"tactile_{data_type}"
 
-                    os.remove(os.path.join(temp_dir, file))
+            # 确保数据是16x16矩阵
 
-                os.rmdir(temp_dir)
+            if len(data.shape) == 3 and data.shape[1] == 16 and data.shape[2] == 16:
 
-       
+                os.makedirs(tactile_dir, exist_ok=True)
 
-        # Save camera videos
+                save_with_ffmpeg(tactile_chunks(data, filename), filename, tactile_dir, 'bgr24', len(data), fps=30)
 
-        for camera_name, camera_frames in camera_data.items():
+            # 手套的触觉数据, 每帧一个向量, 按左右手的点位图渲染
 
-            if len(camera_frames) > 0:
+            elif len(data.shape) == 2 and ('left' in data_type.lower() or 'right' in data_type.lower()):
 
-                save_with_ffmpeg(camera_frames, f"{camera_name}_video", camera_dir)
+                hand = 'left' if 'left' in data_type.lower() else 'right'
 
-       
+                renderer = TactileHandRenderer(hand, width=500, height=500, draw_labels=False)
 
-        # Save tactile force videos
+                if data.shape[1] < renderer.num_sensors:
 
-        for data_type, data in tactile_data.items():
+                    if verbose:
 
-            # 确保数据是16x16矩阵
+                        print(f"Warning: Unexpected tactile data shape {data.shape} for {data_type}")
 
-            if len(data.shape) == 3 and data.shape[1] == 16 and data.shape[2] == 16:
+                    continue
 
                 os.makedirs(tactile_dir, exist_ok=True)
 
-                save_with_ffmpeg(data, f"tactile_{data_type}", tactile_dir, fps=30, is_tactile=True)
+                save_with_ffmpeg(tactile_chunks(data, filename, renderer), filename, tactile_dir, 'bgr24', len(data), fps=30)
 
             else:
 
@@ -512,6 +656,18 @@ def visualize_hdf5(hdf5_path, output_dir="output", verbose=False):
 
 
 
+    if failed_videos:
+
+        print(f"Warning: failed to save {', '.join(failed_videos)} for {hdf5_path}, it will be processed again next time")
+
+        return
+
+    with open(marker_path, 'w') as f:
+
+        json.dump(_source_signature(hdf5_path), f)
+
+
+
 def explore_hdf5_structure(hdf5_path, verbose=False):
 
     """
@@ -548,7 +704,33 @@ def explore_hdf5_structure(hdf5_path, verbose=False):
 
 
 
-def visualize_folder(folder_path, output_base_dir="output", verbose=False):
+def _visualize_file(hdf5_file, output_dir, verbose=False):
+
+    """处理单个HDF5文件, 可以在子进程中执行"""
+
+    # 首先探索文件结构
+
+    explore_hdf5_structure(hdf5_file, verbose=verbose)
+
+    if verbose:
+
+        print("\n" + "-"*50 + "\n")
+
+   
+
+    # 然后可视化数据
+
+    visualize_hdf5(hdf5_file, output_dir, verbose=verbose)
+
+   
+
+    if verbose:
+
+        print(f"✓ 文件 {os.path.basename(hdf5_file)} 处理完成")
+
+
+
+def visualize_folder(folder_path, output_base_dir="output", verbose=False, num_workers=1, force=False):
 
     """
 
@@ -562,6 +744,10 @@ def visualize_folder(folder_path, output_base_dir="output", verbose=False):
 
         output_base_dir: 输出基础目录
 
+        num_workers: 同时处理的文件数, 大于1时每个文件在单独的进程中处理
+
+        force: 为False时跳过输出已是最新的文件
+
     """
 
     if not os.path.exists(folder_path):
@@ -614,61 +800,75 @@ def visualize_folder(folder_path, output_base_dir="output", verbose=False):
 
    
 
-    # 处理每个HDF5文件（显示总体进度条）
+    # 为每个文件创建独立的输出目录
 
-    with tqdm(total=len(hdf5_files), desc="Processing HDF5 files", unit="file", disable=False) as pbar:
+    jobs = [(hdf5_file, os.path.join(output_base_dir, os.path.splitext(os.path.basename(hdf5_file))[0]))
 
-        for i, hdf5_file in enumerate(hdf5_files, 1):
+            for hdf5_file in hdf5_files]
 
-            if verbose:
+    if not force:
 
-                print(f"\n{'='*60}")
+        pending = [(hdf5_file, output_dir) for hdf5_file, output_dir in jobs if not is_up_to_date(hdf5_file, output_dir)]
 
-                print(f"处理文件 {i}/{len(hdf5_files)}: {os.path.basename(hdf5_file)}")
+        if len(pending) < len(jobs):
 
-                print(f"{'='*60}")
+            print(f"跳过 {len(jobs) - len(pending)} 个输出已是最新的文件")
 
-           
+        jobs = pending
 
-            # 为每个文件创建独立的输出目录
+   
 
-            file_name = os.path.splitext(os.path.basename(hdf5_file))[0]
+    # 处理每个HDF5文件（显示总体进度条）
 
-            output_dir = os.path.join(output_base_dir, file_name)
+    with tqdm(total=len(jobs), desc="Processing HDF5 files", unit="file", disable=False) as pbar:
 
-           
+        if num_workers <= 1:
 
-            try:
+            for i, (hdf5_file, output_dir) in enumerate(jobs, 1):
 
-                # 首先探索文件结构
+                if verbose:
 
-                explore_hdf5_structure(hdf5_file, verbose=verbose)
+                    print(f"\n{'='*60}")
 
-                if verbose:
+                    print(f"处理文件 {i}/{len(jobs)}: {os.path.basename(hdf5_file)}")
 
-                    print("\n" + "-"*50 + "\n")
+                    print(f"{'='*60}")
 
-               
+                try:
 
-                # 然后可视化数据
+                    _visualize_file(hdf5_file, output_dir, verbose=verbose)
 
-                visualize_hdf5(hdf5_file, output_dir, verbose=verbose)
+                except Exception as e:
 
-               
+                    print(f"✗ 处理文件 {os.path.basename(hdf5_file)} 时出错: {str(e)}")
 
-                if verbose:
+                finally:
 
-                    print(f"✓ 文件 {os.path.basename(hdf5_file)} 处理完成")
+                    pbar.update(1)
 
-               
+        else:
 
-            except Exception as e:
+            # 文件之间互不相关, 用有限大小的进程池并行处理, 每个进程同时只编码一个视频
+
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+
+                futures = {executor.submit(_visualize_file, hdf5_file, output_dir, verbose): hdf5_file
+
+                           for hdf5_file, output_dir in jobs}
 
-                print(f"✗ 处理文件 {os.path.basename(hdf5_file)} 时出错: {str(e)}")
+                for future in as_completed(futures):
 
-            finally:
+                    try:
 
-                pbar.update(1)
+                        future.result()
+
+                    except Exception as e:
+
+                        print(f"✗ 处理文件 {os.path.basename(futures[future])} 时出错: {str(e)}")
+
+                    finally:
+
+                        pbar.update(1)
 
    
 
@@ -838,9 +1038,25 @@ def print_files_summary(files_info, verbose=False):
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="可视化文件夹下的所有HDF5文件")
+
     # 文件夹路径
 
-    folder_path = "/root/autodl-tmp/RoboParty_pi/company_data/stack_blocks_three_real/stack_blocks_three"
+    parser.add_argument("folder_path", nargs="?",
+
+                        default="/root/autodl-tmp/RoboParty_pi/company_data/stack_blocks_three_real/stack_blocks_three")
+
+    parser.add_argument("--output_dir", type=str, default="save/output")
+
+    parser.add_argument("--num_workers", type=int, default=1, help="同时处理的文件数")
+
+    parser.add_argument("--force", action="store_true", help="重新处理输出已是最新的文件")
+
+    parser.add_argument("--quiet", action="store_true", help="不输出每个文件的详细信息")
+
+    args = parser.parse_args()
+
+    folder_path = args.folder_path
 
    
 
@@ -864,13 +1080,13 @@ if __name__ == "__main__":
 
    
 
-    # 直接批量处理（启用详细输出以便调试）
+    # 直接批量处理（默认启用详细输出以便调试）
 
     if files_info:
 
-        output_dir = "save/output"
+        visualize_folder(folder_path, args.output_dir, verbose=not args.quiet,
 
-        visualize_folder(folder_path, output_dir, verbose=True)
+                         num_workers=args.num_workers, force=args.force)
 
     else:
 
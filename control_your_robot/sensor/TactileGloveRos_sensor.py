@@ -4,7 +4,7 @@ sys.path.append("./")
 from sensor.touch_sensor import TouchSensor
 from utils.ros_subscriber import ROSSubscriber 
 from utils.data_handler import is_enter_pressed
-from utils.tactile_hand import draw
+from utils.tactile_hand import TactileDisplay, TactileHandRenderer
 import rospy
 import numpy as np
 import time
@@ -39,12 +39,15 @@ if __name__ == "__main__":
     touch_sensor = TactileGloveRosSensor("left_hand")
     touch_sensor.set_up("left_hand")
     touch_sensor.set_collect_info(["force"])
+    # 在后台线程中渲染和显示, 不阻塞采集循环
+    display = TactileDisplay(TactileHandRenderer("left").render)
 
     while True:
         data = touch_sensor.get()["force"]
         if data is not None:
-            draw("left", data)
+            display.submit(data)
             # break
         if is_enter_pressed():
             break
-        time.sleep(0.01)
\ No newline at end of file
+        time.sleep(0.01)
+    display.close()
\ No newline at end of file
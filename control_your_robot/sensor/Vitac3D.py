@@ -3,7 +3,6 @@ sys.path.append("./")
 
 from sensor.touch_sensor import TouchSensor
 import numpy as np
-import serial
 import threading
 import cv2
 import time
@@ -11,6 +10,11 @@ from scipy.ndimage import gaussian_filter
 import logging
 logger = logging.getLogger(__name__)
 
+ROWS, COLS = 16, 16
+# 数据行至少有16个数字, 比这短的行是帧结束标志
+MIN_ROW_LEN = 10
+_POW10 = 10 ** np.arange(10, dtype=np.int64)
+
 def apply_gaussian_blur(contact_map, sigma=0.1):
     return gaussian_filter(contact_map, sigma=sigma)
 
@@ -22,147 +26,243 @@ def temporal_filter(new_frame, prev_frame, alpha=0.2):
     """
     return alpha * new_frame + (1 - alpha) * prev_frame
 
+def parse_frame(block):
+    '''
+    用numpy向量化解析一帧的文本数据, 不逐行split/int
+    输入:
+    block: 16行以空格分隔的十进制数, np.ndarray[uint8]
+    输出:
+    (16, 16)的int16数组, 格式不对时返回None
+    '''
+    is_digit = (block >= 48) & (block <= 57)
+    prev_digit = np.concatenate(([False], is_digit[:-1]))
+    next_digit = np.concatenate((is_digit[1:], [False]))
+    starts = is_digit & ~prev_digit
+    ends = np.flatnonzero(is_digit & ~next_digit)
+    if ends.size != ROWS * COLS:
+        return None
+    # 每行必须正好有16个数
+    row_of_token = np.cumsum(block == 10)[starts]
+    if np.any(np.bincount(row_of_token, minlength=ROWS) != COLS):
+        return None
+
+    digit_pos = np.flatnonzero(is_digit)
+    token = np.cumsum(starts)[digit_pos] - 1
+    power = ends[token] - digit_pos
+    if power.max() >= len(_POW10):
+        return None
+    values = np.bincount(token, weights=(block[digit_pos] - 48) * _POW10[power], minlength=ROWS * COLS)
+    return values.reshape(ROWS, COLS).astype(np.int16)
+
+def parse_frames(data, size):
+    '''
+    从缓冲区中解析所有完整的帧
+    输入:
+    data: 接收缓冲区, bytearray
+    size: 缓冲区中有效数据的长度, int
+    输出:
+    frames: 解析出的帧, List[np.ndarray]
+    consumed: 已处理的字节数, 之后的数据属于还不完整的帧, int
+    '''
+    buf = np.frombuffer(data, dtype=np.uint8, count=size)
+    line_ends = np.flatnonzero(buf == 10)
+    if line_ends.size == 0:
+        return [], 0
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    delimiters = np.flatnonzero(line_ends - line_starts < MIN_ROW_LEN)
+
+    frames = []
+    prev = -1
+    for d in delimiters:
+        # 两个结束标志之间正好有16行时才是完整的帧, 开头被截断的帧会被丢弃
+        if d - prev - 1 == ROWS:
+            frame = parse_frame(buf[line_starts[prev + 1]:line_ends[d - 1]])
+            if frame is not None:
+                frames.append(frame)
+            else:
+                logger.debug("Data parsing error: malformed frame")
+        prev = d
+    consumed = int(line_ends[delimiters[-1]]) + 1 if delimiters.size else 0
+    return frames, consumed
+
+def make_fake_stream(num_frames=100, seed=0):
+    '''
+    生成与Vitac3D串口输出格式相同的数据, 用于ReplaySerial回放和测试
+    '''
+    rng = np.random.default_rng(seed)
+    base = rng.integers(20, 40, size=(ROWS, COLS))
+    yy, xx = np.mgrid[:ROWS, :COLS]
+    chunks = []
+    for i in range(num_frames):
+        # 一个来回移动的按压点
+        cy, cx = 8 + 5 * np.sin(i / 10), 8 + 5 * np.cos(i / 10)
+        press = 80 * np.exp(-((yy - cy) ** 2 + (xx - cx) ** 2) / 8)
+        frame = base + press + rng.integers(0, 3, size=(ROWS, COLS))
+        rows = [" ".join(str(int(v)) for v in row) for row in frame]
+        chunks.append("\r\n".join(rows) + "\r\n\r\n")
+    return "".join(chunks).encode()
+
 class Vitac3D(TouchSensor):
     #[paper](https://arxiv.org/pdf/2410.24091)
     #[hardware code](https://github.com/binghao-huang/3D-ViTac_Tactile_Hardware.git)
-    def __init__(self,name):
+    def __init__(self,name, buffer_size=256):
         super().__init__()
         self.name = name
-        
+
         self.THRESHOLD =12
         self.NOISE_SCALE =60
+        self.INIT_FRAMES = 30
         self.baud=2000000
-        
+        self.READ_BUFFER_SIZE = 1 << 16
+        # 每次至少等待这么多字节再解析, 一帧约800字节, 在2M波特率下约等待2.5ms
+        self.MIN_READ_SIZE = 512
+        self.is_show = False
+
 
-        self.current_data = np.zeros((16, 16), dtype=np.uint8)  # 存储处理好的uint8数据
+        self.current_data = np.zeros((ROWS, COLS), dtype=np.uint8)  # 存储处理好的uint8数据
         self.processed_data = None  # 存储滤波后的浮点数据
         self.median = None  # 存储初始化的中值
         self.initialized = False  # 初始化完成标志
         self.lock = threading.Lock()  # 线程锁保护共享数据
         self.exit_flag = threading.Event()
-        
-    def set_up(self, PORT,is_show):
-        """设置串口"""
+
+        # 带时间戳的环形缓冲区, 保存最近buffer_size帧
+        self.buffer_size = buffer_size
+        self.frame_buffer = np.zeros((buffer_size, ROWS, COLS), dtype=np.uint8)
+        self.time_buffer = np.zeros(buffer_size, dtype=np.int64)
+        self.frame_count = 0
+
+    def set_up(self, PORT,is_show, serial_device=None):
+        """
+        设置串口
+        serial_device: 替代真实串口的设备, 如utils.replay_serial.ReplaySerial, 为None时打开PORT
+        """
         self.is_show = is_show
-        self.serDev = serial.Serial(PORT, self.baud, timeout=1)
+        if serial_device is None:
+            import serial
+            self.serDev = serial.Serial(PORT, self.baud, timeout=0.1)
+        else:
+            self.serDev = serial_device
         if not self.serDev.is_open:
             raise Exception(f"无法打开串口: {PORT}")
         print(f"3DVitac sensor set up on {PORT}")
-        self.serDev.flush()
-        if self.is_show:          
-            cv2.namedWindow("Contact Data_left", cv2.WINDOW_NORMAL)
-            cv2.resizeWindow("Contact Data_left", 480, 480)  # 直接使用480×480尺寸
+        self.serDev.reset_input_buffer()
+        if self.is_show:
+            cv2.namedWindow(f"Contact Data_{self.name}", cv2.WINDOW_NORMAL)
+            cv2.resizeWindow(f"Contact Data_{self.name}", 480, 480)  # 直接使用480×480尺寸
         print(f"{self.name} sensor set up complete on {PORT}")
         self.thread = threading.Thread(target=self.readThread)
         self.thread.daemon = True
         self.thread.start()
         print(f"wait {self.name} sensor initialized")
         while not self.initialized:
+            if not self.thread.is_alive():
+                raise Exception(f"{self.name} sensor reading thread stopped before initialization")
             time.sleep(0.1)
-        
-        
-        
+
     def readThread(self):
-        data_tac = []
-        current = []
-        frame_count = 0
-        INIT_FRAMES = 30
-        
+        '''
+        读取线程: 阻塞等待串口数据(有超时, 不空转), 读入可复用的缓冲区, 按整帧向量化解析
+        '''
+        buf = bytearray(self.READ_BUFFER_SIZE)
+        view = memoryview(buf)
+        size = 0
+        init_frames = []
+        prev_frame = np.zeros((ROWS, COLS))
+
         print(f"{self.name} sensor reading thread started")
-        
-        while not self.initialized and not self.exit_flag.is_set():
-            if self.serDev.in_waiting > 0:
-                try:
-                    line = self.serDev.readline().decode('utf-8', errors='ignore').strip()
-                except Exception as e:
-                    logger.error(f"Decode error: {e}")
-                    continue
-                
-                # 关键帧结束检测逻辑
-                if len(line) < 10:
-                    if len(current) == 16:
-                        try:
-                            frame = np.array(current, dtype=np.int16)
-                            data_tac.append(frame)
-                            frame_count += 1
-                            
-                            if frame_count >= INIT_FRAMES:
-                                with self.lock:
-                                    self.median = np.median(data_tac, axis=0)
-                                    self.initialized = True
-                                    print(f"{self.name} initialization complete with {frame_count} frames")
-                        except Exception as e:
-                            logger.error(f"Frame processing error: {e}")
-                    current = []
-                    continue
-                
-                # 解析数据行
-                try:
-                    str_values = line.split()
-                    if len(str_values) != 16:
-                        continue
-                    
-                    int_values = [int(val) for val in str_values]
-                    current.append(int_values)
-                except Exception as e:
-                    logger.error(f"Data parsing error: {e}")
-                    continue
-        
-        # 实时处理阶段
-        prev_frame = np.zeros((16, 16))
-        print(f"{self.name} entering real-time processing")
-        
         while not self.exit_flag.is_set():
-            if self.serDev.in_waiting > 0:
-                try:
-                    line = self.serDev.readline().decode('utf-8', errors='ignore').strip()
-                except:
-                    continue
-                
-                # 帧结束检测
-                if len(line) < 10:
-                    if len(current) == 16:
-                        try:
-                            frame = np.array(current, dtype=np.int16)
-                            
-                            # 数据处理流程
-                            contact_data = frame - self.median - self.THRESHOLD
-                            contact_data = np.clip(contact_data, 0, 100)
-                            
-                            if np.max(contact_data) < self.THRESHOLD:
-                                contact_data_norm = contact_data / self.NOISE_SCALE
-                            else:
-                                contact_data_norm = contact_data / np.max(contact_data)
-                            
-                            # 应用时间滤波
-                            filtered_data = temporal_filter(contact_data_norm, prev_frame)
-                            prev_frame = filtered_data
-                            
-                            # 转换为uint8并存储
-                            data_scaled = (filtered_data * 255).astype(np.uint8)
-                            
-                            with self.lock:
-                                self.current_data = data_scaled
-                                self.processed_data = filtered_data
-                        except Exception as e:
-                            logger.error(f"Real-time processing error: {e}")
-                    
-                    current = []
-                    continue
-                
-                # 解析数据行
-                try:
-                    str_values = line.split()
-                    if len(str_values) != 16:
-                        continue
-                    
-                    int_values = [int(val) for val in str_values]
-                    current.append(int_values)
-                except:
+            try:
+                # 阻塞到至少有MIN_READ_SIZE个字节或超时, 不空转, 也不为几个字节解析一次
+                want = min(max(self.serDev.in_waiting, self.MIN_READ_SIZE), len(buf) - size)
+                n = self.serDev.readinto(view[size:size + want])
+            except Exception as e:
+                if self.exit_flag.is_set():
+                    break
+                logger.error(f"Serial read error: {e}")
+                time.sleep(0.1)
+                continue
+            if not n:
+                continue
+            timestamp = time.time_ns()
+            size += n
+
+            frames, consumed = parse_frames(buf, size)
+            if consumed:
+                buf[:size - consumed] = buf[consumed:size]
+                size -= consumed
+            elif size == len(buf):
+                # 缓冲区满了还没有帧结束标志, 说明数据有误, 丢弃
+                logger.error("Frame processing error: no frame delimiter found")
+                size = 0
+
+            for frame in frames:
+                if not self.initialized:
+                    init_frames.append(frame)
+                    if len(init_frames) >= self.INIT_FRAMES:
+                        with self.lock:
+                            self.median = np.median(init_frames, axis=0)
+                            self.initialized = True
+                        print(f"{self.name} initialization complete with {len(init_frames)} frames")
+                        print(f"{self.name} entering real-time processing")
                     continue
+                prev_frame = self._process_frame(frame, prev_frame, timestamp)
+
+    def _process_frame(self, frame, prev_frame, timestamp):
+        # 数据处理流程
+        contact_data = frame - self.median - self.THRESHOLD
+        contact_data = np.clip(contact_data, 0, 100)
+
+        if np.max(contact_data) < self.THRESHOLD:
+            contact_data_norm = contact_data / self.NOISE_SCALE
+        else:
+            contact_data_norm = contact_data / np.max(contact_data)
+
+        # 应用时间滤波
+        filtered_data = temporal_filter(contact_data_norm, prev_frame)
 
-    def get_touch(self):
+        # 转换为uint8并存储
+        data_scaled = (filtered_data * 255).astype(np.uint8)
+
+        with self.lock:
+            self.current_data = data_scaled
+            self.processed_data = filtered_data
+            index = self.frame_count % self.buffer_size
+            self.frame_buffer[index] = data_scaled
+            self.time_buffer[index] = timestamp
+            self.frame_count += 1
+        return filtered_data
+
+    def get_window(self, num_frames, timestamp=None):
+        '''
+        获取缓冲区中的连续多帧
+        输入:
+        num_frames: 帧数, 不能超过buffer_size, int
+        timestamp: 对齐的时间(time.time_ns()), 返回不晚于该时间的最近num_frames帧, 为None时返回最新的帧, int
+        输出:
+        timestamps: (n,) int64, frames: (n, 16, 16) uint8, 按时间顺序排列, 帧数不足时n < num_frames
+        '''
+        num_frames = min(num_frames, self.buffer_size)
+        with self.lock:
+            count = self.frame_count
+            # 缓冲区中最旧到最新的帧
+            order = np.arange(max(count - self.buffer_size, 0), count) % self.buffer_size
+            times = self.time_buffer[order]
+            end = len(order) if timestamp is None else int(np.searchsorted(times, timestamp, side="right"))
+            index = order[max(end - num_frames, 0):end]
+            return self.time_buffer[index].copy(), self.frame_buffer[index].copy()
+
+    def get_touch(self, num_frames=None, timestamp=None):
+        '''
+        num_frames为None时返回最新一帧, 否则返回与timestamp对齐的num_frames帧(见get_window)
+        '''
         tac_data = {}
+        if num_frames is not None:
+            times, frames = self.get_window(num_frames, timestamp)
+            if "force" in self.collect_info:
+                tac_data["force"] = frames
+            tac_data["frame_timestamps"] = times
+            return tac_data
         with self.lock:
             data = self.current_data.copy()
             processed = self.processed_data.copy() if self.processed_data is not None else None
@@ -173,16 +273,22 @@ class Vitac3D(TouchSensor):
             # 重新缩放为0-255（如果经过滤波可能超出范围）
             display_data = (processed * 255).astype(np.uint8) if processed is not None else data
             colormap = cv2.applyColorMap(display_data, cv2.COLORMAP_VIRIDIS)
-            cv2.imshow("Contact Data_left", colormap)
+            cv2.imshow(f"Contact Data_{self.name}", colormap)
             cv2.waitKey(1)
         # 返回触摸数据
         return tac_data
     def close(self):
+        if self.exit_flag.is_set():
+            return
         self.exit_flag.set()
-        if self.serDev.is_open:
-            self.serDev.close()
+        serDev = getattr(self, "serDev", None)
+        if serDev is not None and serDev.is_open:
+            serDev.close()
+        if getattr(self, "thread", None) is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
         if self.is_show:
             cv2.destroyWindow(f"Contact Data_{self.name}")
+            self.is_show = False
         print(f"{self.name} sensor closed")
     def __del__(self):
         self.close()
@@ -190,10 +296,10 @@ if __name__ == "__main__":
     tac=Vitac3D("leftarm_left_tac")
     tac.set_up("/dev/ttyUSB0",is_show=True)
 
-    tac.set_collect_info("force")
-    
+    tac.set_collect_info(["force"])
+
     for i in range(1000):
         print(i)
         data = tac.get_touch()
-        
-        time.sleep(1/30)
\ No newline at end of file
+
+        time.sleep(1/30)
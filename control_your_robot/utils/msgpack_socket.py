@@ -0,0 +1,241 @@
+import socket
+import struct
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
+from threading import Thread, Event, Lock
+
+from openpi_client import msgpack_numpy
+
+from utils.data_handler import debug_print
+
+# 帧头: 负载长度(uint32), 请求id(uint64), 帧类型(uint8)
+_HEADER = struct.Struct("!IQB")
+# 帧类型: 普通消息(与BiSocket.send相同), 请求, 请求的回复, 请求的handler报错
+_MESSAGE, _REQUEST, _REPLY, _ERROR = range(4)
+
+
+class MsgpackSocket:
+    '''
+    BiSocket的替代, 接口与BiSocket相同, 区别在于:
+    1. 使用openpi_client.msgpack_numpy序列化, 不使用pickle, 对numpy数组更快也更安全
+    2. 接收时recv_into到预先分配并按需扩容的缓冲区, 不会反复拼接bytes
+    3. 支持带请求id的request(), 可以同时有多个请求在等待回复
+    4. stats()返回吞吐量和延迟统计
+    注意: 两端必须都使用MsgpackSocket, 不能与BiSocket混用
+    '''
+    def __init__(self, conn: socket.socket, handler=None, send_back=False, num_workers=1, buffer_size=1 << 20):
+        '''
+        输入:
+        conn: 用于通讯的套接字, 要先初始化套接字连接的(ip, port), socket::socket
+        handler: 收到消息或请求后会执行该函数, 函数输入为Dict[Any], 只发请求不收消息时可以为None, function
+        send_back: 如果开启senback就会在执行完handler后将返回值发给信息发送方, request()的请求总会收到回复, bool
+        num_workers: 执行handler的线程数, 为1时按接收顺序执行, int
+        buffer_size: 接收缓冲区的初始大小, 收到更大的消息时会自动扩容, int
+        '''
+        self.conn = conn
+        self.handler = handler
+        self.send_back = send_back
+        self.running = Event()
+        self.running.set()
+
+        try:
+            # 帧头和负载分两次发送, 关闭Nagle算法避免负载被延迟
+            self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+
+        self._buffer = bytearray(buffer_size)
+        self._header = bytearray(_HEADER.size)
+        self._packer = msgpack_numpy.Packer()
+        self._send_lock = Lock()
+
+        self._request_ids = count(1)
+        self._pending = {}
+        self._pending_lock = Lock()
+
+        self._stats_lock = Lock()
+        self._start_time = time.monotonic()
+        self._counters = {
+            "messages_sent": 0,
+            "messages_received": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+            "recv_time": 0.0,
+            "unpack_time": 0.0,
+            "requests_done": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+        }
+
+        # handler在单独的线程中执行, 执行时可以继续接收下一条消息
+        self._executor = ThreadPoolExecutor(max_workers=num_workers)
+        self.receiver_thread = Thread(target=self._recv_loop, daemon=True)
+        self.receiver_thread.start()
+
+    def send(self, data):
+        '''
+        发送信息, 不等待回复:
+        data: 发送的信息, Dict[Any]
+        '''
+        self._send_frame(0, _MESSAGE, data)
+
+    def request(self, data) -> Future:
+        '''
+        发送请求, 返回Future, 对方执行handler后Future得到handler的返回值
+        可以连续发送多个请求而不等待回复
+        data: 发送的信息, Dict[Any]
+        '''
+        future = Future()
+        request_id = next(self._request_ids)
+        future.send_time = time.monotonic()
+        with self._pending_lock:
+            self._pending[request_id] = future
+        if not self._send_frame(request_id, _REQUEST, data):
+            self._fail(request_id, ConnectionError("Send failed."))
+        return future
+
+    def send_and_wait_reply(self, data, timeout=None):
+        '''
+        发送请求并等待回复:
+        data: 发送的信息, Dict[Any]
+        timeout: 超时时间(秒), 超时抛出concurrent.futures.TimeoutError, float
+        输出:
+        对方handler的返回值
+        '''
+        return self.request(data).result(timeout=timeout)
+
+    def stats(self):
+        '''
+        返回通讯统计:
+        吞吐量(MB/s), 消息数, 平均每条消息的recv与反序列化耗时(ms), request()的平均/最大往返延迟(ms)
+        '''
+        with self._stats_lock:
+            c = dict(self._counters)
+        elapsed = max(time.monotonic() - self._start_time, 1e-9)
+        received = max(c["messages_received"], 1)
+        with self._pending_lock:
+            in_flight = len(self._pending)
+        return {
+            "messages_sent": c["messages_sent"],
+            "messages_received": c["messages_received"],
+            "send_mb_per_s": c["bytes_sent"] / elapsed / 1e6,
+            "recv_mb_per_s": c["bytes_received"] / elapsed / 1e6,
+            "recv_ms": c["recv_time"] / received * 1000,
+            "unpack_ms": c["unpack_time"] / received * 1000,
+            "requests_done": c["requests_done"],
+            "requests_in_flight": in_flight,
+            "latency_ms": c["latency_total"] / max(c["requests_done"], 1) * 1000,
+            "latency_max_ms": c["latency_max"] * 1000,
+        }
+
+    def close(self):
+        '''
+        关闭连接, 未收到回复的请求会抛出ConnectionError
+        '''
+        if self.running.is_set():
+            self.running.clear()
+            try:
+                self.conn.shutdown(socket.SHUT_RDWR)
+            except Exception:
+                pass
+            self.conn.close()
+            self._executor.shutdown(wait=False)
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(ConnectionError("Connection closed."))
+            debug_print("MsgpackSocket", "Connection closed.", "INFO")
+
+    def _send_frame(self, request_id, kind, data):
+        try:
+            with self._send_lock:
+                payload = self._packer.pack(data)
+                self.conn.sendall(_HEADER.pack(len(payload), request_id, kind))
+                self.conn.sendall(payload)
+        except Exception as e:
+            debug_print("MsgpackSocket", f"Send failed: {e}", "ERROR")
+            self.close()
+            return False
+        with self._stats_lock:
+            self._counters["messages_sent"] += 1
+            self._counters["bytes_sent"] += _HEADER.size + len(payload)
+        return True
+
+    def _recv_into(self, view):
+        received = 0
+        while received < len(view):
+            n = self.conn.recv_into(view[received:])
+            if n == 0:
+                raise ConnectionError("Remote side closed connection.")
+            received += n
+
+    def _recv_frame(self):
+        self._recv_into(memoryview(self._header))
+        length, request_id, kind = _HEADER.unpack(self._header)
+        if length > len(self._buffer):
+            self._buffer = bytearray(max(length, 2 * len(self._buffer)))
+
+        start_time = time.monotonic()
+        view = memoryview(self._buffer)[:length]
+        self._recv_into(view)
+        recv_done = time.monotonic()
+        # 反序列化得到的数组不引用缓冲区, 缓冲区可以直接用于下一条消息
+        message = msgpack_numpy.unpackb(view)
+        view.release()
+
+        with self._stats_lock:
+            self._counters["messages_received"] += 1
+            self._counters["bytes_received"] += _HEADER.size + length
+            self._counters["recv_time"] += recv_done - start_time
+            self._counters["unpack_time"] += time.monotonic() - recv_done
+        return request_id, kind, message
+
+    def _recv_loop(self):
+        try:
+            while self.running.is_set():
+                request_id, kind, message = self._recv_frame()
+                if kind in (_REPLY, _ERROR):
+                    self._resolve(request_id, kind, message)
+                else:
+                    self._executor.submit(self._handle, request_id, kind, message)
+        except Exception as e:
+            if self.running.is_set():
+                debug_print("MsgpackSocket", f"Recv error: {e}", "WARNING")
+        finally:
+            self.close()
+
+    def _handle(self, request_id, kind, message):
+        try:
+            reply = self.handler(message)
+        except Exception as e:
+            debug_print("MsgpackSocket", f"Handler error: {e}", "ERROR")
+            if kind == _REQUEST:
+                self._send_frame(request_id, _ERROR, f"{type(e).__name__}: {e}")
+            return
+        if kind == _REQUEST:
+            self._send_frame(request_id, _REPLY, reply)
+        elif self.send_back:
+            self.send(reply)
+            debug_print("MsgpackSocket", "Sent back response.", "DEBUG")
+
+    def _resolve(self, request_id, kind, message):
+        with self._pending_lock:
+            future = self._pending.pop(request_id, None)
+        if future is None:
+            return
+        latency = time.monotonic() - future.send_time
+        with self._stats_lock:
+            self._counters["requests_done"] += 1
+            self._counters["latency_total"] += latency
+            self._counters["latency_max"] = max(self._counters["latency_max"], latency)
+        if kind == _ERROR:
+            future.set_exception(RuntimeError(f"Remote handler error: {message}"))
+        else:
+            future.set_result(message)
+
+    def _fail(self, request_id, error):
+        with self._pending_lock:
+            future = self._pending.pop(request_id, None)
+        if future is not None:
+            future.set_exception(error)
@@ -0,0 +1,110 @@
+import time
+from threading import Lock
+
+
+class ReplaySerial:
+    '''
+    可回放的假串口, 接口为pyserial.Serial的子集(in_waiting, read, readinto, readline, reset_input_buffer, close)
+    数据按波特率的速度"到达", 读取时和真实串口一样阻塞等待数据或超时, 可以用来在没有硬件时测试和benchmark传感器读取
+    '''
+    def __init__(self, data: bytes, baudrate=2000000, timeout=1, loop=True, realtime=True):
+        '''
+        输入:
+        data: 回放的数据, 可以是录制的串口数据, bytes
+        baudrate: 波特率, 每个字节按10个bit计算, int
+        timeout: 读取的超时时间(秒), float
+        loop: 数据播放完后是否从头循环播放, bool
+        realtime: 为False时数据立即全部可读, 用于测量解析速度, bool
+        '''
+        if not data:
+            raise ValueError("ReplaySerial needs data to replay.")
+        self.data = bytes(data)
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.loop = loop
+        self.realtime = realtime
+        self.is_open = True
+        self._bytes_per_second = baudrate / 10
+        self._start_time = time.monotonic()
+        self._pos = 0
+        self._lock = Lock()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        '''
+        回放录制的串口数据文件(例如 cat /dev/ttyUSB0 > record.bin 得到的原始数据)
+        '''
+        with open(path, "rb") as f:
+            return cls(f.read(), **kwargs)
+
+    def _arrived(self):
+        if self.realtime:
+            arrived = int((time.monotonic() - self._start_time) * self._bytes_per_second)
+        else:
+            arrived = self._pos + len(self.data)
+        return arrived if self.loop else min(arrived, len(self.data))
+
+    @property
+    def in_waiting(self):
+        return self._arrived() - self._pos
+
+    def _wait_for(self, size):
+        '''阻塞到有size个字节可读或超时, 返回可读的字节数'''
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while self.is_open:
+            available = self.in_waiting
+            if available >= size:
+                return size
+            if not self.realtime or (not self.loop and self._arrived() == len(self.data)):
+                return available
+            # 按波特率计算剩余数据到达的时间, 一次sleep到位, 不空转
+            wait = (size - available) / self._bytes_per_second
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return available
+                wait = min(wait, remaining)
+            time.sleep(max(wait, 1e-4))
+        raise OSError("ReplaySerial is closed.")
+
+    def _take(self, size):
+        start = self._pos % len(self.data)
+        chunks = []
+        while size > 0:
+            chunk = self.data[start:start + size]
+            chunks.append(chunk)
+            size -= len(chunk)
+            start = 0
+        self._pos += sum(len(c) for c in chunks)
+        return b"".join(chunks)
+
+    def read(self, size=1):
+        with self._lock:
+            return self._take(self._wait_for(size))
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def readline(self):
+        line = b""
+        while not line.endswith(b"\n"):
+            data = self.read(1)
+            if not data:
+                break
+            line += data
+        return line
+
+    def write(self, data):
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._pos = self._arrived()
+
+    def close(self):
+        self.is_open = False
@@ -1,3 +1,6 @@
+import queue
+import threading
+
 import cv2
 import numpy as np
 
@@ -322,34 +325,202 @@ left_mapping = {
     143: (0.861, 0.237),
 }
 
-# 创建一张白色背景图
 img_height = 1000
 img_width = 1000
-img = np.ones((img_height, img_width, 3), dtype=np.uint8) * 255
+
+
+class TactileHandRenderer:
+    '''
+    把手套的触觉数据画成手形图, 与原来逐点cv2.circle/putText的效果相同
+    点的位置和编号文字只在初始化时画一次, 之后每帧只用数组索引把力的颜色填进预先算好的像素
+    '''
+    def __init__(self, hand: str, width=img_width, height=img_height, radius=5, draw_labels=True):
+        '''
+        输入:
+        hand: "left"或"right", str
+        width, height: 输出图像的尺寸, 坐标按比例缩放, int
+        radius: 点的半径(像素), int
+        draw_labels: 是否画传感器编号, bool
+        '''
+        mapping = left_mapping if hand == "left" else right_mapping
+        self.width, self.height = width, height
+
+        points, sensors = [], []
+        for key, value in mapping.items():
+            for pt in (value if isinstance(value, list) else [value]):
+                points.append((int(pt[0] * width), int(pt[1] * height)))
+                sensors.append(key - 1)
+        self.sensor_index = np.array(sensors)
+        self.num_sensors = int(self.sensor_index.max()) + 1
+
+        # 按原来的顺序(点i, 编号i, 点i+1, ...)模拟一次绘制, 记录每个像素最后被哪个点覆盖,
+        # 以及之后画上的编号文字(带抗锯齿)让它保留多少颜色
+        self.background = np.full((height, width, 3), 255, dtype=np.uint8)
+        point_index = np.full((height, width), -1, dtype=np.int32)
+        keep = np.ones((height, width), dtype=np.float32)
+        patch = np.zeros((2 * radius + 3, 2 * radius + 3), dtype=np.uint8)
+        cv2.circle(patch, (radius + 1, radius + 1), radius, 1, thickness=-1)
+        dy, dx = np.nonzero(patch)
+        dy, dx = dy - radius - 1, dx - radius - 1
+        text_alpha = np.zeros((height, width), dtype=np.uint8)
+        for i, ((x, y), sensor) in enumerate(zip(points, sensors)):
+            ys, xs = y + dy, x + dx
+            valid = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+            point_index[ys[valid], xs[valid]] = i
+            keep[ys[valid], xs[valid]] = 1
+            if draw_labels:
+                label = str(sensor + 1)
+                cv2.putText(self.background, label, (x+5, y-5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
+                cv2.putText(text_alpha, label, (x+5, y-5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, 255, 1)
+                (w, h), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
+                top, left = max(y - 5 - h - 2, 0), max(x + 5 - 2, 0)
+                region = text_alpha[top:y - 5 + baseline + 2, left:x + 5 + w + 2]
+                keep[top:top + region.shape[0], left:left + region.shape[1]] *= 1 - region / 255
+                region[:] = 0
+        self.pixels = np.flatnonzero(point_index >= 0)
+        self.pixel_sensor = self.sensor_index[point_index.flat[self.pixels]]
+        self.pixel_keep = np.rint(keep.flat[self.pixels] * 255).astype(np.int32)
+
+    def _colors(self, force_maps):
+        # 力越大红色越深, 与原来的 (0, 0, max(0, 255 - force)) 相同
+        forces = np.asarray(force_maps)[..., self.pixel_sensor].astype(np.int32)
+        colors = np.clip(255 - forces, 0, 255)
+        return ((colors * self.pixel_keep + 127) // 255).astype(np.uint8)
+
+    def render(self, force_map, out=None):
+        '''
+        输入:
+        force_map: 一帧触觉数据, 一维数组, 长度不少于最大的传感器编号
+        out: 可选的输出图像, 反复使用可以避免每帧分配内存, (H, W, 3) uint8
+        输出:
+        BGR图像, (H, W, 3) uint8
+        '''
+        if out is None:
+            out = self.background.copy()
+        else:
+            out[:] = self.background
+        flat = out.reshape(-1, 3)
+        flat[self.pixels, :2] = 0
+        flat[self.pixels, 2] = self._colors(force_map)
+        return out
+
+    def render_batch(self, force_maps):
+        '''
+        一次渲染多帧, force_maps: (T, N), 输出 (T, H, W, 3) uint8
+        '''
+        out = np.repeat(self.background[None], len(force_maps), axis=0)
+        flat = out.reshape(len(force_maps), -1, 3)
+        flat[:, self.pixels, :2] = 0
+        flat[:, self.pixels, 2] = self._colors(force_maps)
+        return out
+
+
+_VIRIDIS = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), cv2.COLORMAP_VIRIDIS).reshape(256, 3)
+
+
+def render_tactile_grid(frames, size=256, title=None):
+    '''
+    批量渲染矩阵形式的触觉数据(例如Vitac3D的16x16), 每帧单独归一化到0-255后上色并放大
+    输入:
+    frames: (T, H, W)
+    size: 输出边长, 需要是H和W的整数倍, int
+    title: 可选的标题文字, str
+    输出:
+    (T, size, size, 3) uint8 BGR图像
+    '''
+    frames = np.asarray(frames)
+    # 与cv2.normalize一致: 整数输入四舍五入, 浮点输入转uint8时截断
+    rounding = np.rint if np.issubdtype(frames.dtype, np.integer) else np.floor
+    frames = frames.astype(np.float32)
+    low = frames.min(axis=(1, 2), keepdims=True)
+    span = frames.max(axis=(1, 2), keepdims=True) - low
+    normalized = np.divide(frames - low, span, out=np.zeros_like(frames), where=span > 0)
+    colored = _VIRIDIS[rounding(normalized * 255).astype(np.uint8)]
+    scale_y, scale_x = size // frames.shape[1], size // frames.shape[2]
+    colored = colored.repeat(scale_y, axis=1).repeat(scale_x, axis=2)
+    if title is not None:
+        # 文字只画一次, 再按抗锯齿的覆盖度混合到所有帧上
+        text = np.zeros(colored.shape[1:3], dtype=np.uint8)
+        cv2.putText(text, title, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 255, 2)
+        ys, xs = np.nonzero(text)
+        alpha = text[ys, xs, None].astype(np.int32)
+        colored[:, ys, xs] = (colored[:, ys, xs] * (255 - alpha) + 255 * alpha + 127) // 255
+    return colored
+
+
+class TactileDisplay:
+    '''
+    在后台线程中渲染, 显示和录制触觉图像, 调用方的循环只需要把数据放进队列, 不会被imshow/waitKey阻塞
+    显示只显示最新的一帧; 只显示不录制时, 队列满了会丢弃最旧的帧
+    录制时队列不限长度(队列中是原始数据, 很小), 每一帧都会写入视频
+    '''
+    def __init__(self, render, window_name="mapping_points.png", record_path=None, fps=30, max_queue=32):
+        '''
+        输入:
+        render: 把一帧数据渲染成BGR图像的函数, 例如TactileHandRenderer("left").render, function
+        window_name: 显示窗口的名称, 为None时不显示, str
+        record_path: 录制的视频路径(.mp4), 为None时不录制, str
+        fps: 录制视频的帧率, int
+        max_queue: 只显示时的队列长度, int
+        '''
+        self.render = render
+        self.window_name = window_name
+        self.record_path = record_path
+        self.fps = fps
+        self.writer = None
+        self.dropped = 0
+        self.queue = queue.Queue(maxsize=max_queue if record_path is None else 0)
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, data):
+        '''放入一帧数据, 不阻塞'''
+        while True:
+            try:
+                self.queue.put_nowait(np.array(data, copy=True))
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _loop(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            image = self.render(data)
+            if self.record_path is not None:
+                if self.writer is None:
+                    self.writer = cv2.VideoWriter(self.record_path, cv2.VideoWriter_fourcc(*"mp4v"),
+                                                  self.fps, (image.shape[1], image.shape[0]))
+                self.writer.write(image)
+            # 落后时跳过显示, 只显示最新的帧
+            if self.window_name is not None and self.queue.empty():
+                cv2.imshow(self.window_name, image)
+                cv2.waitKey(1)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.writer is not None:
+            self.writer.release()
+        if self.window_name is not None:
+            cv2.destroyWindow(self.window_name)
+
+
+_renderers = {}
+_images = {}
+
 
 # 画每个点
 def draw(hand:str, force_map):
-    if hand == "left":
-        map = left_mapping
-    else:
-        map = right_mapping
-    
-    for key, value in map.items():
-        if isinstance(value, list):
-            points = value
-        else:
-            points = [value]
-        
-        for pt in points:
-            # 将归一化坐标 (0~1) 转换为图像坐标
-            x = int(pt[0] * img_width)
-            y = int(pt[1] * img_height)
-
-            color_intensity = max(0, 255 - int(force_map[key - 1]))
-
-            cv2.circle(img, (x, y), radius=5, color=(0, 0, color_intensity), thickness=-1)
-            cv2.putText(img, str(key), (x+5, y-5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
-    
+    if hand not in _renderers:
+        _renderers[hand] = TactileHandRenderer(hand)
+    img = _renderers[hand].render(force_map, out=_images.get(hand))
+    _images[hand] = img
+
     cv2.imshow('mapping_points.png', img)
     cv2.waitKey(1)
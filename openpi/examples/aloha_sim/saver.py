@@ -1,40 +1,71 @@
 import logging
 import pathlib
+import queue
+import threading
 
 import imageio
 import numpy as np
 from openpi_client.runtime import subscriber as _subscriber
 from typing_extensions import override
 
+_END_OF_EPISODE = None
+
 
 class VideoSaver(_subscriber.Subscriber):
-    """Saves episode data."""
+    """Saves episode data.
+
+    Frames are encoded while the episode runs, on a worker thread that appends them to the video file. At most
+    `max_queued_frames` frames are held in memory at any time, independently of the episode length.
+    """
 
-    def __init__(self, out_dir: pathlib.Path, subsample: int = 1) -> None:
+    def __init__(self, out_dir: pathlib.Path, subsample: int = 1, max_queued_frames: int = 100) -> None:
         out_dir.mkdir(parents=True, exist_ok=True)
         self._out_dir = out_dir
-        self._images: list[np.ndarray] = []
         self._subsample = subsample
+        self._frames: queue.Queue = queue.Queue(maxsize=max_queued_frames)
+        self._step = 0
+        self._thread: threading.Thread | None = None
 
     @override
     def on_episode_start(self) -> None:
-        self._images = []
+        self._wait_for_writer()
+        existing = list(self._out_dir.glob("out_[0-9]*.mp4"))
+        next_idx = max([int(p.stem.split("_")[1]) for p in existing], default=-1) + 1
+        out_path = self._out_dir / f"out_{next_idx}.mp4"
+
+        logging.info(f"Saving video to {out_path}")
+        writer = imageio.get_writer(out_path, fps=50 // max(1, self._subsample))
+        self._step = 0
+        # Not a daemon thread, so that the last video is finalized before the interpreter exits.
+        self._thread = threading.Thread(target=self._write, args=(writer,))
+        self._thread.start()
 
     @override
     def on_step(self, observation: dict, action: dict) -> None:
-        im = observation["images"]["cam_high"]  # [C, H, W]
-        im = np.transpose(im, (1, 2, 0))  # [H, W, C]
-        self._images.append(im)
+        if self._step % self._subsample == 0:
+            im = observation["images"]["cam_high"]  # [C, H, W]
+            im = np.transpose(im, (1, 2, 0))  # [H, W, C]
+            self._frames.put(np.asarray(im))
+        self._step += 1
 
     @override
     def on_episode_end(self) -> None:
-        existing = list(self._out_dir.glob("out_[0-9]*.mp4"))
-        next_idx = max([int(p.stem.split("_")[1]) for p in existing], default=-1) + 1
-        out_path = self._out_dir / f"out_{next_idx}.mp4"
+        self._frames.put(_END_OF_EPISODE)
 
-        logging.info(f"Saving video to {out_path}")
-        imageio.mimwrite(
-            out_path,
-            [np.asarray(x) for x in self._images[:: self._subsample]],
-            fps=50 // max(1, self._subsample),
-        )
+    def _wait_for_writer(self) -> None:
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _write(self, writer) -> None:
+        failed = False
+        while (frame := self._frames.get()) is not _END_OF_EPISODE:
+            # Keep consuming frames after an error so that `on_step` never blocks on a full queue.
+            if failed:
+                continue
+            try:
+                writer.append_data(frame)
+            except Exception:
+                logging.exception("Failed to write video frame")
+                failed = True
+        writer.close()
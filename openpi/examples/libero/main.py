@@ -8,6 +8,7 @@ import imageio
 from libero.libero import benchmark
 from libero.libero import get_libero_path
 from libero.libero.envs import OffScreenRenderEnv
+from libero.libero.envs import SubprocVectorEnv
 import numpy as np
 from openpi_client import image_tools
 from openpi_client import websocket_client_policy as _websocket_client_policy
@@ -36,6 +37,9 @@ class Args:
     )
     num_steps_wait: int = 10  # Number of steps to wait for objects to stabilize i n sim
     num_trials_per_task: int = 50  # Number of rollouts per task
+    # Number of environments stepped in parallel processes. Their observations are sent to the server as a single
+    # batch. With 1, episodes run one after another in this process.
+    num_envs: int = 1
 
     #################################################################################################################
     # Utils
@@ -81,6 +85,17 @@ def eval_libero(args: Args) -> None:
         # Get default LIBERO initial states
         initial_states = task_suite.get_task_init_states(task_id)
 
+        if args.num_envs > 1:
+            task_successes = _eval_task_vectorized(args, client, task, initial_states, max_steps)
+            task_episodes = args.num_trials_per_task
+            total_episodes += task_episodes
+            total_successes += task_successes
+            logging.info(f"# episodes completed so far: {total_episodes}")
+            logging.info(f"# successes: {total_successes} ({total_successes / total_episodes * 100:.1f}%)")
+            logging.info(f"Current task success rate: {float(task_successes) / float(task_episodes)}")
+            logging.info(f"Current total success rate: {float(total_successes) / float(total_episodes)}")
+            continue
+
         # Initialize LIBERO environment and task description
         env, task_description = _get_libero_env(task, LIBERO_ENV_RESOLUTION, args.seed)
 
@@ -111,41 +126,16 @@ def eval_libero(args: Args) -> None:
                         continue
 
                     # Get preprocessed image
-                    # IMPORTANT: rotate 180 degrees to match train preprocessing
-                    img = np.ascontiguousarray(obs["agentview_image"][::-1, ::-1])
-                    wrist_img = np.ascontiguousarray(obs["robot0_eye_in_hand_image"][::-1, ::-1])
-                    img = image_tools.convert_to_uint8(
-                        image_tools.resize_with_pad(img, args.resize_size, args.resize_size)
-                    )
-                    wrist_img = image_tools.convert_to_uint8(
-                        image_tools.resize_with_pad(wrist_img, args.resize_size, args.resize_size)
-                    )
+                    img, element = _prepare_observation(obs, task_description, args.resize_size)
 
                     # Save preprocessed image for replay video
                     replay_images.append(img)
 
                     if not action_plan:
                         # Finished executing previous action chunk -- compute new chunk
-                        # Prepare observations dict
-                        element = {
-                            "observation/image": img,
-                            "observation/wrist_image": wrist_img,
-                            "observation/state": np.concatenate(
-                                (
-                                    obs["robot0_eef_pos"],
-                                    _quat2axisangle(obs["robot0_eef_quat"]),
-                                    obs["robot0_gripper_qpos"],
-                                )
-                            ),
-                            "prompt": str(task_description),
-                        }
-
                         # Query model to get action
                         action_chunk = client.infer(element)["actions"]
-                        assert (
-                            len(action_chunk) >= args.replan_steps
-                        ), f"We want to replan every {args.replan_steps} steps, but policy only predicts {len(action_chunk)} steps."
-                        action_plan.extend(action_chunk[: args.replan_steps])
+                        action_plan.extend(_replan(action_chunk, args.replan_steps))
 
                     action = action_plan.popleft()
 
@@ -165,13 +155,7 @@ def eval_libero(args: Args) -> None:
             total_episodes += 1
 
             # Save a replay video of the episode
-            suffix = "success" if done else "failure"
-            task_segment = task_description.replace(" ", "_")
-            imageio.mimwrite(
-                pathlib.Path(args.video_out_path) / f"rollout_{task_segment}_{suffix}.mp4",
-                [np.asarray(x) for x in replay_images],
-                fps=10,
-            )
+            _save_video(args, task_description, replay_images, success=done)
 
             # Log current results
             logging.info(f"Success: {done}")
@@ -186,6 +170,217 @@ def eval_libero(args: Args) -> None:
     logging.info(f"Total episodes: {total_episodes}")
 
 
+@dataclasses.dataclass
+class _Episode:
+    """State of an episode running in one slot of the vectorized environment."""
+
+    index: int
+    obs: dict
+    t: int = 0
+    action_plan: collections.deque = dataclasses.field(default_factory=collections.deque)
+    replay_images: list = dataclasses.field(default_factory=list)
+
+
+def _eval_task_vectorized(args: Args, client, task, initial_states, max_steps: int) -> int:
+    """Runs all trials of a task in `args.num_envs` parallel environments and returns the number of successes.
+
+    Every episode follows the same steps as in the serial loop of `eval_libero` (same initial state, waiting steps,
+    replanning and step limit), but the environments are stepped in subprocesses and all replanning queries of a step
+    are sent to the server as one batch. When an episode ends, the next pending episode starts in its slot, so
+    environments never wait for each other to finish. Each environment is seeded once and runs a different subset of
+    the episodes, so its random state differs from the serial run and success rates can differ slightly.
+
+    Like in the serial loop, an exception in an environment or in the policy query only ends the affected episode,
+    which counts as a failure.
+    """
+    task_description = task.language
+    num_envs = min(args.num_envs, args.num_trials_per_task)
+    envs = SubprocVectorEnv(
+        [lambda: _get_libero_env(task, LIBERO_ENV_RESOLUTION, args.seed)[0] for _ in range(num_envs)]
+    )
+
+    pending = collections.deque(range(args.num_trials_per_task))
+    slots = [None] * num_envs
+    # Environments that raised an exception. Their worker process has exited, so their slots are not used anymore.
+    broken = set()
+    task_successes = 0
+    progress = tqdm.tqdm(total=args.num_trials_per_task)
+
+    def end_episode(i, *, success, error=None):
+        nonlocal task_successes
+        episode = slots[i]
+        if error is not None:
+            logging.error(f"Caught exception in env {i} (episode {episode.index + 1}): {error}")
+        task_successes += int(success)
+        _save_video(args, task_description, episode.replay_images, success=success)
+        logging.info(f"Episode {episode.index + 1} success: {success}")
+        slots[i] = None
+        progress.update(1)
+
+    def start_episodes(ids):
+        ids = ids[: len(pending)]
+        if not ids:
+            return
+        episodes = [pending.popleft() for _ in ids]
+        results = _reset_envs(envs, [initial_states[episode] for episode in episodes], ids)
+        for i, episode, result in zip(ids, episodes, results, strict=True):
+            if isinstance(result, Exception):
+                logging.error(f"Caught exception while resetting env {i} (episode {episode + 1}): {result}")
+                broken.add(i)
+                progress.update(1)
+                continue
+            logging.info(f"Starting episode {episode + 1} in env {i}...")
+            slots[i] = _Episode(episode, result)
+
+    try:
+        start_episodes(list(range(num_envs)))
+        while any(slots):
+            # Query the policy for all episodes that have finished their previous action chunk, in one batch.
+            queries = []
+            for i in [i for i, episode in enumerate(slots) if episode is not None]:
+                episode = slots[i]
+                if episode.t < args.num_steps_wait:
+                    continue
+                try:
+                    img, element = _prepare_observation(episode.obs, task_description, args.resize_size)
+                except Exception as e:
+                    end_episode(i, success=False, error=e)
+                    continue
+                episode.replay_images.append(img)
+                if not episode.action_plan:
+                    queries.append((i, element))
+            if queries:
+                try:
+                    results = client.infer_batch([element for _, element in queries])
+                    if len(results) != len(queries):
+                        raise ValueError(f"Expected {len(queries)} results, got {len(results)}")
+                except Exception:
+                    # Query the episodes one at a time so that only the failing ones end.
+                    results = []
+                    for i, element in queries:
+                        try:
+                            results.append(client.infer(element))
+                        except Exception as e:
+                            end_episode(i, success=False, error=e)
+                            results.append(None)
+                for (i, _), result in zip(queries, results, strict=True):
+                    if result is None:
+                        continue
+                    try:
+                        slots[i].action_plan.extend(_replan(result["actions"], args.replan_steps))
+                    except Exception as e:
+                        end_episode(i, success=False, error=e)
+
+            # IMPORTANT: Do nothing for the first few timesteps because the simulator drops objects
+            # and we need to wait for them to fall
+            active = [i for i, episode in enumerate(slots) if episode is not None]
+            actions = [
+                LIBERO_DUMMY_ACTION if slots[i].t < args.num_steps_wait else slots[i].action_plan.popleft().tolist()
+                for i in active
+            ]
+            for i, result in zip(active, _step_envs(envs, actions, active), strict=True):
+                if isinstance(result, Exception):
+                    end_episode(i, success=False, error=result)
+                    broken.add(i)
+                    continue
+                episode_obs, _, done, _ = result
+                episode = slots[i]
+                episode.obs = episode_obs
+                # Like in the serial loop, `done` is ignored while waiting.
+                success = bool(done) and episode.t >= args.num_steps_wait
+                if not success:
+                    episode.t += 1
+                if success or episode.t >= max_steps + args.num_steps_wait:
+                    end_episode(i, success=success)
+            start_episodes([i for i in range(num_envs) if slots[i] is None and i not in broken])
+    finally:
+        progress.close()
+        envs.close()
+
+    if pending:
+        logging.error(f"{len(pending)} episodes were not run because all environments failed")
+    return task_successes
+
+
+def _step_envs(envs, actions, ids):
+    """Steps the environments `ids` in parallel, like `SubprocVectorEnv.step`.
+
+    Returns the (obs, reward, done, info) of every environment, or the exception it raised. The results are received
+    from each worker separately, so a failing environment does not lose the steps of the others.
+    """
+    return _recv_all(envs, ids, [_try(envs.workers[i].send, action) for i, action in zip(ids, actions, strict=True)])
+
+
+def _reset_envs(envs, init_states, ids):
+    """Resets the environments `ids` in parallel and sets their initial states.
+
+    Returns the initial observation of every environment, or the exception it raised. Unlike `SubprocVectorEnv.reset`,
+    the reply of every worker that was sent the reset is received, even if another worker failed, so the replies of
+    later commands stay in order.
+    """
+    results = _recv_all(envs, ids, [_try(envs.workers[i].send, None) for i in ids])
+    return [
+        result if isinstance(result, Exception) else _try(envs.workers[i].set_init_state, init_state)
+        for i, init_state, result in zip(ids, init_states, results, strict=True)
+    ]
+
+
+def _recv_all(envs, ids, sent):
+    """Receives the reply of every worker in `ids` whose entry in `sent` is not an exception."""
+    return [
+        error if isinstance(error, Exception) else _try(envs.workers[i].recv)
+        for i, error in zip(ids, sent, strict=True)
+    ]
+
+
+def _try(fn, *args):
+    """Returns `fn(*args)`, or the exception it raised."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
+
+def _prepare_observation(obs, task_description, resize_size):
+    """Returns the preprocessed main camera image (for the replay video) and the policy input for an observation."""
+    # IMPORTANT: rotate 180 degrees to match train preprocessing
+    img = np.ascontiguousarray(obs["agentview_image"][::-1, ::-1])
+    wrist_img = np.ascontiguousarray(obs["robot0_eye_in_hand_image"][::-1, ::-1])
+    img = image_tools.convert_to_uint8(image_tools.resize_with_pad(img, resize_size, resize_size))
+    wrist_img = image_tools.convert_to_uint8(image_tools.resize_with_pad(wrist_img, resize_size, resize_size))
+
+    element = {
+        "observation/image": img,
+        "observation/wrist_image": wrist_img,
+        "observation/state": np.concatenate(
+            (
+                obs["robot0_eef_pos"],
+                _quat2axisangle(obs["robot0_eef_quat"]),
+                obs["robot0_gripper_qpos"],
+            )
+        ),
+        "prompt": str(task_description),
+    }
+    return img, element
+
+
+def _replan(action_chunk, replan_steps):
+    assert len(action_chunk) >= replan_steps, (
+        f"We want to replan every {replan_steps} steps, but policy only predicts {len(action_chunk)} steps."
+    )
+    return action_chunk[:replan_steps]
+
+
+def _save_video(args, task_description, replay_images, *, success):
+    suffix = "success" if success else "failure"
+    task_segment = task_description.replace(" ", "_")
+    imageio.mimwrite(
+        pathlib.Path(args.video_out_path) / f"rollout_{task_segment}_{suffix}.mp4",
+        [np.asarray(x) for x in replay_images],
+        fps=10,
+    )
+
+
 def _get_libero_env(task, resolution, seed):
     """Initializes and returns the LIBERO environment, along with the task description."""
     task_description = task.language
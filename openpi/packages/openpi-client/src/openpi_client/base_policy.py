@@ -1,5 +1,5 @@
 import abc
-from typing import Dict
+from typing import Dict, List, Sequence
 
 
 class BasePolicy(abc.ABC):
@@ -7,6 +7,14 @@ class BasePolicy(abc.ABC):
     def infer(self, obs: Dict) -> Dict:
         """Infer actions from observations."""
 
+    def infer_batch(self, obs_batch: Sequence[Dict]) -> List[Dict]:
+        """Infer actions for a batch of independent observations.
+
+        The default implementation calls `infer` once per observation. Policies that can evaluate several
+        observations in a single forward pass should override this.
+        """
+        return [self.infer(obs) for obs in obs_batch]
+
     def reset(self) -> None:
         """Reset the policy to its initial state."""
         pass
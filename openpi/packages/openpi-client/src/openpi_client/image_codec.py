@@ -0,0 +1,113 @@
+"""Compression of camera images in policy requests.
+
+Raw uint8 camera frames make up almost all of the bytes of a request. `ImageEncoder` replaces every image in an
+observation with a compressed version before it is sent, and `ImageDecoder` restores the arrays on the server. Images
+are (de)compressed on a thread pool, so the images of an observation are processed in parallel.
+
+Images are uint8 arrays of shape [H, W, 3] or [3, H, W]. An encoded image is a plain dict that msgpack can serialize:
+    {"__encoded_image__": <codec>, "data": <bytes>, "chw": <bool>}
+
+The server advertises the codecs it can decode under `CODECS_METADATA_KEY` in its metadata, so that clients only
+compress images if the server understands them.
+"""
+
+import concurrent.futures
+import io
+import time
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, features
+
+CODECS_METADATA_KEY = "__image_codecs__"
+
+_ENCODED_IMAGE_KEY = "__encoded_image__"
+_PIL_FORMATS = {"jpeg": "JPEG", "webp": "WEBP"}
+# Smaller images are not worth compressing.
+_MIN_IMAGE_SIZE = 16
+
+
+def supported_codecs() -> List[str]:
+    """Returns the codecs that can be encoded and decoded in this environment."""
+    return [codec for codec, feature in (("jpeg", "jpg"), ("webp", "webp")) if features.check(feature)]
+
+
+def _is_image(value: Any) -> bool:
+    return (
+        isinstance(value, np.ndarray)
+        and value.dtype == np.uint8
+        and value.ndim == 3
+        and (value.shape[-1] == 3 or value.shape[0] == 3)
+        and min(value.shape[:2] if value.shape[-1] == 3 else value.shape[1:]) >= _MIN_IMAGE_SIZE
+    )
+
+
+def _is_encoded_image(value: Any) -> bool:
+    return isinstance(value, dict) and _ENCODED_IMAGE_KEY in value
+
+
+def _map_leaves(tree: Any, predicate, fn) -> Any:
+    """Applies `fn` to all leaves of a nested dict/list structure that match `predicate`."""
+    if predicate(tree):
+        return fn(tree)
+    if isinstance(tree, dict):
+        return {k: _map_leaves(v, predicate, fn) for k, v in tree.items()}
+    if isinstance(tree, list):
+        return [_map_leaves(v, predicate, fn) for v in tree]
+    return tree
+
+
+def _process(tree: Any, predicate, fn, executor: concurrent.futures.Executor) -> Tuple[Any, int]:
+    """Applies `fn` to all matching leaves on `executor` and returns the new tree and the number of processed leaves."""
+    futures = []
+    _map_leaves(tree, predicate, lambda leaf: futures.append(executor.submit(fn, leaf)))
+    results = iter([f.result() for f in futures])
+    return _map_leaves(tree, predicate, lambda _: next(results)), len(futures)
+
+
+def encode_image(image: np.ndarray, codec: str, quality: int) -> dict:
+    chw = image.shape[-1] != 3
+    buffer = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(image.transpose(1, 2, 0) if chw else image)).save(
+        buffer, format=_PIL_FORMATS[codec], quality=quality
+    )
+    return {_ENCODED_IMAGE_KEY: codec, "data": buffer.getvalue(), "chw": chw}
+
+
+def decode_image(encoded: dict) -> np.ndarray:
+    codec = encoded[_ENCODED_IMAGE_KEY]
+    if codec not in _PIL_FORMATS:
+        raise ValueError(f"Unsupported image codec: {codec}")
+    with Image.open(io.BytesIO(encoded["data"])) as image:
+        array = np.asarray(image.convert("RGB"))
+    return array.transpose(2, 0, 1) if encoded["chw"] else array
+
+
+class ImageEncoder:
+    """Compresses the images of observations with the given codec and quality (1-100)."""
+
+    def __init__(self, codec: str = "jpeg", quality: int = 90, num_threads: int = 4) -> None:
+        if codec not in supported_codecs():
+            raise ValueError(f"Image codec {codec} is not supported, available codecs: {supported_codecs()}")
+        self.codec = codec
+        self._quality = quality
+        self._executor = concurrent.futures.ThreadPoolExecutor(num_threads, thread_name_prefix="image-encoder")
+
+    def encode(self, obs: Any) -> Tuple[Any, float]:
+        """Returns `obs` with all images compressed and the time it took in milliseconds."""
+        start_time = time.monotonic()
+        obs, _ = _process(obs, _is_image, lambda im: encode_image(im, self.codec, self._quality), self._executor)
+        return obs, (time.monotonic() - start_time) * 1000
+
+
+class ImageDecoder:
+    """Restores the images compressed by `ImageEncoder`."""
+
+    def __init__(self, num_threads: Optional[int] = None) -> None:
+        self._executor = concurrent.futures.ThreadPoolExecutor(num_threads, thread_name_prefix="image-decoder")
+
+    def decode(self, obs: Any) -> Tuple[Any, Optional[float]]:
+        """Returns `obs` with all images decoded and the time it took in milliseconds (None if there were none)."""
+        start_time = time.monotonic()
+        obs, count = _process(obs, _is_encoded_image, decode_image, self._executor)
+        return obs, (time.monotonic() - start_time) * 1000 if count else None
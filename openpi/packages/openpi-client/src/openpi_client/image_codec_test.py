@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from openpi_client import image_codec as _image_codec
+from openpi_client import msgpack_numpy
+
+
+def _make_observation() -> dict:
+    # A smooth gradient, so that lossy compression stays close to the original.
+    gradient = np.linspace(0, 255, 64, dtype=np.float32)
+    image = np.stack(np.broadcast_arrays(gradient[:, None], gradient[None, :], 128.0), axis=-1).astype(np.uint8)
+    return {
+        "images": {"top": image, "wrist": image.transpose(2, 0, 1).copy()},
+        "state": np.arange(14, dtype=np.float32),
+        "mask": np.zeros((8, 8, 3), dtype=np.uint8),
+        "prompt": "pick up the cube",
+    }
+
+
+@pytest.mark.parametrize("codec", _image_codec.supported_codecs())
+def test_roundtrip(codec):
+    obs = _make_observation()
+    encoder = _image_codec.ImageEncoder(codec, quality=95)
+    decoder = _image_codec.ImageDecoder()
+
+    encoded, encode_ms = encoder.encode([obs, obs])
+    assert encode_ms >= 0
+    data = msgpack_numpy.packb(encoded)
+    assert len(data) < len(msgpack_numpy.packb([obs, obs])) / 4
+
+    decoded, decode_ms = decoder.decode(msgpack_numpy.unpackb(data))
+    assert decode_ms is not None
+    for result in decoded:
+        for key in ("top", "wrist"):
+            assert result["images"][key].shape == obs["images"][key].shape
+            assert np.abs(result["images"][key].astype(int) - obs["images"][key]).mean() < 2
+        # Non-image values and small images are sent as-is.
+        np.testing.assert_array_equal(result["state"], obs["state"])
+        np.testing.assert_array_equal(result["mask"], obs["mask"])
+        assert result["prompt"] == obs["prompt"]
+
+
+def test_decode_without_images():
+    obs = {"state": np.zeros(3)}
+    decoded, decode_ms = _image_codec.ImageDecoder().decode(obs)
+    assert decode_ms is None
+    np.testing.assert_array_equal(decoded["state"], obs["state"])
@@ -0,0 +1,228 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from typing_extensions import override
+import websockets.exceptions
+import websockets.sync.client
+
+from openpi_client import base_policy as _base_policy
+from openpi_client import msgpack_numpy
+from openpi_client import websocket_client_policy as _websocket_client_policy
+
+# Errors that mean that a replica is not reachable (as opposed to an error raised by the policy).
+_CONNECTION_ERRORS = (OSError, TimeoutError, websockets.exceptions.WebSocketException)
+
+
+class _Replica:
+    """Connection to one policy server and the statistics used for routing."""
+
+    def __init__(self, uri: str) -> None:
+        self.uri = uri
+        self.conn: Optional[websockets.sync.client.ClientConnection] = None
+        self.metadata: Optional[Dict] = None
+        # Only one request can be in flight on a websocket connection.
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        # Exponential moving averages of the server-side inference time and the remaining round trip time.
+        self.infer_ms: Optional[float] = None
+        self.overhead_ms: Optional[float] = None
+        self.last_used = 0.0
+
+    def score(self, now: float, probe_interval: float) -> float:
+        if self.infer_ms is None or now - self.last_used > probe_interval:
+            # Replicas without recent measurements are tried first, so that their estimates stay current.
+            return -1.0 if self.in_flight == 0 else float("inf")
+        return (self.infer_ms + self.overhead_ms) * (1 + self.in_flight)
+
+    def update(self, infer_ms: float, overhead_ms: float, alpha: float) -> None:
+        if self.infer_ms is None:
+            self.infer_ms, self.overhead_ms = infer_ms, overhead_ms
+        else:
+            self.infer_ms += alpha * (infer_ms - self.infer_ms)
+            self.overhead_ms += alpha * (overhead_ms - self.overhead_ms)
+
+
+class LoadBalancedClientPolicy(_base_policy.BasePolicy):
+    """Implements the Policy interface on top of several policy server replicas.
+
+    Keeps a connection to every replica and sends each request to the replica with the lowest expected latency, based
+    on the `server_timing` reported by the servers and the measured round trip time, weighted by the number of
+    requests in flight. If a replica fails, or does not reply within `recv_timeout` seconds, the request is retried on
+    another one; the failed replica is reconnected in the background. All replicas are expected to serve the same
+    policy.
+
+    The client can be shared between threads (e.g. one per robot arm); concurrent requests are spread across replicas.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[str],
+        api_key: Optional[str] = None,
+        *,
+        reconnect_interval: float = 5.0,
+        probe_interval: float = 10.0,
+        ewma_alpha: float = 0.2,
+        recv_timeout: Optional[float] = 30.0,
+    ) -> None:
+        """
+        Args:
+            recv_timeout: Seconds to wait for the reply of a replica before it is considered hung. It must be longer
+                than the slowest expected inference (including the first, possibly compiling, call). None waits
+                forever.
+        """
+        if not endpoints:
+            raise ValueError("At least one endpoint is required.")
+        self._replicas = [_Replica(e if e.startswith("ws") else f"ws://{e}") for e in endpoints]
+        self._packer_lock = threading.Lock()
+        self._packer = msgpack_numpy.Packer()
+        self._api_key = api_key
+        self._reconnect_interval = reconnect_interval
+        self._probe_interval = probe_interval
+        self._ewma_alpha = ewma_alpha
+        self._recv_timeout = recv_timeout
+
+        self._lock = threading.Condition()
+        self._closed = threading.Event()
+
+        for replica in self._replicas:
+            self._connect(replica)
+        self._reconnect_thread = threading.Thread(target=self._reconnect_loop, daemon=True)
+        self._reconnect_thread.start()
+        self._server_metadata = self._wait_for_replica().metadata
+
+    def get_server_metadata(self) -> Dict:
+        return self._server_metadata
+
+    def replica_stats(self) -> List[Dict]:
+        """Returns the routing statistics of all replicas."""
+        with self._lock:
+            return [
+                {
+                    "uri": r.uri,
+                    "connected": r.conn is not None,
+                    "in_flight": r.in_flight,
+                    "infer_ms": r.infer_ms,
+                    "overhead_ms": r.overhead_ms,
+                }
+                for r in self._replicas
+            ]
+
+    @override
+    def infer(self, obs: Dict) -> Dict:  # noqa: UP006
+        return self._request(obs)
+
+    @override
+    def infer_batch(self, obs_batch: Sequence[Dict]) -> List[Dict]:  # noqa: UP006
+        return self._request(list(obs_batch))
+
+    @override
+    def reset(self) -> None:
+        pass
+
+    def close(self) -> None:
+        """Closes all connections."""
+        self._closed.set()
+        self._reconnect_thread.join()
+        for replica in self._replicas:
+            with replica.lock:
+                if replica.conn is not None:
+                    replica.conn.close()
+                    replica.conn = None
+
+    def _request(self, payload):
+        with self._packer_lock:
+            data = self._packer.pack(payload)
+
+        while True:
+            replica = self._acquire()
+            try:
+                with replica.lock:
+                    if replica.conn is None:
+                        continue
+                    start_time = time.monotonic()
+                    try:
+                        replica.conn.send(data)
+                        response = replica.conn.recv(timeout=self._recv_timeout)
+                    except _CONNECTION_ERRORS as e:
+                        # Includes the TimeoutError of a replica that accepted the request but does not answer.
+                        logging.warning(f"Request to {replica.uri} failed ({e!r}), retrying on another replica")
+                        self._disconnect(replica)
+                        continue
+                    round_trip_ms = (time.monotonic() - start_time) * 1000
+            finally:
+                self._release(replica)
+
+            if isinstance(response, str):
+                # we're expecting bytes; if the server sends a string, it's an error.
+                raise RuntimeError(f"Error in inference server {replica.uri}:\n{response}")
+            result = msgpack_numpy.unpackb(response)
+            self._record_timing(replica, result, round_trip_ms)
+            return _websocket_client_policy.check_response(result)
+
+    def _acquire(self) -> _Replica:
+        """Picks the replica for the next request and marks the request as in flight."""
+        replica = self._wait_for_replica()
+        with self._lock:
+            now = time.monotonic()
+            connected = [r for r in self._replicas if r.conn is not None] or [replica]
+            replica = min(connected, key=lambda r: r.score(now, self._probe_interval))
+            replica.in_flight += 1
+            replica.last_used = now
+            return replica
+
+    def _release(self, replica: _Replica) -> None:
+        with self._lock:
+            replica.in_flight -= 1
+
+    def _record_timing(self, replica: _Replica, result, round_trip_ms: float) -> None:
+        first = result[0] if isinstance(result, list) and result else result
+        if _websocket_client_policy.STALE_KEY in first:
+            # Stale responses are not evaluated and say nothing about the inference time.
+            return
+        timing = first.get("server_timing", {})
+        infer_ms = timing.get("infer_ms", round_trip_ms)
+        with self._lock:
+            replica.update(infer_ms, max(round_trip_ms - infer_ms, 0.0), self._ewma_alpha)
+
+    def _wait_for_replica(self) -> _Replica:
+        with self._lock:
+            while True:
+                for replica in self._replicas:
+                    if replica.conn is not None:
+                        return replica
+                logging.info("Waiting for any policy server to become available...")
+                self._lock.wait(timeout=self._reconnect_interval)
+
+    def _connect(self, replica: _Replica) -> None:
+        try:
+            headers = {"Authorization": f"Api-Key {self._api_key}"} if self._api_key else None
+            conn = websockets.sync.client.connect(
+                replica.uri, compression=None, max_size=None, additional_headers=headers
+            )
+            metadata = msgpack_numpy.unpackb(conn.recv(timeout=self._recv_timeout))
+        except _CONNECTION_ERRORS as e:
+            logging.debug(f"Could not connect to {replica.uri}: {e!r}")
+            return
+        logging.info(f"Connected to policy server {replica.uri}")
+        with self._lock:
+            replica.conn, replica.metadata = conn, metadata
+            # Start from fresh estimates, the server may have been restarted with different hardware.
+            replica.infer_ms = replica.overhead_ms = None
+            self._lock.notify_all()
+
+    def _disconnect(self, replica: _Replica) -> None:
+        # Called with `replica.lock` held.
+        if replica.conn is not None:
+            replica.conn.close()
+        with self._lock:
+            replica.conn = None
+
+    def _reconnect_loop(self) -> None:
+        while not self._closed.wait(self._reconnect_interval):
+            for replica in self._replicas:
+                if replica.conn is None and not self._closed.is_set():
+                    with replica.lock:
+                        if replica.conn is None:
+                            self._connect(replica)
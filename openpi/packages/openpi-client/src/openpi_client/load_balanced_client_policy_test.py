@@ -0,0 +1,84 @@
+import threading
+import time
+
+import websockets.sync.server
+
+from openpi_client import load_balanced_client_policy as _client
+from openpi_client import msgpack_numpy
+
+
+class _FakeServer:
+    """Minimal policy server that answers with its name after `delay` seconds."""
+
+    def __init__(self, name: str, delay: float) -> None:
+        self.name = name
+        self.delay = delay
+        self.num_requests = 0
+        self._server = websockets.sync.server.serve(self._handler, "127.0.0.1", 0, compression=None, max_size=None)
+        self.endpoint = f"127.0.0.1:{self._server.socket.getsockname()[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def _handler(self, websocket) -> None:
+        packer = msgpack_numpy.Packer()
+        websocket.send(packer.pack({"name": self.name}))
+        for message in websocket:
+            msgpack_numpy.unpackb(message)
+            self.num_requests += 1
+            time.sleep(self.delay)
+            websocket.send(packer.pack({"server": self.name, "server_timing": {"infer_ms": self.delay * 1000}}))
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+
+
+def test_routes_to_fastest_replica_and_fails_over():
+    fast = _FakeServer("fast", delay=0.001)
+    slow = _FakeServer("slow", delay=0.05)
+    client = _client.LoadBalancedClientPolicy([fast.endpoint, slow.endpoint], reconnect_interval=0.1)
+    try:
+        assert client.get_server_metadata() == {"name": "fast"}
+
+        results = [client.infer({"step": i})["server"] for i in range(20)]
+        # Both replicas are measured once, after that the fast one is preferred.
+        assert results.count("slow") == 1
+        assert results.count("fast") == 19
+
+        fast.shutdown()
+        results = [client.infer({"step": i})["server"] for i in range(5)]
+        assert results == ["slow"] * 5
+    finally:
+        client.close()
+        slow.shutdown()
+
+
+def test_spreads_concurrent_requests():
+    servers = [_FakeServer(str(i), delay=0.02) for i in range(2)]
+    client = _client.LoadBalancedClientPolicy([s.endpoint for s in servers])
+    try:
+        threads = [threading.Thread(target=lambda: [client.infer({}) for _ in range(10)]) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(s.num_requests >= 5 for s in servers)
+    finally:
+        client.close()
+        for server in servers:
+            server.shutdown()
+
+
+def test_fails_over_from_hung_replica():
+    fast = _FakeServer("fast", delay=0.001)
+    slow = _FakeServer("slow", delay=0.05)
+    client = _client.LoadBalancedClientPolicy([fast.endpoint, slow.endpoint], reconnect_interval=0.1, recv_timeout=0.3)
+    try:
+        [client.infer({}) for _ in range(5)]
+        # The fast replica keeps accepting requests but stops answering in time.
+        fast.delay = 2
+        start = time.monotonic()
+        assert client.infer({})["server"] == "slow"
+        assert time.monotonic() - start < 1
+    finally:
+        client.close()
+        fast.shutdown()
+        slow.shutdown()
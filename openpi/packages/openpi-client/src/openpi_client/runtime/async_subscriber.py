@@ -0,0 +1,149 @@
+import collections
+import enum
+import logging
+import threading
+
+from typing_extensions import override
+
+from openpi_client.runtime import subscriber as _subscriber
+
+
+class DropPolicy(enum.Enum):
+    """What to do with a step event when the queue of an `AsyncSubscriber` is full."""
+
+    # Wait until there is space in the queue. No events are lost, but a slow subscriber stalls the caller.
+    BLOCK = "block"
+    # Discard the new step.
+    DROP_NEWEST = "drop_newest"
+    # Discard the oldest queued step to make room for the new one.
+    DROP_OLDEST = "drop_oldest"
+
+
+_STOP = object()
+
+
+class AsyncSubscriber(_subscriber.Subscriber):
+    """Forwards events to a subscriber on a background thread.
+
+    Events are put in a bounded queue and delivered in order by a worker thread, so the runtime loop only pays for a
+    queue insertion. When the queue is full, step events are handled according to `drop_policy`. Episode start and end
+    events are never dropped.
+
+    The observation and action are passed to the wrapped subscriber by reference; the environment must not modify them
+    in place after they were returned.
+
+    `close` stops the worker thread. An event sent after `close` starts a new one, so the subscriber can be reused,
+    e.g. when `Runtime.run` is called again.
+    """
+
+    def __init__(
+        self,
+        subscriber: _subscriber.Subscriber,
+        max_queue_size: int = 64,
+        drop_policy: DropPolicy = DropPolicy.DROP_OLDEST,
+    ) -> None:
+        if max_queue_size < 1:
+            raise ValueError(f"max_queue_size must be positive, got {max_queue_size}")
+        self._subscriber = subscriber
+        self._max_queue_size = max_queue_size
+        self._drop_policy = drop_policy
+
+        self._queue: collections.deque = collections.deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._num_dropped = 0
+        self._episode_dropped = 0
+
+        self._closed = False
+        self._start_worker()
+
+    @property
+    def num_dropped(self) -> int:
+        """Total number of step events that were dropped."""
+        return self._num_dropped
+
+    @override
+    def on_episode_start(self) -> None:
+        self._episode_dropped = 0
+        self._put(("on_episode_start",), droppable=False)
+
+    @override
+    def on_step(self, observation: dict, action: dict) -> None:
+        self._put(("on_step", observation, action), droppable=True)
+
+    @override
+    def on_episode_end(self) -> None:
+        if self._episode_dropped:
+            logging.warning(
+                f"{type(self._subscriber).__name__} dropped {self._episode_dropped} steps of the episode because it "
+                "could not keep up."
+            )
+        self._put(("on_episode_end",), droppable=False)
+
+    def flush(self) -> None:
+        """Blocks until all queued events have been delivered."""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._queue and not self._busy)
+
+    def close(self) -> None:
+        """Delivers all queued events and stops the worker thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.append((_STOP,))
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _start_worker(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name=f"{type(self._subscriber).__name__}-subscriber", daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, event: tuple, *, droppable: bool) -> None:
+        with self._cond:
+            if self._closed:
+                # The previous worker has delivered everything up to the stop event, start a new one.
+                self._thread.join()
+                self._closed = False
+                self._start_worker()
+            if droppable and len(self._queue) >= self._max_queue_size:
+                if self._drop_policy == DropPolicy.BLOCK:
+                    self._cond.wait_for(lambda: len(self._queue) < self._max_queue_size)
+                elif self._drop_policy == DropPolicy.DROP_NEWEST or not self._drop_oldest_step():
+                    self._count_drop()
+                    return
+                else:
+                    self._count_drop()
+            self._queue.append(event)
+            self._cond.notify_all()
+
+    def _drop_oldest_step(self) -> bool:
+        for i, event in enumerate(self._queue):
+            if event[0] == "on_step":
+                del self._queue[i]
+                return True
+        return False
+
+    def _count_drop(self) -> None:
+        self._num_dropped += 1
+        self._episode_dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue)
+                name, *args = self._queue.popleft()
+                self._busy = True
+                self._cond.notify_all()
+            try:
+                if name is _STOP:
+                    return
+                getattr(self._subscriber, name)(*args)
+            except Exception:
+                logging.exception(f"Error in {type(self._subscriber).__name__}.{name}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
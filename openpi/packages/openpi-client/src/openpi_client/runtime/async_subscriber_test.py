@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from openpi_client.runtime import async_subscriber as _async_subscriber
+from openpi_client.runtime import subscriber as _subscriber
+
+
+class _RecordingSubscriber(_subscriber.Subscriber):
+    def __init__(self) -> None:
+        self.events = []
+        self.in_step = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def on_episode_start(self) -> None:
+        self.events.append("start")
+
+    def on_step(self, observation: dict, action: dict) -> None:
+        self.in_step.set()
+        self.gate.wait()
+        self.events.append(observation["step"])
+
+    def on_episode_end(self) -> None:
+        self.events.append("end")
+
+
+def _run_episode(subscriber: _subscriber.Subscriber, num_steps: int) -> None:
+    subscriber.on_episode_start()
+    for step in range(num_steps):
+        subscriber.on_step({"step": step}, {})
+    subscriber.on_episode_end()
+
+
+def test_delivers_events_in_order():
+    recorder = _RecordingSubscriber()
+    subscriber = _async_subscriber.AsyncSubscriber(
+        recorder, max_queue_size=2, drop_policy=_async_subscriber.DropPolicy.BLOCK
+    )
+    _run_episode(subscriber, 10)
+    subscriber.close()
+
+    assert recorder.events == ["start", *range(10), "end"]
+    assert subscriber.num_dropped == 0
+
+
+@pytest.mark.parametrize(
+    ("drop_policy", "expected_steps"),
+    [
+        (_async_subscriber.DropPolicy.DROP_NEWEST, [0, 1, 2]),
+        (_async_subscriber.DropPolicy.DROP_OLDEST, [0, 8, 9]),
+    ],
+)
+def test_drops_steps_when_full(drop_policy, expected_steps):
+    recorder = _RecordingSubscriber()
+    recorder.gate.clear()
+    subscriber = _async_subscriber.AsyncSubscriber(recorder, max_queue_size=2, drop_policy=drop_policy)
+
+    subscriber.on_episode_start()
+    # The worker takes step 0 and blocks in the subscriber, so only two more steps fit into the queue.
+    subscriber.on_step({"step": 0}, {})
+    recorder.in_step.wait()
+    for step in range(1, 10):
+        subscriber.on_step({"step": step}, {})
+    subscriber.on_episode_end()
+    recorder.gate.set()
+    subscriber.close()
+
+    # Episode boundaries are never dropped.
+    assert recorder.events == ["start", *expected_steps, "end"]
+    assert subscriber.num_dropped == 7
+
+
+def test_reuse_after_close():
+    recorder = _RecordingSubscriber()
+    subscriber = _async_subscriber.AsyncSubscriber(
+        recorder, max_queue_size=2, drop_policy=_async_subscriber.DropPolicy.BLOCK
+    )
+    # Like `Runtime.run` called twice: the subscriber is closed at the end of each run.
+    for _ in range(2):
+        _run_episode(subscriber, 5)
+        subscriber.close()
+
+    assert recorder.events == ["start", *range(5), "end"] * 2
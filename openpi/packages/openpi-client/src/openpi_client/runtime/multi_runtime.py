@@ -0,0 +1,257 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from typing_extensions import override
+
+from openpi_client import base_policy as _base_policy
+from openpi_client.runtime import agent as _agent
+from openpi_client.runtime import async_subscriber as _async_subscriber
+from openpi_client.runtime import environment as _environment
+from openpi_client.runtime import subscriber as _subscriber
+
+
+@dataclasses.dataclass
+class RobotConfig:
+    """One environment driven by a `MultiRuntime`."""
+
+    name: str
+    environment: _environment.Environment
+    # Creates the agent of this robot from the shared policy, e.g. `lambda policy: PolicyAgent(policy)`. Agents keep
+    # per-robot state (like the current action chunk), so every robot needs its own agent.
+    make_agent: Callable[[_base_policy.BasePolicy], _agent.Agent]
+    subscribers: Sequence[_subscriber.Subscriber] = ()
+    max_hz: float = 0
+    num_episodes: int = 1
+    max_episode_steps: int = 0
+
+
+@dataclasses.dataclass
+class LoopStats:
+    """Loop-rate statistics of one robot."""
+
+    num_steps: int = 0
+    # Moving average of the achieved loop rate.
+    rate_hz: float = 0.0
+    # Duration of a step (observation, agent and action), without the time spent waiting for the next tick.
+    mean_step_ms: float = 0.0
+    max_step_ms: float = 0.0
+    # Steps that took longer than the loop period of the robot.
+    num_overruns: int = 0
+
+
+class _BatchingPolicy:
+    """Collects the requests of all robots and evaluates the ones that coincide as a single batch."""
+
+    def __init__(self, policy: _base_policy.BasePolicy, batch_window_ms: float, max_batch_size: int) -> None:
+        self._policy = policy
+        self._batch_window = batch_window_ms / 1000
+        self._max_batch_size = max_batch_size
+        self._queue: asyncio.Queue[Tuple[Dict, asyncio.Future]] = asyncio.Queue()
+        # The policy connection is not thread-safe, so all requests go through a single thread.
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="policy")
+        self.batch_sizes: List[int] = []
+
+    async def infer(self, obs: Dict) -> Dict:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((obs, future))
+        return await future
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                # Requests that arrived during the previous inference are batched right away, others can join during
+                # the batch window.
+                deadline = loop.time() + self._batch_window
+                while self._max_batch_size <= 0 or len(batch) < self._max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                observations = [obs for obs, _ in batch]
+                self.batch_sizes.append(len(batch))
+                try:
+                    if len(batch) == 1:
+                        results = [await loop.run_in_executor(self._executor, self._policy.infer, observations[0])]
+                    else:
+                        results = await loop.run_in_executor(self._executor, self._policy.infer_batch, observations)
+                except Exception as e:
+                    for _, future in batch:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+class _PolicyProxy(_base_policy.BasePolicy):
+    """Synchronous policy handed to the agents; forwards requests to the shared `_BatchingPolicy`."""
+
+    def __init__(self, batcher: _BatchingPolicy, loop: asyncio.AbstractEventLoop) -> None:
+        self._batcher = batcher
+        self._loop = loop
+
+    @override
+    def infer(self, obs: Dict) -> Dict:
+        return asyncio.run_coroutine_threadsafe(self._batcher.infer(obs), self._loop).result()
+
+    @override
+    def reset(self) -> None:
+        # The policy is shared between robots, so one robot must not reset it.
+        pass
+
+
+class MultiRuntime:
+    """Drives several environments from a single process, sharing one policy.
+
+    Every robot runs its own loop at its own `max_hz`, like `Runtime` does for a single environment. The blocking
+    environment, agent and subscriber calls of a step run on a thread per robot, so a slow robot does not hold back the
+    others. Policy requests of all robots are sent through one policy (usually a single `WebsocketClientPolicy`);
+    requests that arrive within `batch_window_ms` of each other, or while a previous request is being evaluated, are
+    sent as one `infer_batch` call.
+    """
+
+    def __init__(
+        self,
+        robots: Sequence[RobotConfig],
+        policy: _base_policy.BasePolicy,
+        *,
+        batch_window_ms: float = 1.0,
+        max_batch_size: int = 0,
+        subscriber_queue_size: int = 0,
+        subscriber_drop_policy: _async_subscriber.DropPolicy = _async_subscriber.DropPolicy.DROP_OLDEST,
+    ) -> None:
+        names = [robot.name for robot in robots]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Robot names must be unique: {names}")
+        self._robots = list(robots)
+        self._policy = policy
+        self._batch_window_ms = batch_window_ms
+        self._max_batch_size = max_batch_size
+        self._subscribers = {
+            robot.name: [
+                _async_subscriber.AsyncSubscriber(subscriber, subscriber_queue_size, subscriber_drop_policy)
+                if subscriber_queue_size > 0
+                else subscriber
+                for subscriber in robot.subscribers
+            ]
+            for robot in robots
+        }
+        self._stats = {robot.name: LoopStats() for robot in robots}
+        self._batch_sizes: List[int] = []
+
+    def run(self) -> None:
+        """Runs all robots until each of them completed its episodes."""
+        asyncio.run(self.run_async())
+
+    async def run_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        batcher = _BatchingPolicy(self._policy, self._batch_window_ms, self._max_batch_size)
+        self._batch_sizes = batcher.batch_sizes
+        batch_task = asyncio.ensure_future(batcher.run())
+        proxy = _PolicyProxy(batcher, loop)
+        executor = concurrent.futures.ThreadPoolExecutor(len(self._robots), thread_name_prefix="robot")
+        tasks = [
+            asyncio.ensure_future(self._run_robot(robot, robot.make_agent(proxy), executor)) for robot in self._robots
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # If one robot fails, stop the others as well.
+            for task in tasks:
+                task.cancel()
+            batch_task.cancel()
+            executor.shutdown(wait=False)
+            for subscribers in self._subscribers.values():
+                for subscriber in subscribers:
+                    if isinstance(subscriber, _async_subscriber.AsyncSubscriber):
+                        subscriber.close()
+
+    def stats(self) -> Dict[str, LoopStats]:
+        """Returns the loop-rate statistics of every robot."""
+        return {name: dataclasses.replace(stats) for name, stats in self._stats.items()}
+
+    def batch_sizes(self) -> List[int]:
+        """Returns the sizes of all batches sent to the policy so far."""
+        return list(self._batch_sizes)
+
+    async def _run_robot(self, robot: RobotConfig, agent: _agent.Agent, executor: concurrent.futures.Executor) -> None:
+        loop = asyncio.get_running_loop()
+        for _ in range(robot.num_episodes):
+            await loop.run_in_executor(executor, self._start_episode, robot, agent)
+            await self._run_episode(robot, agent, executor)
+            await loop.run_in_executor(executor, self._end_episode, robot)
+            logging.info(f"[{robot.name}] Episode completed: {self._stats[robot.name]}")
+
+        # Final reset, this is important for real environments to move the robot to its home position.
+        await loop.run_in_executor(executor, robot.environment.reset)
+
+    def _start_episode(self, robot: RobotConfig, agent: _agent.Agent) -> None:
+        logging.info(f"[{robot.name}] Starting episode...")
+        robot.environment.reset()
+        agent.reset()
+        for subscriber in self._subscribers[robot.name]:
+            subscriber.on_episode_start()
+
+    def _end_episode(self, robot: RobotConfig) -> None:
+        for subscriber in self._subscribers[robot.name]:
+            subscriber.on_episode_end()
+
+    async def _run_episode(
+        self, robot: RobotConfig, agent: _agent.Agent, executor: concurrent.futures.Executor
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        stats = self._stats[robot.name]
+        step_time = 1 / robot.max_hz if robot.max_hz > 0 else 0
+        episode_steps = 0
+        last_start: Optional[float] = None
+        next_step = time.monotonic()
+
+        while True:
+            start_time = time.monotonic()
+            done = await loop.run_in_executor(executor, self._step, robot, agent)
+            episode_steps += 1
+            now = time.monotonic()
+            self._update_stats(stats, now - start_time, start_time - last_start if last_start else None, step_time)
+            last_start = start_time
+
+            if done or (robot.max_episode_steps > 0 and episode_steps >= robot.max_episode_steps):
+                return
+
+            # Wait for the next tick of this robot. Ticks that were missed are skipped rather than made up for.
+            next_step = max(next_step + step_time, now)
+            await asyncio.sleep(next_step - now)
+
+    def _step(self, robot: RobotConfig, agent: _agent.Agent) -> bool:
+        """A single step of a robot, returns whether the episode is complete."""
+        observation = robot.environment.get_observation()
+        action = agent.get_action(observation)
+        robot.environment.apply_action(action)
+
+        for subscriber in self._subscribers[robot.name]:
+            subscriber.on_step(observation, action)
+        return robot.environment.is_episode_complete()
+
+    @staticmethod
+    def _update_stats(stats: LoopStats, step_duration: float, period: Optional[float], step_time: float) -> None:
+        stats.num_steps += 1
+        stats.mean_step_ms += (step_duration * 1000 - stats.mean_step_ms) / stats.num_steps
+        stats.max_step_ms = max(stats.max_step_ms, step_duration * 1000)
+        if step_time > 0 and step_duration > step_time:
+            stats.num_overruns += 1
+        if period:
+            rate_hz = 1 / period
+            stats.rate_hz = rate_hz if stats.rate_hz == 0 else stats.rate_hz + 0.1 * (rate_hz - stats.rate_hz)
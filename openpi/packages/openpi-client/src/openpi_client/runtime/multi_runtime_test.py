@@ -0,0 +1,97 @@
+import threading
+import time
+
+from openpi_client import base_policy as _base_policy
+from openpi_client.runtime import agent as _agent
+from openpi_client.runtime import environment as _environment
+from openpi_client.runtime import multi_runtime as _multi_runtime
+
+
+class _CountingEnvironment(_environment.Environment):
+    def __init__(self, num_steps: int) -> None:
+        self.num_steps = num_steps
+        self.actions = []
+
+    def reset(self) -> None:
+        self.actions = []
+
+    def is_episode_complete(self) -> bool:
+        return len(self.actions) >= self.num_steps
+
+    def get_observation(self) -> dict:
+        return {"step": len(self.actions)}
+
+    def apply_action(self, action: dict) -> None:
+        self.actions.append(action["step"])
+
+
+class _EchoAgent(_agent.Agent):
+    def __init__(self, policy: _base_policy.BasePolicy) -> None:
+        self._policy = policy
+
+    def get_action(self, observation: dict) -> dict:
+        return self._policy.infer(observation)
+
+    def reset(self) -> None:
+        pass
+
+
+class _EchoPolicy(_base_policy.BasePolicy):
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.threads = set()
+
+    def infer(self, obs: dict) -> dict:
+        return self.infer_batch([obs])[0]
+
+    def infer_batch(self, obs_batch):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return [dict(obs) for obs in obs_batch]
+
+
+def test_runs_robots_at_their_own_rate_and_batches_requests():
+    environments = [_CountingEnvironment(num_steps=20) for _ in range(3)]
+    policy = _EchoPolicy(delay=0.005)
+    runtime = _multi_runtime.MultiRuntime(
+        [
+            _multi_runtime.RobotConfig(f"robot_{i}", env, _EchoAgent, max_hz=hz, num_episodes=2)
+            for i, (env, hz) in enumerate(zip(environments, [100, 100, 50]))
+        ],
+        policy,
+    )
+    start_time = time.monotonic()
+    runtime.run()
+
+    # The final reset clears the actions, so check the episode length through the statistics.
+    stats = runtime.stats()
+    assert all(s.num_steps == 40 for s in stats.values())
+    # The slowest robot determines the total run time: 2 episodes with 20 steps at 50 Hz.
+    assert 0.7 < time.monotonic() - start_time < 1.5
+    assert stats["robot_0"].rate_hz > 1.5 * stats["robot_2"].rate_hz
+    assert 40 < stats["robot_2"].rate_hz < 55
+
+    # Robots that step at the same time share a policy request, and all requests use the same thread.
+    assert max(runtime.batch_sizes()) > 1
+    assert sum(runtime.batch_sizes()) == 120
+    assert len(policy.threads) == 1
+
+
+def test_robot_failure_stops_the_runtime():
+    class _FailingEnvironment(_CountingEnvironment):
+        def get_observation(self) -> dict:
+            raise RuntimeError("camera disconnected")
+
+    runtime = _multi_runtime.MultiRuntime(
+        [
+            _multi_runtime.RobotConfig("ok", _CountingEnvironment(num_steps=1000), _EchoAgent, max_hz=100),
+            _multi_runtime.RobotConfig("broken", _FailingEnvironment(num_steps=10), _EchoAgent),
+        ],
+        _EchoPolicy(delay=0.001),
+    )
+    try:
+        runtime.run()
+        raise AssertionError("Expected the failure to propagate.")
+    except RuntimeError as e:
+        assert "camera disconnected" in str(e)
+    assert runtime.stats()["ok"].num_steps < 1000
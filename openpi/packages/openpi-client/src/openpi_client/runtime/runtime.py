@@ -3,12 +3,18 @@ import threading
 import time
 
 from openpi_client.runtime import agent as _agent
+from openpi_client.runtime import async_subscriber as _async_subscriber
 from openpi_client.runtime import environment as _environment
 from openpi_client.runtime import subscriber as _subscriber
 
 
 class Runtime:
-    """The core module orchestrating interactions between key components of the system."""
+    """The core module orchestrating interactions between key components of the system.
+
+    By default, subscribers are called synchronously from the runtime loop. If `subscriber_queue_size` is positive, each
+    subscriber instead receives its events from a bounded queue on a background thread (see `AsyncSubscriber`), and
+    `subscriber_drop_policy` decides what happens to steps when a subscriber falls behind.
+    """
 
     def __init__(
         self,
@@ -18,9 +24,16 @@ class Runtime:
         max_hz: float = 0,
         num_episodes: int = 1,
         max_episode_steps: int = 0,
+        subscriber_queue_size: int = 0,
+        subscriber_drop_policy: _async_subscriber.DropPolicy = _async_subscriber.DropPolicy.DROP_OLDEST,
     ) -> None:
         self._environment = environment
         self._agent = agent
+        if subscriber_queue_size > 0:
+            subscribers = [
+                _async_subscriber.AsyncSubscriber(subscriber, subscriber_queue_size, subscriber_drop_policy)
+                for subscriber in subscribers
+            ]
         self._subscribers = subscribers
         self._max_hz = max_hz
         self._num_episodes = num_episodes
@@ -31,8 +44,14 @@ class Runtime:
 
     def run(self) -> None:
         """Runs the runtime loop continuously until stop() is called or the environment is done."""
-        for _ in range(self._num_episodes):
-            self._run_episode()
+        try:
+            for _ in range(self._num_episodes):
+                self._run_episode()
+        finally:
+            # Deliver the remaining events of asynchronous subscribers.
+            for subscriber in self._subscribers:
+                if isinstance(subscriber, _async_subscriber.AsyncSubscriber):
+                    subscriber.close()
 
         # Final reset, this is important for real environments to move the robot to its home position.
         self._environment.reset()
@@ -1,13 +1,26 @@
 import logging
 import time
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from typing_extensions import override
 import websockets.sync.client
 
 from openpi_client import base_policy as _base_policy
+from openpi_client import image_codec as _image_codec
 from openpi_client import msgpack_numpy
 
+# Optional entry of an observation with information about the request, e.g. `{"timeout_ms": 30}`. Supported fields:
+#   deadline: Unix time by which the response is needed (requires clocks synchronized with the server).
+#   timeout_ms: Time after the server received the request by which the response is needed.
+#   capture_time: Unix time at which the observation was captured; the server derives a deadline from it.
+REQUEST_INFO_KEY = "__request__"
+# Entry of the response to a request that the server did not evaluate because it could not be answered in time.
+STALE_KEY = "stale"
+
+
+class StaleRequestError(RuntimeError):
+    """The server dropped the request because it could not meet its deadline."""
+
 
 class WebsocketClientPolicy(_base_policy.BasePolicy):
     """Implements the Policy interface by communicating with a server over websocket.
@@ -15,7 +28,15 @@ class WebsocketClientPolicy(_base_policy.BasePolicy):
     See WebsocketPolicyServer for a corresponding server implementation.
     """
 
-    def __init__(self, host: str = "0.0.0.0", port: Optional[int] = None, api_key: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: Optional[int] = None,
+        api_key: Optional[str] = None,
+        request_timeout_ms: Optional[float] = None,
+        image_codec: Optional[str] = None,
+        image_quality: int = 90,
+    ) -> None:
         if host.startswith("ws"):
             self._uri = host
         else:
@@ -24,8 +45,19 @@ class WebsocketClientPolicy(_base_policy.BasePolicy):
             self._uri += f":{port}"
         self._packer = msgpack_numpy.Packer()
         self._api_key = api_key
+        # If set, the server drops requests that it cannot answer within this time and `infer` raises
+        # `StaleRequestError` instead of returning an outdated action.
+        self._request_timeout_ms = request_timeout_ms
         self._ws, self._server_metadata = self._wait_for_server()
 
+        # Compress images if requested and the server can decode them.
+        self._image_encoder = None
+        if image_codec is not None:
+            if image_codec in self._server_metadata.get(_image_codec.CODECS_METADATA_KEY, []):
+                self._image_encoder = _image_codec.ImageEncoder(image_codec, image_quality)
+            else:
+                logging.warning(f"Server does not support image codec {image_codec}, sending raw images")
+
     def get_server_metadata(self) -> Dict:
         return self._server_metadata
 
@@ -45,14 +77,40 @@ class WebsocketClientPolicy(_base_policy.BasePolicy):
 
     @override
     def infer(self, obs: Dict) -> Dict:  # noqa: UP006
-        data = self._packer.pack(obs)
+        return self._request(obs)
+
+    @override
+    def infer_batch(self, obs_batch: Sequence[Dict]) -> List[Dict]:  # noqa: UP006
+        # A list payload is evaluated by the server as a single batch and answered with a list.
+        return self._request(list(obs_batch))
+
+    def _request(self, payload):
+        if self._request_timeout_ms is not None:
+            info = {REQUEST_INFO_KEY: {"timeout_ms": self._request_timeout_ms}}
+            payload = [{**obs, **info} for obs in payload] if isinstance(payload, list) else {**payload, **info}
+        encode_ms = None
+        if self._image_encoder is not None:
+            payload, encode_ms = self._image_encoder.encode(payload)
+        data = self._packer.pack(payload)
         self._ws.send(data)
         response = self._ws.recv()
         if isinstance(response, str):
             # we're expecting bytes; if the server sends a string, it's an error.
             raise RuntimeError(f"Error in inference server:\n{response}")
-        return msgpack_numpy.unpackb(response)
+        response = check_response(msgpack_numpy.unpackb(response))
+        if encode_ms is not None:
+            for result in response if isinstance(response, list) else [response]:
+                result["client_timing"] = {"encode_ms": encode_ms, "request_bytes": len(data)}
+        return response
 
     @override
     def reset(self) -> None:
         pass
+
+
+def check_response(response):
+    """Raises `StaleRequestError` if the server did not evaluate a request, otherwise returns the response."""
+    for result in response if isinstance(response, list) else [response]:
+        if STALE_KEY in result:
+            raise StaleRequestError(f"Request was dropped by the server: {result[STALE_KEY]}")
+    return response
@@ -0,0 +1,125 @@
+"""Benchmark PI0Pytorch.sample_actions across inference configurations.
+
+Builds a randomly initialized PyTorch model from the given variants and times `sample_actions` with the eager
+attention path, the SDPA path and (optionally) the compiled SDPA path. Every configuration is run on the same
+observation and noise, and the maximum absolute difference to the eager result is reported alongside the latency.
+
+Example (CPU, small model):
+    uv run scripts/benchmark_pytorch_inference.py --paligemma-variant dummy --action-expert-variant dummy
+"""
+
+import dataclasses
+import logging
+import time
+
+import numpy as np
+import torch
+import tyro
+
+from openpi.models import model as _model
+from openpi.models import pi0_config
+import openpi.models_pytorch.pi0_pytorch as pi0_pytorch
+
+
+@dataclasses.dataclass
+class Args:
+    paligemma_variant: str = "gemma_2b"
+    action_expert_variant: str = "gemma_300m"
+    pi05: bool = False
+    # Model precision. float32 is recommended on CPU.
+    dtype: str = "float32"
+    device: str | None = None
+
+    batch_size: int = 1
+    action_horizon: int = 50
+    max_token_len: int = 48
+    num_steps: int = 10
+
+    warmup: int = 2
+    iterations: int = 10
+    # Mode passed to torch.compile for the compiled configuration, e.g. "default", "reduce-overhead" (CUDA graphs)
+    # or "max-autotune". Compilation is skipped if None.
+    compile_mode: str | None = None
+    seed: int = 0
+
+
+def make_observation(args: Args, config: pi0_config.Pi0Config, device: torch.device) -> _model.Observation:
+    generator = torch.Generator().manual_seed(args.seed)
+    images = {
+        key: (torch.rand(args.batch_size, 3, *_model.IMAGE_RESOLUTION, generator=generator) * 2 - 1).to(device)
+        for key in _model.IMAGE_KEYS
+    }
+    image_masks = {key: torch.ones(args.batch_size, dtype=torch.bool, device=device) for key in _model.IMAGE_KEYS}
+    prompt_len = args.max_token_len // 2
+    tokenized_prompt = torch.randint(0, 1000, (args.batch_size, args.max_token_len), generator=generator)
+    tokenized_prompt_mask = torch.arange(args.max_token_len)[None].expand(args.batch_size, -1) < prompt_len
+    return _model.Observation(
+        images=images,
+        image_masks=image_masks,
+        state=torch.randn(args.batch_size, config.action_dim, generator=generator).to(device),
+        tokenized_prompt=tokenized_prompt.to(device),
+        tokenized_prompt_mask=tokenized_prompt_mask.to(device),
+    )
+
+
+def _sync(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def run_config(
+    model: pi0_pytorch.PI0Pytorch,
+    observation: _model.Observation,
+    noise: torch.Tensor,
+    args: Args,
+    device: torch.device,
+) -> tuple[torch.Tensor, np.ndarray]:
+    timings = []
+    for i in range(args.warmup + args.iterations):
+        _sync(device)
+        start = time.perf_counter()
+        actions = model.sample_actions(device, observation, noise=noise, num_steps=args.num_steps)
+        _sync(device)
+        if i >= args.warmup:
+            timings.append(time.perf_counter() - start)
+    return actions, np.array(timings) * 1000
+
+
+def main(args: Args) -> None:
+    device = torch.device(args.device or ("cuda" if torch.cuda.is_available() else "cpu"))
+    config = pi0_config.Pi0Config(
+        paligemma_variant=args.paligemma_variant,
+        action_expert_variant=args.action_expert_variant,
+        pi05=args.pi05,
+        dtype=args.dtype,
+        action_horizon=args.action_horizon,
+        max_token_len=args.max_token_len,
+    )
+    torch.manual_seed(args.seed)
+    model = pi0_pytorch.PI0Pytorch(config).to(device).eval()
+
+    observation = make_observation(args, config, device)
+    noise = torch.randn(args.batch_size, config.action_horizon, config.action_dim, device=device)
+
+    configs = [("eager", "eager", None), ("sdpa", "sdpa", None)]
+    if args.compile_mode is not None:
+        configs.append((f"sdpa+compile({args.compile_mode})", "sdpa", args.compile_mode))
+
+    reference = None
+    with torch.inference_mode():
+        for name, attn_implementation, compile_mode in configs:
+            model.configure_inference(attn_implementation=attn_implementation, compile_mode=compile_mode)
+            actions, timings = run_config(model, observation, noise, args, device)
+            actions = actions.float()
+            if reference is None:
+                reference = actions
+            max_diff = (actions - reference).abs().max().item()
+            logging.info(
+                f"{name:<32} mean {timings.mean():8.1f} ms | p50 {np.percentile(timings, 50):8.1f} ms | "
+                f"p90 {np.percentile(timings, 90):8.1f} ms | max diff vs eager {max_diff:.2e}"
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
@@ -0,0 +1,42 @@
+"""Build a pre-decoded frame cache for the LeRobot dataset of a config.
+
+All camera frames are decoded once and stored at model resolution in memory-mapped arrays, together with the other
+per-frame features. Training then serves samples from the cache by slicing instead of decoding video. To use the cache,
+pass its directory to the training script:
+
+    uv run scripts/build_frame_cache.py --config-name <config>
+    uv run scripts/train.py <config> --data.frame-cache-dir <printed cache dir> ...
+"""
+
+import tyro
+
+import openpi.training.config as _config
+import openpi.training.frame_cache as _frame_cache
+
+
+def main(
+    config_name: str,
+    cache_dir: str | None = None,
+    batch_size: int = 64,
+    num_workers: int = 8,
+    overwrite: bool = False,  # noqa: FBT001, FBT002
+):
+    config = _config.get_config(config_name)
+    data_config = config.data.create(config.assets_dirs, config.model)
+    if data_config.repo_id is None or data_config.repo_id == "fake":
+        raise ValueError("Frame caches can only be built for LeRobot datasets.")
+
+    cache_dir = _frame_cache.build_frame_cache(
+        data_config.repo_id,
+        cache_dir or data_config.frame_cache_dir,
+        # All openpi models consume images at 224x224.
+        resolution=(224, 224),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        overwrite=overwrite,
+    )
+    print(f"Frame cache: {cache_dir}")
+
+
+if __name__ == "__main__":
+    tyro.cli(main)
@@ -0,0 +1,84 @@
+"""Compare a weight-only quantized PyTorch policy against the bf16 policy on recorded observations.
+
+The observations are read from a directory written by `PolicyRecorder` (e.g. `serve_policy.py --record`). Both policies
+are run with the same noise, so the reported difference is caused by quantization alone. No calibration data is
+needed. As a side effect, the quantized weights are cached next to the checkpoint.
+
+Example:
+    uv run scripts/check_quantized_policy.py --config pi05_droid --checkpoint-dir <dir> --record-dir policy_records
+"""
+
+import dataclasses
+import gc
+import logging
+import pathlib
+
+import numpy as np
+import tyro
+
+from openpi.models_pytorch import quantization as _quantization
+from openpi.policies import policy_config as _policy_config
+from openpi.policies import policy_records as _policy_records
+from openpi.training import config as _config
+
+
+@dataclasses.dataclass
+class Args:
+    # Training config name (e.g., "pi05_droid").
+    config: str
+    # Checkpoint directory containing `model.safetensors`.
+    checkpoint_dir: str
+    # Directory with records written by `PolicyRecorder`.
+    record_dir: str
+
+    bits: int = 8
+    group_size: int | None = None
+    # Maximum number of recorded observations to evaluate.
+    max_observations: int = 32
+    # Maximum tolerated mean absolute action difference (in unnormalized action units).
+    tolerance: float = 1e-2
+    seed: int = 0
+
+
+def load_recorded_observations(record_dir: pathlib.Path, limit: int) -> list[dict]:
+    return [record["inputs"] for record in _policy_records.load_records(record_dir, limit)]
+
+
+def run_policy(args: Args, quantization: _quantization.QuantizationConfig | None, observations, noise) -> np.ndarray:
+    policy = _policy_config.create_trained_policy(
+        _config.get_config(args.config), args.checkpoint_dir, pytorch_quantization=quantization
+    )
+    actions = np.stack([policy.infer(obs, noise=n)["actions"] for obs, n in zip(observations, noise, strict=True)])
+    # Only keep one model in memory at a time.
+    del policy
+    gc.collect()
+    return actions
+
+
+def main(args: Args) -> None:
+    train_config = _config.get_config(args.config)
+    observations = load_recorded_observations(pathlib.Path(args.record_dir), args.max_observations)
+    rng = np.random.default_rng(args.seed)
+    noise = rng.standard_normal(
+        (len(observations), train_config.model.action_horizon, train_config.model.action_dim), dtype=np.float32
+    )
+
+    reference = run_policy(args, None, observations, noise)
+    quantization = _quantization.QuantizationConfig(bits=args.bits, group_size=args.group_size)
+    quantized = run_policy(args, quantization, observations, noise)
+
+    diff = np.abs(quantized - reference)
+    per_observation = diff.reshape(len(observations), -1).mean(axis=-1)
+    relative = np.linalg.norm(quantized - reference) / max(np.linalg.norm(reference), 1e-12)
+    logging.info(f"Compared {quantization.name} against bf16 on {len(observations)} observations")
+    logging.info(f"Mean abs diff: {diff.mean():.3e} | max abs diff: {diff.max():.3e} | relative L2: {relative:.3e}")
+    logging.info(f"Worst observation: {int(per_observation.argmax())} (mean abs diff {per_observation.max():.3e})")
+
+    if diff.mean() > args.tolerance:
+        raise SystemExit(f"Quantized policy exceeds tolerance: {diff.mean():.3e} > {args.tolerance:.3e}")
+    logging.info("Quantized policy is within tolerance.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
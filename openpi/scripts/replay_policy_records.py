@@ -0,0 +1,83 @@
+"""Replay recorded policy inputs through a policy to benchmark it.
+
+The observations are read from a directory written by `PolicyRecorder` (e.g. `serve_policy.py --record`) and sent to
+the policy in the recorded order, optionally in batches. The script reports the inference latency and how far the
+predicted actions are from the recorded ones. Since sampling is stochastic, the action difference is only meaningful
+when comparing runs of this script against each other (e.g. before and after a change), not as an absolute number.
+
+Example:
+    uv run scripts/replay_policy_records.py --config pi05_droid --checkpoint-dir <dir> --record-dir policy_records
+"""
+
+import dataclasses
+import logging
+import time
+
+import numpy as np
+import tyro
+
+from openpi.policies import policy_config as _policy_config
+from openpi.policies import policy_records as _policy_records
+from openpi.training import config as _config
+
+
+@dataclasses.dataclass
+class Args:
+    # Training config name (e.g., "pi05_droid").
+    config: str
+    # Checkpoint directory.
+    checkpoint_dir: str
+    # Directory with records written by `PolicyRecorder`, or a single session directory.
+    record_dir: str
+
+    # Maximum number of records to replay. All records are replayed if not set.
+    max_records: int | None = None
+    # Number of observations per `infer_batch` call. Uses `infer` if 1.
+    batch_size: int = 1
+    # Number of initial calls excluded from the latency statistics (compilation, warmup).
+    num_warmup: int = 2
+    seed: int = 0
+
+
+def main(args: Args) -> None:
+    records = list(_policy_records.load_records(args.record_dir, args.max_records))
+    logging.info(f"Loaded {len(records)} records from {args.record_dir}")
+
+    train_config = _config.get_config(args.config)
+    policy = _policy_config.create_trained_policy(train_config, args.checkpoint_dir)
+    rng = np.random.default_rng(args.seed)
+
+    latencies = []
+    diffs = []
+    for start in range(0, len(records), args.batch_size):
+        batch = records[start : start + args.batch_size]
+        observations = [record["inputs"] for record in batch]
+        noise = rng.standard_normal(
+            (len(batch), train_config.model.action_horizon, train_config.model.action_dim), dtype=np.float32
+        )
+
+        start_time = time.monotonic()
+        if args.batch_size == 1:
+            results = [policy.infer(observations[0], noise=noise[0])]
+        else:
+            results = policy.infer_batch(observations, noise=noise)
+        latencies.append(time.monotonic() - start_time)
+
+        for record, result in zip(batch, results, strict=True):
+            recorded = record.get("outputs", {}).get("actions")
+            if recorded is not None and np.shape(recorded) == np.shape(result["actions"]):
+                diffs.append(np.abs(np.asarray(result["actions"]) - recorded).mean())
+
+    timed = np.asarray(latencies[args.num_warmup :] or latencies) * 1000
+    logging.info(
+        f"Latency per call (batch size {args.batch_size}, {len(timed)} calls): mean {timed.mean():.1f} ms | "
+        f"p50 {np.percentile(timed, 50):.1f} ms | p99 {np.percentile(timed, 99):.1f} ms"
+    )
+    logging.info(f"Throughput: {args.batch_size * 1000 / timed.mean():.1f} observations/s")
+    if diffs:
+        logging.info(f"Mean abs diff to recorded actions: {np.mean(diffs):.3e} (over {len(diffs)} records)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, force=True)
+    main(tyro.cli(Args))
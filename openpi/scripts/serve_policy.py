@@ -5,6 +5,7 @@ import socket
 
 import tyro
 
+from openpi.models_pytorch import quantization as _quantization
 from openpi.policies import policy as _policy
 from openpi.policies import policy_config as _policy_config
 from openpi.serving import websocket_policy_server
@@ -48,8 +49,20 @@ class Args:
 
     # Port to serve the policy on.
     port: int = 8000
+    # Maximum number of requests waiting for inference. Further requests are answered as stale.
+    max_queue_size: int = 64
+    # Drop requests whose observation is older than this when it could be evaluated. Only applies to requests that
+    # report their capture time.
+    max_observation_age_ms: float | None = None
     # Record the policy's behavior for debugging.
     record: bool = False
+    # Store recorded camera images as JPEG with this quality (1-100) instead of raw arrays.
+    record_jpeg_quality: int | None = None
+
+    # Load PyTorch checkpoints with weight-only quantization of the linear layers (8 or 4 bits).
+    quantize_bits: int | None = None
+    # Number of input features sharing a quantization scale. Per output channel if not set.
+    quantize_group_size: int | None = None
 
     # Specifies how to load the policy. If not provided, the default policy for the environment will be used.
     policy: Checkpoint | Default = dataclasses.field(default_factory=Default)
@@ -76,24 +89,39 @@ DEFAULT_CHECKPOINT: dict[EnvMode, Checkpoint] = {
 }
 
 
-def create_default_policy(env: EnvMode, *, default_prompt: str | None = None) -> _policy.Policy:
+def create_default_policy(
+    env: EnvMode,
+    *,
+    default_prompt: str | None = None,
+    quantization: _quantization.QuantizationConfig | None = None,
+) -> _policy.Policy:
     """Create a default policy for the given environment."""
     if checkpoint := DEFAULT_CHECKPOINT.get(env):
         return _policy_config.create_trained_policy(
-            _config.get_config(checkpoint.config), checkpoint.dir, default_prompt=default_prompt
+            _config.get_config(checkpoint.config),
+            checkpoint.dir,
+            default_prompt=default_prompt,
+            pytorch_quantization=quantization,
         )
     raise ValueError(f"Unsupported environment mode: {env}")
 
 
 def create_policy(args: Args) -> _policy.Policy:
     """Create a policy from the given arguments."""
+    quantization = None
+    if args.quantize_bits is not None:
+        quantization = _quantization.QuantizationConfig(bits=args.quantize_bits, group_size=args.quantize_group_size)
+
     match args.policy:
         case Checkpoint():
             return _policy_config.create_trained_policy(
-                _config.get_config(args.policy.config), args.policy.dir, default_prompt=args.default_prompt
+                _config.get_config(args.policy.config),
+                args.policy.dir,
+                default_prompt=args.default_prompt,
+                pytorch_quantization=quantization,
             )
         case Default():
-            return create_default_policy(args.env, default_prompt=args.default_prompt)
+            return create_default_policy(args.env, default_prompt=args.default_prompt, quantization=quantization)
 
 
 def main(args: Args) -> None:
@@ -102,7 +130,7 @@ def main(args: Args) -> None:
 
     # Record the policy's behavior.
     if args.record:
-        policy = _policy.PolicyRecorder(policy, "policy_records")
+        policy = _policy.PolicyRecorder(policy, "policy_records", jpeg_quality=args.record_jpeg_quality)
 
     hostname = socket.gethostname()
     local_ip = socket.gethostbyname(hostname)
@@ -113,6 +141,8 @@ def main(args: Args) -> None:
         host="0.0.0.0",
         port=args.port,
         metadata=policy_metadata,
+        max_queue_size=args.max_queue_size,
+        max_observation_age_ms=args.max_observation_age_ms,
     )
     server.serve_forever()
 
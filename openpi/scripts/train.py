@@ -224,7 +224,7 @@ def main(config: _config.TrainConfig):
         # 如果不用 assets，就添加下面这一行，用 assets 就注释下面这一行
         skip_norm_stats=True,
     )
-    data_iter = iter(data_loader)
+    data_iter = _data_loader.PrefetchIterator(iter(data_loader), config.prefetch_batches)
     batch = next(data_iter)
     logging.info(f"Initialized data loader:\n{training_utils.array_tree_to_info(batch)}")
 
@@ -258,6 +258,7 @@ def main(config: _config.TrainConfig):
     )
 
     infos = []
+    data_iter.pop_wait_time()
     for step in pbar:
         with sharding.set_mesh(mesh):
             train_state, info = ptrain_step(train_rng, train_state, batch)
@@ -265,6 +266,8 @@ def main(config: _config.TrainConfig):
         if step % config.log_interval == 0:
             stacked_infos = common_utils.stack_forest(infos)
             reduced_info = jax.device_get(jax.tree.map(jnp.mean, stacked_infos))
+            # Average time per step that the training loop was blocked on data.
+            reduced_info["data_wait_time"] = data_iter.pop_wait_time() / len(infos)
             info_str = ", ".join(f"{k}={v:.4f}" for k, v in reduced_info.items())
             pbar.write(f"Step {step}: {info_str}")
             wandb.log(reduced_info, step=step)
@@ -274,6 +277,7 @@ def main(config: _config.TrainConfig):
         if (step % config.save_interval == 0 and step > start_step) or step == config.num_train_steps - 1:
             _checkpoints.save_state(checkpoint_manager, train_state, data_loader, step)
 
+    data_iter.close()
     logging.info("Waiting for checkpoint manager to finish")
     checkpoint_manager.wait_until_finished()
 
@@ -14,9 +14,9 @@ import jax
 import jax.numpy as jnp
 import numpy as np
 import orbax.checkpoint as ocp
-import safetensors
 import torch
 
+from openpi.models_pytorch import loading as _loading
 from openpi.models_pytorch import pi0_pytorch
 from openpi.shared import image_tools
 import openpi.shared.array_typing as at
@@ -240,10 +240,16 @@ class BaseModelConfig(abc.ABC):
         state.replace_by_pure_dict(params)
         return nnx.merge(graphdef, state)
 
-    def load_pytorch(self, train_config, weight_path: str):
+    def load_pytorch(self, train_config, weight_path: str, *, device: str | torch.device = "cpu"):
+        """Create a PyTorch model from a safetensors checkpoint.
+
+        The checkpoint is memory-mapped and streamed to `device` tensor by tensor, so neither a randomly initialized
+        copy of the model nor the full checkpoint is held in host memory.
+        """
         logger.info(f"train_config: {train_config}")
-        model = pi0_pytorch.PI0Pytorch(config=train_config.model)
-        safetensors.torch.load_model(model, weight_path)
+        with _loading.init_empty_parameters():
+            model = pi0_pytorch.PI0Pytorch(config=train_config.model)
+        _loading.load_safetensors(model, weight_path, device=device)
         return model
 
     @abc.abstractmethod
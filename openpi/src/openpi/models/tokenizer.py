@@ -12,40 +12,126 @@ import openpi.shared.download as download
 
 
 class PaligemmaTokenizer:
-    def __init__(self, max_len: int = 48):
+    # Number of state bins used by the pi0.5 discrete state format. Digitized values lie in [-1, _NUM_STATE_BINS - 1].
+    _NUM_STATE_BINS = 256
+    _MAX_CACHED_PROMPTS = 1024
+
+    def __init__(self, max_len: int = 48, *, fast_path: bool = True):
         self._max_len = max_len
 
         path = download.maybe_download("gs://big_vision/paligemma_tokenizer.model", gs={"token": "anon"})
         with path.open("rb") as f:
             self._tokenizer = sentencepiece.SentencePieceProcessor(model_proto=f.read())
 
+        self._state_bins = np.linspace(-1, 1, self._NUM_STATE_BINS + 1)[:-1]
+        # Encoded prompt prefixes keyed by (prompt, discrete_state). None marks prompts that need the string path.
+        self._prompt_cache: dict[tuple[str, bool], np.ndarray | None] = {}
+        self._fast_path = fast_path
+        self._fast_state = fast_path and self._build_state_token_table()
+
     def tokenize(self, prompt: str, state: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        if self._fast_path and state is None:
+            return self._pad(self._cached_prefix(prompt, discrete_state=False))
+        if self._fast_state and np.ndim(state) == 1 and np.size(state) > 0:
+            prefix = self._cached_prefix(prompt, discrete_state=True)
+            if prefix is not None:
+                return self._pad(prefix, self._state_tokens(state), self._state_suffix)
+        return self._pad(np.asarray(self._encode_text(prompt, state), dtype=np.int_))
+
+    def _encode_text(self, prompt: str, state: np.ndarray | None = None) -> list[int]:
+        """Reference encoding that formats and tokenizes the full prompt string."""
         cleaned_text = prompt.strip().replace("_", " ").replace("\n", " ")
         if state is not None:
             # This is the Pi05 format, where the state is part of the discrete language input.
-            discretized_state = np.digitize(state, bins=np.linspace(-1, 1, 256 + 1)[:-1]) - 1
+            discretized_state = np.digitize(state, bins=self._state_bins) - 1
             state_str = " ".join(map(str, discretized_state))
             full_prompt = f"Task: {cleaned_text}, State: {state_str};\nAction: "
-            tokens = self._tokenizer.encode(full_prompt, add_bos=True)
-        else:
-            # This is the Pi0 format, where the state is part of the continuous action expert input.
-            # tokenize "\n" separately as the "start of answer" token
-            tokens = self._tokenizer.encode(cleaned_text, add_bos=True) + self._tokenizer.encode("\n")
-        tokens_len = len(tokens)
-        if tokens_len < self._max_len:
-            padding = [False] * (self._max_len - tokens_len)
-            mask = [True] * tokens_len + padding
-            tokens = tokens + padding
-        else:
-            if len(tokens) > self._max_len:
-                logging.warning(
-                    f"Token length ({len(tokens)}) exceeds max length ({self._max_len}), truncating. "
-                    "Consider increasing the `max_token_len` in your model config if this happens frequently."
-                )
-            tokens = tokens[: self._max_len]
-            mask = [True] * self._max_len
+            return self._tokenizer.encode(full_prompt, add_bos=True)
+        # This is the Pi0 format, where the state is part of the continuous action expert input.
+        # tokenize "\n" separately as the "start of answer" token
+        return self._tokenizer.encode(cleaned_text, add_bos=True) + self._tokenizer.encode("\n")
 
-        return np.asarray(tokens), np.asarray(mask)
+    def _build_state_token_table(self) -> bool:
+        """Precomputes the token ids of every state bin and of the trailing `;\nAction: ` separator.
+
+        This relies on SentencePiece not merging tokens across the spaces between state values, which is verified
+        against the string encoding. Returns False, disabling the discrete-state fast path, if that does not hold.
+        """
+        head = self._tokenizer.encode("State:")
+        pieces = []
+        for value in range(-1, self._NUM_STATE_BINS):
+            tokens = self._tokenizer.encode(f"State: {value}")
+            if tokens[: len(head)] != head:
+                logging.warning("Tokenizer merges across the state separator, disabling the state token fast path.")
+                return False
+            pieces.append(tokens[len(head) :])
+        head = self._tokenizer.encode("State: 0")
+        tail = self._tokenizer.encode("State: 0;\nAction: ")
+        if tail[: len(head)] != head:
+            logging.warning("Tokenizer merges across the state suffix, disabling the state token fast path.")
+            return False
+
+        lengths = np.array([len(p) for p in pieces])
+        self._state_token_ids = np.concatenate([np.asarray(p, dtype=np.int_) for p in pieces])
+        self._state_token_lens = lengths
+        self._state_token_offsets = np.cumsum(lengths) - lengths
+        self._state_suffix = np.asarray(tail[len(head) :], dtype=np.int_)
+
+        # A state that covers every bin value, shuffled so that each value appears next to different neighbours.
+        rng = np.random.default_rng(0)
+        probe = np.concatenate([np.arange(-1, self._NUM_STATE_BINS), rng.integers(-1, self._NUM_STATE_BINS, 64)])
+        rng.shuffle(probe)
+        self._probe_state = np.where(probe < 0, -2.0, self._state_bins[np.maximum(probe, 0)])
+        if not self._matches_text_path("Task", self._probe_state):
+            logging.warning("Precomputed state tokens do not match the tokenizer, disabling the state token fast path.")
+            return False
+        return True
+
+    def _cached_prefix(self, prompt: str, *, discrete_state: bool) -> np.ndarray | None:
+        key = (prompt, discrete_state)
+        if key not in self._prompt_cache:
+            if len(self._prompt_cache) >= self._MAX_CACHED_PROMPTS:
+                self._prompt_cache.clear()
+            if not discrete_state:
+                self._prompt_cache[key] = np.asarray(self._encode_text(prompt), dtype=np.int_)
+            elif self._matches_text_path(prompt, self._probe_state):
+                self._prompt_cache[key] = self._encode_prefix(prompt)
+            else:
+                # The prompt interacts with the state separator; always use the string path for it.
+                self._prompt_cache[key] = None
+        return self._prompt_cache[key]
+
+    def _encode_prefix(self, prompt: str) -> np.ndarray:
+        cleaned_text = prompt.strip().replace("_", " ").replace("\n", " ")
+        return np.asarray(self._tokenizer.encode(f"Task: {cleaned_text}, State:", add_bos=True), dtype=np.int_)
+
+    def _matches_text_path(self, prompt: str, state: np.ndarray) -> bool:
+        fast = np.concatenate([self._encode_prefix(prompt), self._state_tokens(state), self._state_suffix])
+        return np.array_equal(fast, self._encode_text(prompt, state))
+
+    def _state_tokens(self, state: np.ndarray) -> np.ndarray:
+        # Gather the variable-length token pieces of each bin from the flat table without a Python loop.
+        # Table row 0 holds bin value -1, so the raw np.digitize result is the row index.
+        idx = np.digitize(state, bins=self._state_bins)
+        lengths = self._state_token_lens[idx]
+        starts = self._state_token_offsets[idx]
+        within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return self._state_token_ids[np.repeat(starts, lengths) + within]
+
+    def _pad(self, *parts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        tokens_len = sum(len(p) for p in parts)
+        if tokens_len > self._max_len:
+            logging.warning(
+                f"Token length ({tokens_len}) exceeds max length ({self._max_len}), truncating. "
+                "Consider increasing the `max_token_len` in your model config if this happens frequently."
+            )
+        tokens = np.zeros(self._max_len, dtype=np.int_)
+        pos = 0
+        for part in parts:
+            n = min(len(part), self._max_len - pos)
+            tokens[pos : pos + n] = part[:n]
+            pos += n
+        return tokens, np.arange(self._max_len) < tokens_len
 
 
 class FASTTokenizer:
@@ -25,3 +25,18 @@ def test_fast_tokenizer():
 
     act = tokenizer.extract_actions(tokens, 3, 2)
     assert act.shape == (3, 2)
+
+
+def test_tokenize_fast_path_matches_text():
+    rng = np.random.default_rng(0)
+    fast = _tokenizer.PaligemmaTokenizer(max_len=200)
+    slow = _tokenizer.PaligemmaTokenizer(max_len=200, fast_path=False)
+
+    for prompt in ["Hello, world!", "pick_up the cup\n", "  stack 3 blocks; then stop  "]:
+        for state in [None, rng.uniform(-1.2, 1.2, size=32), np.array([-1.0, 1.0, np.nan])]:
+            tokens, masks = fast.tokenize(prompt, state)
+            expected_tokens, expected_masks = slow.tokenize(prompt, state)
+
+            assert tokens.dtype == expected_tokens.dtype
+            assert np.array_equal(tokens, expected_tokens)
+            assert np.array_equal(masks, expected_masks)
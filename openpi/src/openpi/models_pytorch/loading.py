@@ -0,0 +1,235 @@
+"""Memory-mapped, streaming safetensors loading for PyTorch models.
+
+`safetensors.torch.load_model` reads the complete checkpoint into host memory, on top of a randomly initialized model
+of the same size. Instead, the model skeleton is built with parameters on the meta device (`init_empty_parameters`),
+and the checkpoint is memory-mapped and copied into it one tensor at a time, directly to the target device and dtype.
+Peak host memory is thus bounded by the largest tensor rather than by the whole checkpoint.
+
+The parsed safetensors header (tensor names, dtypes, shapes and offsets) is cached per checkpoint so that repeated
+loads do not need to parse it again.
+"""
+
+import contextlib
+import dataclasses
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pathlib
+import struct
+import time
+
+import torch
+from torch import nn
+
+import openpi.shared.download as download
+
+logger = logging.getLogger("openpi")
+
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class TensorInfo:
+    dtype: str
+    shape: tuple[int, ...]
+    # Byte range relative to the start of the data section.
+    start: int
+    end: int
+
+
+@dataclasses.dataclass(frozen=True)
+class LoadStats:
+    num_tensors: int
+    num_bytes: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Load throughput in GB/s."""
+        return self.num_bytes / max(self.seconds, 1e-9) / 1e9
+
+
+@contextlib.contextmanager
+def init_empty_parameters():
+    """Creates all module parameters on the meta device.
+
+    Buffers are still created normally, so non-persistent buffers (e.g. rotary frequencies) keep their computed values.
+    Weight initialization and tying work on meta tensors without allocating memory.
+    """
+    register_parameter = nn.Module.register_parameter
+
+    def register_empty_parameter(module: nn.Module, name: str, param: nn.Parameter | None) -> None:
+        register_parameter(module, name, param)
+        # Parameters that are already empty are registered as-is to preserve weight tying.
+        if param is not None and not param.is_meta:
+            module._parameters[name] = nn.Parameter(param.to("meta"), requires_grad=param.requires_grad)  # noqa: SLF001
+
+    nn.Module.register_parameter = register_empty_parameter
+    try:
+        yield
+    finally:
+        nn.Module.register_parameter = register_parameter
+
+
+def read_header(path: pathlib.Path | str) -> tuple[int, dict[str, TensorInfo]]:
+    """Returns the offset of the data section and the tensor infos of a safetensors file.
+
+    The parsed header is cached in the openpi cache directory, keyed on the path, size and modification time of the file.
+    """
+    path = pathlib.Path(path).resolve()
+    stat = path.stat()
+    key = hashlib.sha256(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:32]
+    cache_path = download.get_cache_dir() / "safetensors_metadata" / f"{key}.json"
+
+    if cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+    else:
+        with path.open("rb") as f:
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size))
+        header.pop("__metadata__", None)
+        cached = {"data_offset": 8 + header_size, "tensors": header}
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(cached))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not cache safetensors header of {path}: {e}")
+
+    tensors = {
+        name: TensorInfo(info["dtype"], tuple(info["shape"]), *info["data_offsets"])
+        for name, info in cached["tensors"].items()
+    }
+    return cached["data_offset"], tensors
+
+
+def _named_tensors(model: nn.Module) -> dict[int, tuple[list[str], list[tuple[nn.Module, str, bool]]]]:
+    """Groups the persistent tensors of `model` by identity.
+
+    Returns all qualified names and all (module, attribute, is_parameter) locations of every distinct tensor.
+    """
+    locations: dict[int, list[tuple[nn.Module, str, bool]]] = {}
+    names: dict[int, list[str]] = {}
+    for module_name, module in model.named_modules(remove_duplicate=False):
+        prefix = f"{module_name}." if module_name else ""
+        tensors = [(n, t, True) for n, t in module._parameters.items()]  # noqa: SLF001
+        tensors += [
+            (n, t, False)
+            for n, t in module._buffers.items()  # noqa: SLF001
+            if n not in module._non_persistent_buffers_set  # noqa: SLF001
+        ]
+        for name, tensor, is_parameter in tensors:
+            if tensor is None:
+                continue
+            locations.setdefault(id(tensor), []).append((module, name, is_parameter))
+            names.setdefault(id(tensor), []).append(prefix + name)
+    return {tensor_id: (names[tensor_id], locations[tensor_id]) for tensor_id in locations}
+
+
+def load_safetensors(
+    model: nn.Module,
+    path: pathlib.Path | str,
+    *,
+    device: torch.device | str = "cpu",
+    strict: bool = True,
+) -> LoadStats:
+    """Streams the tensors of a safetensors file into `model`.
+
+    Each tensor is read from a memory map of the file, cast to the dtype of the corresponding model tensor and copied to
+    `device`. The model tensors may live on the meta device (see `init_empty_parameters`); they are replaced rather
+    than copied into. Tied weights only need to be present once in the file. All remaining tensors of the model are
+    moved to `device` as well.
+    """
+    path = pathlib.Path(path)
+    device = torch.device(device)
+    data_offset, infos = read_header(path)
+
+    # Resolve every model tensor to the checkpoint entry that provides it.
+    assignments = []
+    missing = []
+    for names, locations in _named_tensors(model).values():
+        file_name = next((name for name in names if name in infos), None)
+        if file_name is None:
+            missing.append(names[0])
+            continue
+        module, attr, _ = locations[0]
+        current = getattr(module, attr)
+        if tuple(current.shape) != infos[file_name].shape:
+            raise ValueError(
+                f"Shape mismatch for {file_name}: checkpoint {infos[file_name].shape}, model {tuple(current.shape)}"
+            )
+        assignments.append((file_name, current.dtype, current.requires_grad, locations))
+    unexpected = set(infos) - {file_name for file_name, *_ in assignments}
+    if strict and (missing or unexpected):
+        raise RuntimeError(
+            f"Error loading {path}: missing keys {sorted(missing)}, unexpected keys {sorted(unexpected)}"
+        )
+
+    # Read in file order so that the memory map is accessed sequentially.
+    assignments.sort(key=lambda a: infos[a[0]].start)
+
+    start_time = time.perf_counter()
+    num_bytes = 0
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY) as buffer:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            buffer.madvise(mmap.MADV_SEQUENTIAL)
+        for file_name, dtype, requires_grad, locations in assignments:
+            info = infos[file_name]
+            source_dtype = _DTYPES[info.dtype]
+            if info.end == info.start:
+                tensor = torch.empty(info.shape, dtype=source_dtype)
+            else:
+                tensor = torch.frombuffer(
+                    buffer,
+                    dtype=source_dtype,
+                    count=(info.end - info.start) // source_dtype.itemsize,
+                    offset=data_offset + info.start,
+                ).view(info.shape)
+            # Cast on whichever side of the copy moves fewer bytes.
+            if dtype.itemsize < source_dtype.itemsize:
+                tensor = tensor.to(dtype=dtype).to(device=device)
+            else:
+                tensor = tensor.to(device=device, copy=True).to(dtype=dtype)
+            if locations[0][2]:
+                tensor = nn.Parameter(tensor, requires_grad=requires_grad)
+            for module, attr, is_parameter in locations:
+                if is_parameter:
+                    module._parameters[attr] = tensor  # noqa: SLF001
+                else:
+                    module._buffers[attr] = tensor  # noqa: SLF001
+            num_bytes += info.end - info.start
+            # The data has been copied, so release the mapped pages instead of keeping the whole file resident.
+            if hasattr(mmap, "MADV_DONTNEED"):
+                begin = (data_offset + info.start) // mmap.PAGESIZE * mmap.PAGESIZE
+                end = (data_offset + info.end) // mmap.PAGESIZE * mmap.PAGESIZE
+                if end > begin:
+                    buffer.madvise(mmap.MADV_DONTNEED, begin, end - begin)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    stats = LoadStats(len(assignments), num_bytes, time.perf_counter() - start_time)
+
+    if strict:
+        empty = [name for name, tensor in model.state_dict().items() if tensor.is_meta]
+        if empty:
+            raise RuntimeError(f"Parameters were not loaded from {path}: {empty}")
+    model.to(device)
+
+    logger.info(
+        f"Loaded {stats.num_tensors} tensors ({stats.num_bytes / 1e9:.2f} GB) from {path} in {stats.seconds:.2f}s "
+        f"({stats.throughput:.2f} GB/s)"
+    )
+    return stats
@@ -0,0 +1,41 @@
+import safetensors.torch
+import torch
+from torch import nn
+
+from openpi.models_pytorch import loading as _loading
+
+
+class _TiedModel(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.embed = nn.Embedding(10, 8)
+        self.proj = nn.Linear(8, 8).to(torch.bfloat16)
+        self.head = nn.Linear(8, 10, bias=False)
+        self.head.weight = self.embed.weight
+        self.register_buffer("running", torch.zeros(8))
+        self.register_buffer("freqs", torch.arange(4.0), persistent=False)
+
+
+def test_load_safetensors(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENPI_DATA_HOME", str(tmp_path / "cache"))
+
+    torch.manual_seed(0)
+    reference = _TiedModel()
+    reference.running.fill_(3.0)
+    # Store everything in float32 so that the bf16 layer is cast while loading.
+    path = tmp_path / "model.safetensors"
+    safetensors.torch.save_model(reference.float(), str(path))
+    reference.proj.to(torch.bfloat16)
+
+    for _ in range(2):  # The second load uses the cached header.
+        with _loading.init_empty_parameters():
+            model = _TiedModel()
+        assert model.embed.weight.is_meta
+        stats = _loading.load_safetensors(model, path)
+
+        assert stats.num_tensors == 4
+        assert model.head.weight is model.embed.weight
+        assert model.proj.weight.dtype == torch.bfloat16
+        assert torch.equal(model.freqs, torch.arange(4.0))
+        for key, value in reference.state_dict().items():
+            assert torch.equal(model.state_dict()[key], value), key
@@ -9,6 +9,7 @@ import torch.nn.functional as F  # noqa: N812
 import openpi.models.gemma as _gemma
 from openpi.models_pytorch.gemma_pytorch import PaliGemmaWithExpertModel
 import openpi.models_pytorch.preprocessing_pytorch as _preprocessing
+import openpi.models_pytorch.quantization as _quantization
 
 
 def get_safe_dtype(target_dtype, device_type):
@@ -137,7 +138,9 @@ class PI0Pytorch(nn.Module):
             self.action_time_mlp_out = nn.Linear(action_expert_config.width, action_expert_config.width)
 
         torch.set_float32_matmul_precision("high")
-        self.sample_actions = torch.compile(self.sample_actions, mode="max-autotune")
+        # Unlike the original `torch.compile(self.sample_actions, mode="max-autotune")`, which compiled on every device,
+        # compilation is only enabled by default on CUDA: on CPU the compile time outweighs the speedup.
+        self.configure_inference(compile_mode="max-autotune" if torch.cuda.is_available() else None)
 
         # Initialize gradient checkpointing flag
         self.gradient_checkpointing_enabled = False
@@ -151,6 +154,28 @@ class PI0Pytorch(nn.Module):
         except ImportError:
             raise ValueError(msg) from None
 
+    def configure_inference(self, *, attn_implementation: str = "eager", compile_mode: str | None = None):
+        """Configure how `sample_actions` runs.
+
+        Args:
+            attn_implementation: Attention kernel used at inference time. "eager" (explicit softmax, the training
+                implementation) is the default and reproduces the previous outputs exactly. "sdpa" (torch
+                scaled_dot_product_attention) is faster but opt-in, since its outputs differ slightly (about 1e-6 on
+                CPU, possibly more with other SDPA backends).
+            compile_mode: If not None, the denoise step is wrapped with `torch.compile(mode=compile_mode)`.
+                "reduce-overhead" additionally captures it into a CUDA graph on GPU. None runs it eagerly, which is
+                the fastest option to start up on CPU.
+        """
+        if attn_implementation not in ("sdpa", "eager"):
+            raise ValueError(f"Unsupported attention implementation: {attn_implementation}")
+        self._inference_attn_implementation = attn_implementation
+        self._inference_compile_mode = compile_mode
+        self._denoise_step_fn = (
+            self._denoise_step
+            if compile_mode is None
+            else torch.compile(self._denoise_step, mode=compile_mode, dynamic=False)
+        )
+
     def gradient_checkpointing_enable(self):
         """Enable gradient checkpointing for memory optimization."""
         self.gradient_checkpointing_enabled = True
@@ -186,6 +211,24 @@ class PI0Pytorch(nn.Module):
         att_2d_masks_4d = att_2d_masks[:, None, :, :]
         return torch.where(att_2d_masks_4d, 0.0, -2.3819763e38)
 
+    def _prepare_inference_attention_masks_4d(self, att_2d_masks):
+        """Prepare 4D attention masks for the configured inference attention implementation."""
+        if self._inference_attn_implementation == "eager":
+            return self._prepare_attention_masks_4d(att_2d_masks)
+        # SDPA takes boolean masks. Fully masked rows (padding queries) would produce NaNs that leak into the KV cache
+        # through 0 * NaN, so let every query attend to itself; this only changes rows whose outputs are discarded.
+        query_len, key_len = att_2d_masks.shape[-2:]
+        diagonal = torch.eye(query_len, key_len, dtype=torch.bool, device=att_2d_masks.device)
+        if key_len > query_len:
+            # Suffix queries sit at the end of the key sequence (after the cached prefix).
+            diagonal = torch.roll(diagonal, key_len - query_len, dims=1)
+        return (att_2d_masks | diagonal)[:, None, :, :]
+
+    def _set_attn_implementation(self, attn_implementation):
+        models = (self.paligemma_with_expert.paligemma.language_model, self.paligemma_with_expert.gemma_expert.model)
+        for model in models:
+            model.config._attn_implementation = attn_implementation  # noqa: SLF001
+
     def _preprocess_observation(self, observation, *, train=True):
         """Helper method to preprocess observation."""
         observation = _preprocessing.preprocess_observation_pytorch(observation, train=train)
@@ -358,7 +401,7 @@ class PI0Pytorch(nn.Module):
         prefix_embs, prefix_pad_masks, prefix_att_masks = self.embed_prefix(images, img_masks, lang_tokens, lang_masks)
         suffix_embs, suffix_pad_masks, suffix_att_masks, adarms_cond = self.embed_suffix(state, x_t, time)
         if (
-            self.paligemma_with_expert.paligemma.language_model.layers[0].self_attn.q_proj.weight.dtype
+            _quantization.weight_dtype(self.paligemma_with_expert.paligemma.language_model.layers[0].self_attn.q_proj)
             == torch.bfloat16
         ):
             suffix_embs = suffix_embs.to(dtype=torch.bfloat16)
@@ -415,8 +458,8 @@ class PI0Pytorch(nn.Module):
         prefix_position_ids = torch.cumsum(prefix_pad_masks, dim=1) - 1
 
         # Compute image and language key value cache
-        prefix_att_2d_masks_4d = self._prepare_attention_masks_4d(prefix_att_2d_masks)
-        self.paligemma_with_expert.paligemma.language_model.config._attn_implementation = "eager"  # noqa: SLF001
+        prefix_att_2d_masks_4d = self._prepare_inference_attention_masks_4d(prefix_att_2d_masks)
+        self._set_attn_implementation(self._inference_attn_implementation)
 
         _, past_key_values = self.paligemma_with_expert.forward(
             attention_mask=prefix_att_2d_masks_4d,
@@ -426,26 +469,62 @@ class PI0Pytorch(nn.Module):
             use_cache=True,
         )
 
-        dt = -1.0 / num_steps
-        dt = torch.tensor(dt, dtype=torch.float32, device=device)
+        # Masks and positions of the action tokens do not change across denoising steps.
+        suffix_att_2d_masks_4d, suffix_position_ids = self._prepare_suffix_attention(prefix_pad_masks)
+
+        dt = torch.tensor(-1.0 / num_steps, dtype=torch.float32, device=device)
+        # The time grid is computed on the host so the loop below never waits on the device.
+        timesteps = self.denoise_timesteps(num_steps).to(device)
 
         x_t = noise
-        time = torch.tensor(1.0, dtype=torch.float32, device=device)
-        while time >= -dt / 2:
-            expanded_time = time.expand(bsize)
-            v_t = self.denoise_step(
+        for step in range(timesteps.shape[0]):
+            v_t = self._denoise_step_fn(
                 state,
-                prefix_pad_masks,
+                suffix_att_2d_masks_4d,
+                suffix_position_ids,
                 past_key_values,
                 x_t,
-                expanded_time,
+                timesteps[step].expand(bsize),
             )
 
             # Euler step - use new tensor assignment instead of in-place operation
             x_t = x_t + dt * v_t
-            time += dt
         return x_t
 
+    @staticmethod
+    def denoise_timesteps(num_steps: int) -> Tensor:
+        """Flow matching times visited by `sample_actions`, from 1 down to (but excluding) 0.
+
+        Accumulates `dt` in float32 exactly like a device-side `time += dt` loop would.
+        """
+        dt = torch.tensor(-1.0 / num_steps, dtype=torch.float32)
+        time = torch.tensor(1.0, dtype=torch.float32)
+        timesteps = []
+        while time >= -dt / 2:
+            timesteps.append(time.clone())
+            time += dt
+        return torch.stack(timesteps)
+
+    def _prepare_suffix_attention(self, prefix_pad_masks):
+        """Build the 4D attention mask and position ids of the suffix (state and action) tokens."""
+        batch_size, prefix_len = prefix_pad_masks.shape
+        device = prefix_pad_masks.device
+
+        # Same layout as `embed_suffix`: every suffix token is valid, state (pi0 only) and actions start new blocks.
+        att_masks = ([] if self.pi05 else [1]) + [1] + [0] * (self.config.action_horizon - 1)
+        suffix_len = len(att_masks)
+        suffix_pad_masks = torch.ones(batch_size, suffix_len, dtype=torch.bool, device=device)
+        suffix_att_masks = torch.tensor(att_masks, dtype=torch.bool, device=device)[None, :].expand(batch_size, -1)
+
+        prefix_pad_2d_masks = prefix_pad_masks[:, None, :].expand(batch_size, suffix_len, prefix_len)
+        suffix_att_2d_masks = make_att_2d_masks(suffix_pad_masks, suffix_att_masks)
+        full_att_2d_masks = torch.cat([prefix_pad_2d_masks, suffix_att_2d_masks], dim=2)
+
+        prefix_offsets = torch.sum(prefix_pad_masks, dim=-1)[:, None]
+        position_ids = prefix_offsets + torch.cumsum(suffix_pad_masks, dim=1) - 1
+
+        return self._prepare_inference_attention_masks_4d(full_att_2d_masks), position_ids
+
     def denoise_step(
         self,
         state,
@@ -455,24 +534,21 @@ class PI0Pytorch(nn.Module):
         timestep,
     ):
         """Apply one denoising step of the noise `x_t` at a given timestep."""
-        suffix_embs, suffix_pad_masks, suffix_att_masks, adarms_cond = self.embed_suffix(state, x_t, timestep)
-
-        suffix_len = suffix_pad_masks.shape[1]
-        batch_size = prefix_pad_masks.shape[0]
-        prefix_len = prefix_pad_masks.shape[1]
-
-        prefix_pad_2d_masks = prefix_pad_masks[:, None, :].expand(batch_size, suffix_len, prefix_len)
+        full_att_2d_masks_4d, position_ids = self._prepare_suffix_attention(prefix_pad_masks)
+        self._set_attn_implementation(self._inference_attn_implementation)
+        return self._denoise_step(state, full_att_2d_masks_4d, position_ids, past_key_values, x_t, timestep)
 
-        suffix_att_2d_masks = make_att_2d_masks(suffix_pad_masks, suffix_att_masks)
-
-        full_att_2d_masks = torch.cat([prefix_pad_2d_masks, suffix_att_2d_masks], dim=2)
-
-        prefix_offsets = torch.sum(prefix_pad_masks, dim=-1)[:, None]
-        position_ids = prefix_offsets + torch.cumsum(suffix_pad_masks, dim=1) - 1
-
-        # Prepare attention masks
-        full_att_2d_masks_4d = self._prepare_attention_masks_4d(full_att_2d_masks)
-        self.paligemma_with_expert.gemma_expert.model.config._attn_implementation = "eager"  # noqa: SLF001
+    def _denoise_step(
+        self,
+        state,
+        full_att_2d_masks_4d,
+        position_ids,
+        past_key_values,
+        x_t,
+        timestep,
+    ):
+        """Denoising step with precomputed suffix masks and position ids. This is what gets compiled."""
+        suffix_embs, _, _, adarms_cond = self.embed_suffix(state, x_t, timestep)
 
         outputs_embeds, _ = self.paligemma_with_expert.forward(
             attention_mask=full_att_2d_masks_4d,
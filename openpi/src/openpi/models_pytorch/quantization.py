@@ -0,0 +1,300 @@
+"""Weight-only int8/int4 quantization for PyTorch models.
+
+Linear layers are replaced by `QuantizedLinear`, which stores symmetric integer weights together with a scale per
+output channel (or per group of input features) and dequantizes them right before the matmul. Activations, norms,
+embeddings and all other parameters keep their original dtype, so no calibration data is needed.
+
+Quantized models can be written to a safetensors cache next to the original checkpoint so that later loads skip both
+the full-precision weights and the quantization itself.
+"""
+
+import dataclasses
+import json
+import logging
+import os
+import pathlib
+from typing import Literal
+
+import safetensors
+import safetensors.torch
+import torch
+from torch import nn
+import torch.nn.functional as F  # noqa: N812
+
+from openpi.models_pytorch import loading as _loading
+
+logger = logging.getLogger("openpi")
+
+
+@dataclasses.dataclass(frozen=True)
+class QuantizationConfig:
+    # Number of bits per weight.
+    bits: Literal[4, 8] = 8
+    # Number of input features that share a scale. If None, a single scale is used per output channel. Layers whose
+    # input size is not a multiple of the group size fall back to a single scale per output channel.
+    group_size: int | None = None
+    # Only linear layers whose qualified name starts with one of these prefixes are quantized.
+    modules: tuple[str, ...] = ("paligemma_with_expert.",)
+    # Linear layers whose qualified name contains one of these substrings are kept in full precision. This keeps the
+    # (adaptive) RMSNorm projections exact.
+    exclude: tuple[str, ...] = ("norm",)
+
+    def __post_init__(self):
+        if self.bits not in (4, 8):
+            raise ValueError(f"Unsupported number of bits: {self.bits}")
+        if self.group_size is not None and (self.group_size <= 0 or self.group_size % 2):
+            raise ValueError(f"group_size must be a positive even number, got {self.group_size}")
+
+    @property
+    def name(self) -> str:
+        return f"int{self.bits}" + (f"-g{self.group_size}" if self.group_size is not None else "")
+
+
+class QuantizedLinear(nn.Module):
+    """Drop-in replacement for `nn.Linear` with integer weights that are dequantized on the fly."""
+
+    def __init__(
+        self,
+        in_features: int,
+        out_features: int,
+        *,
+        bits: int = 8,
+        group_size: int | None = None,
+        bias: bool = True,
+        dtype: torch.dtype = torch.bfloat16,
+        device: torch.device | str | None = None,
+    ):
+        super().__init__()
+        if group_size is None or in_features % group_size:
+            group_size = in_features
+        if bits == 4 and in_features % 2:
+            raise ValueError(f"in_features ({in_features}) must be even for int4 quantization")
+
+        self.in_features = in_features
+        self.out_features = out_features
+        self.bits = bits
+        self.group_size = group_size
+
+        # int4 weights are stored as two nibbles per byte.
+        packed_shape = (out_features, in_features // 2) if bits == 4 else (out_features, in_features)
+        qweight_dtype = torch.uint8 if bits == 4 else torch.int8
+        self.register_buffer("qweight", torch.zeros(packed_shape, dtype=qweight_dtype, device=device))
+        self.register_buffer("scale", torch.ones(out_features, in_features // group_size, dtype=dtype, device=device))
+        if bias:
+            self.register_buffer("bias", torch.zeros(out_features, dtype=dtype, device=device))
+        else:
+            self.bias = None
+
+    @classmethod
+    def from_linear(cls, linear: nn.Linear, *, bits: int = 8, group_size: int | None = None) -> "QuantizedLinear":
+        weight = linear.weight.detach()
+        module = cls(
+            linear.in_features,
+            linear.out_features,
+            bits=bits,
+            group_size=group_size,
+            bias=linear.bias is not None,
+            dtype=weight.dtype,
+            device=weight.device,
+        )
+        qweight, scale = quantize_weight(weight, bits=bits, group_size=module.group_size)
+        module.qweight.copy_(qweight)
+        module.scale.copy_(scale)
+        if linear.bias is not None:
+            module.bias.copy_(linear.bias.detach())
+        return module
+
+    @property
+    def weight_dtype(self) -> torch.dtype:
+        return self.scale.dtype
+
+    @property
+    def weight(self) -> torch.Tensor:
+        """The dequantized weight. Prefer `weight_dtype` when only the dtype is needed."""
+        return self.dequantize()
+
+    def dequantize(self) -> torch.Tensor:
+        qweight = unpack_int4(self.qweight) if self.bits == 4 else self.qweight
+        groups = qweight.view(self.out_features, -1, self.group_size).to(self.scale.dtype)
+        return (groups * self.scale[..., None]).view(self.out_features, self.in_features)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return F.linear(x, self.dequantize(), self.bias)
+
+    def extra_repr(self) -> str:
+        return (
+            f"in_features={self.in_features}, out_features={self.out_features}, bits={self.bits}, "
+            f"group_size={self.group_size}, bias={self.bias is not None}"
+        )
+
+
+def weight_dtype(linear: nn.Module) -> torch.dtype:
+    """Returns the compute dtype of a (possibly quantized) linear layer without materializing its weight."""
+    if isinstance(linear, QuantizedLinear):
+        return linear.weight_dtype
+    return linear.weight.dtype
+
+
+def quantize_weight(weight: torch.Tensor, *, bits: int, group_size: int) -> tuple[torch.Tensor, torch.Tensor]:
+    """Symmetric per-group quantization of a `(out, in)` weight.
+
+    Returns the (packed, for int4) integer weight and the scales of shape `(out, in // group_size)` in the dtype of
+    `weight`. The integers are computed against the rounded scales so that dequantization is exact up to the integer
+    rounding.
+    """
+    qmax = 2 ** (bits - 1) - 1
+    out_features, in_features = weight.shape
+    groups = weight.float().view(out_features, in_features // group_size, group_size)
+    absmax = groups.abs().amax(dim=-1)
+    scale = (absmax / qmax).clamp_min(torch.finfo(torch.float32).tiny).to(weight.dtype)
+    q = torch.round(groups / scale.float()[..., None]).clamp_(-qmax - 1, qmax).to(torch.int8)
+    q = q.view(out_features, in_features)
+    return (pack_int4(q) if bits == 4 else q), scale
+
+
+def pack_int4(q: torch.Tensor) -> torch.Tensor:
+    """Packs int8 values in [-8, 7] along the last axis into uint8, two values per byte."""
+    u = (q + 8).to(torch.uint8)
+    return u[..., 0::2] | (u[..., 1::2] << 4)
+
+
+def unpack_int4(packed: torch.Tensor) -> torch.Tensor:
+    """Inverse of `pack_int4`."""
+    low = (packed & 0x0F).to(torch.int8) - 8
+    high = (packed >> 4).to(torch.int8) - 8
+    return torch.stack([low, high], dim=-1).flatten(-2)
+
+
+def _set_submodule(model: nn.Module, name: str, module: nn.Module) -> None:
+    parent_name, _, child_name = name.rpartition(".")
+    setattr(model.get_submodule(parent_name), child_name, module)
+
+
+def _quantizable_linears(model: nn.Module, config: QuantizationConfig) -> list[str]:
+    # Weights shared with another module (e.g. a tied lm_head) would be duplicated rather than replaced.
+    owners: dict[int, int] = {}
+    for _, module in model.named_modules(remove_duplicate=False):
+        for param in module.parameters(recurse=False):
+            owners[id(param)] = owners.get(id(param), 0) + 1
+
+    names = []
+    for name, module in model.named_modules():
+        if not isinstance(module, nn.Linear):
+            continue
+        if not name.startswith(config.modules) or any(pattern in name for pattern in config.exclude):
+            continue
+        if owners[id(module.weight)] > 1:
+            continue
+        if config.bits == 4 and module.in_features % 2:
+            logger.warning(f"Skipping {name}: in_features={module.in_features} is incompatible with {config.name}")
+            continue
+        names.append(name)
+    return names
+
+
+def quantize_model(model: nn.Module, config: QuantizationConfig) -> list[str]:
+    """Replaces the selected linear layers of `model` in place. Returns the names of the quantized layers."""
+    names = _quantizable_linears(model, config)
+    for name in names:
+        linear = model.get_submodule(name)
+        _set_submodule(model, name, QuantizedLinear.from_linear(linear, bits=config.bits, group_size=config.group_size))
+    return names
+
+
+def save_quantized(
+    model: nn.Module,
+    path: pathlib.Path | str,
+    config: QuantizationConfig,
+    names: list[str],
+    *,
+    metadata: dict[str, str] | None = None,
+) -> None:
+    """Saves a quantized model, including the information needed to rebuild its structure."""
+    metadata = {
+        **(metadata or {}),
+        "quantization": json.dumps(dataclasses.asdict(config)),
+        "quantized_modules": json.dumps(names),
+    }
+    safetensors.torch.save_model(model, str(path), metadata=metadata)
+
+
+def load_quantized(
+    model: nn.Module, path: pathlib.Path | str, *, device: torch.device | str = "cpu"
+) -> QuantizationConfig:
+    """Loads a model saved with `save_quantized` into an unquantized instance of the same architecture.
+
+    The instance may have been created with `loading.init_empty_parameters`; the weights are streamed to `device`.
+    """
+    with safetensors.safe_open(str(path), framework="pt") as f:
+        metadata = f.metadata()
+    fields = json.loads(metadata["quantization"])
+    config = QuantizationConfig(**{k: tuple(v) if isinstance(v, list) else v for k, v in fields.items()})
+    for name in json.loads(metadata["quantized_modules"]):
+        linear = model.get_submodule(name)
+        module = QuantizedLinear(
+            linear.in_features,
+            linear.out_features,
+            bits=config.bits,
+            group_size=config.group_size,
+            bias=linear.bias is not None,
+            dtype=linear.weight.dtype,
+            device="meta",
+        )
+        _set_submodule(model, name, module)
+    _loading.load_safetensors(model, path, device=device)
+    return config
+
+
+def quantized_cache_path(weight_path: pathlib.Path | str, config: QuantizationConfig) -> pathlib.Path:
+    weight_path = pathlib.Path(weight_path)
+    return weight_path.with_name(f"{weight_path.stem}.{config.name}.safetensors")
+
+
+def load_pytorch_quantized(
+    train_config,
+    weight_path: pathlib.Path | str,
+    config: QuantizationConfig,
+    *,
+    device: torch.device | str = "cpu",
+) -> nn.Module:
+    """Loads a PI0Pytorch checkpoint with weight-only quantization.
+
+    The first load quantizes the bf16 model on the CPU and writes `model.<int8|int4-gN>.safetensors` next to
+    `weight_path`. Subsequent loads stream that cache directly to `device`, skipping the full-precision weights. The
+    cache is rebuilt if the original checkpoint changes.
+    """
+    # pi0_pytorch imports this module, importing it at module level would be circular.
+    import openpi.models_pytorch.pi0_pytorch as pi0_pytorch  # noqa: PLC0415
+
+    weight_path = pathlib.Path(weight_path)
+    cache_path = quantized_cache_path(weight_path, config)
+    stat = weight_path.stat()
+    source = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    if cache_path.exists():
+        with safetensors.safe_open(str(cache_path), framework="pt") as f:
+            metadata = f.metadata() or {}
+        if metadata.get("source") == source and metadata.get("quantization") == json.dumps(dataclasses.asdict(config)):
+            logger.info(f"Loading quantized weights from {cache_path}")
+            # All weights come from the cache, so build the model without allocating (or initializing) parameters.
+            with _loading.init_empty_parameters():
+                model = pi0_pytorch.PI0Pytorch(config=train_config.model)
+            model.paligemma_with_expert.to_bfloat16_for_selected_params("bfloat16")
+            load_quantized(model, cache_path, device=device)
+            return model
+        logger.info(f"Ignoring stale quantized cache {cache_path}")
+
+    model = train_config.model.load_pytorch(train_config, str(weight_path))
+    model.paligemma_with_expert.to_bfloat16_for_selected_params("bfloat16")
+    names = quantize_model(model, config)
+    logger.info(f"Quantized {len(names)} linear layers to {config.name}")
+
+    try:
+        tmp_path = cache_path.with_suffix(".tmp")
+        # Record the source checkpoint so that the cache is invalidated when it changes.
+        save_quantized(model, tmp_path, config, names, metadata={"source": source})
+        os.replace(tmp_path, cache_path)
+        logger.info(f"Wrote quantized cache to {cache_path}")
+    except OSError as e:
+        logger.warning(f"Could not write quantized cache to {cache_path}: {e}")
+    return model.to(device)
@@ -0,0 +1,44 @@
+import pytest
+import torch
+from torch import nn
+
+from openpi.models_pytorch import quantization as _quantization
+
+
+@pytest.mark.parametrize(("bits", "group_size"), [(8, None), (8, 16), (4, None), (4, 16)])
+def test_quantized_linear(bits: int, group_size: int | None):
+    torch.manual_seed(0)
+    linear = nn.Linear(64, 32)
+    quantized = _quantization.QuantizedLinear.from_linear(linear, bits=bits, group_size=group_size)
+
+    # Every weight is within half a quantization step of the original.
+    step = quantized.scale.repeat_interleave(quantized.group_size, dim=-1)
+    assert torch.all((quantized.weight - linear.weight).abs() <= step / 2 + 1e-6)
+
+    x = torch.randn(4, 64)
+    assert torch.allclose(quantized(x), linear(x), atol=0.05 if bits == 8 else 0.5)
+    assert quantized.weight_dtype == linear.weight.dtype
+
+
+def test_pack_int4_roundtrip():
+    q = torch.randint(-8, 8, (3, 10), dtype=torch.int8)
+    assert torch.equal(_quantization.unpack_int4(_quantization.pack_int4(q)), q)
+
+
+def test_save_and_load_quantized(tmp_path):
+    def make_model():
+        return nn.Sequential(nn.Linear(16, 32), nn.ReLU(), nn.Linear(32, 8, bias=False), nn.LayerNorm(8))
+
+    torch.manual_seed(0)
+    model = make_model()
+    config = _quantization.QuantizationConfig(bits=4, group_size=8, modules=("",))
+    names = _quantization.quantize_model(model, config)
+    assert names == ["0", "2"]
+
+    path = tmp_path / "model.safetensors"
+    _quantization.save_quantized(model, path, config, names)
+    loaded = make_model()
+    assert _quantization.load_quantized(loaded, path) == config
+
+    x = torch.randn(2, 16)
+    assert torch.equal(loaded(x), model(x))
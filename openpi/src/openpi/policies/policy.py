@@ -1,11 +1,11 @@
+import atexit
 from collections.abc import Sequence
 import logging
+import os
 import pathlib
 import time
 from typing import Any, TypeAlias
 
-import flax
-import flax.traverse_util
 import jax
 import jax.numpy as jnp
 import numpy as np
@@ -15,6 +15,7 @@ from typing_extensions import override
 
 from openpi import transforms as _transforms
 from openpi.models import model as _model
+from openpi.policies import policy_records as _policy_records
 from openpi.shared import array_typing as at
 from openpi.shared import nnx_utils
 
@@ -66,30 +67,41 @@ class Policy(BasePolicy):
 
     @override
     def infer(self, obs: dict, *, noise: np.ndarray | None = None) -> dict:  # type: ignore[misc]
+        return self.infer_batch([obs], noise=noise)[0]
+
+    @override
+    def infer_batch(  # type: ignore[misc]
+        self, obs_batch: Sequence[dict], *, noise: np.ndarray | None = None
+    ) -> list[dict]:
+        """Runs a single `sample_actions` call over several independent observations.
+
+        Input and output transforms operate on unbatched examples, so they are applied per observation and only
+        the model call itself is batched. `noise` may be given per batch `(b, ah, ad)` or shared `(ah, ad)`.
+        """
+        batch_size = len(obs_batch)
         # Make a copy since transformations may modify the inputs in place.
-        inputs = jax.tree.map(lambda x: x, obs)
-        inputs = self._input_transform(inputs)
+        inputs_list = [self._input_transform(jax.tree.map(lambda x: x, obs)) for obs in obs_batch]
         if not self._is_pytorch_model:
             # Make a batch and convert to jax.Array.
-            inputs = jax.tree.map(lambda x: jnp.asarray(x)[np.newaxis, ...], inputs)
+            inputs = jax.tree.map(lambda *xs: jnp.asarray(np.stack([np.asarray(x) for x in xs])), *inputs_list)
             self._rng, sample_rng_or_pytorch_device = jax.random.split(self._rng)
         else:
             # Convert inputs to PyTorch tensors and move to correct device.
             # Guard against non-numeric leaves (strings) which cannot be converted
             # with torch.from_numpy. Leave non-numeric leaves unchanged so that
             # earlier transforms (e.g. TokenizePrompt) can still operate.
-            def _to_torch_leaf(x):
+            def _to_torch_leaf(*xs):
                 try:
-                    arr = np.array(x)
+                    arr = np.stack([np.array(x) for x in xs])
                 except Exception:
-                    return x
+                    return xs[0] if batch_size == 1 else list(xs)
                 # Only convert numeric/boolean/complex dtypes to tensors
                 if arr.dtype.kind in ("f", "i", "u", "b", "c"):
-                    return torch.from_numpy(arr).to(self._pytorch_device)[None, ...]
+                    return torch.from_numpy(arr).to(self._pytorch_device)
                 # Leave strings/objects as-is
-                return x
+                return xs[0] if batch_size == 1 else list(xs)
 
-            inputs = jax.tree.map(lambda x: _to_torch_leaf(x), inputs)
+            inputs = jax.tree.map(_to_torch_leaf, *inputs_list)
             sample_rng_or_pytorch_device = self._pytorch_device
 
         # Prepare kwargs for sample_actions
@@ -99,6 +111,10 @@ class Policy(BasePolicy):
 
             if noise.ndim == 2:  # If noise is (action_horizon, action_dim), add batch dimension
                 noise = noise[None, ...]  # Make it (1, action_horizon, action_dim)
+                if batch_size > 1:
+                    noise = (
+                        noise.expand(batch_size, -1, -1) if self._is_pytorch_model else jnp.repeat(noise, batch_size, 0)
+                    )
             sample_kwargs["noise"] = noise
 
         observation = _model.Observation.from_dict(inputs)
@@ -109,15 +125,20 @@ class Policy(BasePolicy):
         }
         model_time = time.monotonic() - start_time
         if self._is_pytorch_model:
-            outputs = jax.tree.map(lambda x: np.asarray(x[0, ...].detach().cpu()), outputs)
+            outputs = jax.tree.map(lambda x: np.asarray(x.detach().cpu()), outputs)
         else:
-            outputs = jax.tree.map(lambda x: np.asarray(x[0, ...]), outputs)
-
-        outputs = self._output_transform(outputs)
-        outputs["policy_timing"] = {
-            "infer_ms": model_time * 1000,
-        }
-        return outputs
+            outputs = jax.tree.map(lambda x: np.asarray(x), outputs)
+
+        results = []
+        for i in range(batch_size):
+            result = self._output_transform(jax.tree.map(lambda x, i=i: x[i, ...], outputs))
+            result["policy_timing"] = {
+                "infer_ms": model_time * 1000,
+            }
+            if batch_size > 1:
+                result["policy_timing"]["batch_size"] = batch_size
+            results.append(result)
+        return results
 
     @property
     def metadata(self) -> dict[str, Any]:
@@ -125,25 +146,41 @@ class Policy(BasePolicy):
 
 
 class PolicyRecorder(_base_policy.BasePolicy):
-    """Records the policy's behavior to disk."""
+    """Records the policy's behavior to disk.
 
-    def __init__(self, policy: _base_policy.BasePolicy, record_dir: str):
+    Inputs and outputs are appended to a columnar store on a background thread (see `policy_records`), so recording
+    adds no disk I/O to inference. Each recorder writes to a new session directory inside `record_dir`. Use
+    `policy_records.load_records` to read the records back.
+    """
+
+    def __init__(
+        self,
+        policy: _base_policy.BasePolicy,
+        record_dir: str,
+        *,
+        chunk_size: int = 256,
+        jpeg_quality: int | None = None,
+    ):
         self._policy = policy
 
-        logging.info(f"Dumping policy records to: {record_dir}")
-        self._record_dir = pathlib.Path(record_dir)
-        self._record_dir.mkdir(parents=True, exist_ok=True)
-        self._record_step = 0
+        session_dir = pathlib.Path(record_dir) / f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        logging.info(f"Dumping policy records to: {session_dir}")
+        self._writer = _policy_records.RecordWriter(session_dir, chunk_size=chunk_size, jpeg_quality=jpeg_quality)
+        atexit.register(self.close)
 
     @override
     def infer(self, obs: dict) -> dict:  # type: ignore[misc]
         results = self._policy.infer(obs)
+        self._writer.append({"inputs": obs, "outputs": results})
+        return results
 
-        data = {"inputs": obs, "outputs": results}
-        data = flax.traverse_util.flatten_dict(data, sep="/")
-
-        output_path = self._record_dir / f"step_{self._record_step}"
-        self._record_step += 1
-
-        np.save(output_path, np.asarray(data))
+    @override
+    def infer_batch(self, obs_batch: Sequence[dict]) -> list[dict]:  # type: ignore[misc]
+        results = self._policy.infer_batch(obs_batch)
+        for obs, result in zip(obs_batch, results, strict=True):
+            self._writer.append({"inputs": obs, "outputs": result})
         return results
+
+    def close(self) -> None:
+        """Writes all pending records to disk."""
+        self._writer.close()
@@ -6,6 +6,7 @@ from typing import Any
 import jax.numpy as jnp
 
 import openpi.models.model as _model
+import openpi.models_pytorch.quantization as _quantization
 import openpi.policies.policy as _policy
 import openpi.shared.download as download
 from openpi.training import checkpoints as _checkpoints
@@ -22,6 +23,7 @@ def create_trained_policy(
     default_prompt: str | None = None,
     norm_stats: dict[str, transforms.NormStats] | None = None,
     pytorch_device: str | None = None,
+    pytorch_quantization: _quantization.QuantizationConfig | None = None,
 ) -> _policy.Policy:
     """Create a policy from a trained checkpoint.
 
@@ -37,6 +39,8 @@ def create_trained_policy(
             from the checkpoint directory.
         pytorch_device: Device to use for PyTorch models (e.g., "cpu", "cuda", "cuda:0").
                       If None and is_pytorch=True, will use "cuda" if available, otherwise "cpu".
+        pytorch_quantization: If provided, PyTorch models are loaded with weight-only int8/int4 quantization of their
+            linear layers. The quantized weights are cached next to the checkpoint so that later loads are fast.
 
     Note:
         The function automatically detects whether the model is PyTorch-based by checking for the
@@ -49,9 +53,26 @@ def create_trained_policy(
     weight_path = os.path.join(checkpoint_dir, "model.safetensors")
     is_pytorch = os.path.exists(weight_path)
 
+    if pytorch_quantization is not None and not is_pytorch:
+        raise ValueError("Weight-only quantization is only supported for PyTorch checkpoints.")
+
+    # Determine the device to use for PyTorch models
+    if is_pytorch and pytorch_device is None:
+        try:
+            import torch
+
+            pytorch_device = "cuda" if torch.cuda.is_available() else "cpu"
+        except ImportError:
+            pytorch_device = "cpu"
+
     logging.info("Loading model...")
-    if is_pytorch:
-        model = train_config.model.load_pytorch(train_config, weight_path)
+    if is_pytorch and pytorch_quantization is not None:
+        model = _quantization.load_pytorch_quantized(
+            train_config, weight_path, pytorch_quantization, device=pytorch_device
+        )
+    elif is_pytorch:
+        # Stream the weights straight to the target device.
+        model = train_config.model.load_pytorch(train_config, weight_path, device=pytorch_device)
         model.paligemma_with_expert.to_bfloat16_for_selected_params("bfloat16")
     else:
         model = train_config.model.load(_model.restore_params(checkpoint_dir / "params", dtype=jnp.bfloat16))
@@ -63,15 +84,6 @@ def create_trained_policy(
             raise ValueError("Asset id is required to load norm stats.")
         norm_stats = _checkpoints.load_norm_stats(checkpoint_dir / "assets", data_config.asset_id)
 
-    # Determine the device to use for PyTorch models
-    if is_pytorch and pytorch_device is None:
-        try:
-            import torch
-
-            pytorch_device = "cuda" if torch.cuda.is_available() else "cpu"
-        except ImportError:
-            pytorch_device = "cpu"
-
     return _policy.Policy(
         model,
         transforms=[
@@ -0,0 +1,239 @@
+"""Columnar storage for recorded policy inputs and outputs.
+
+Records are appended by `RecordWriter` on a background thread and stored in chunks. Each chunk is a single `.npz` file
+that holds one array per flattened key (e.g. `inputs/observation/image`), stacked over the steps of the chunk. A chunk
+is written when it is full, when the recording is idle for a while, or when the structure of the records changes (a
+key is added or removed, or a value changes its shape or dtype), so that every column of a chunk is uniform.
+
+Images (uint8 arrays with 3 channels, either [H, W, C] or [C, H, W]) can optionally be stored as JPEG. The encoded
+images of a column are concatenated into a single byte array with an offset array next to it.
+
+Layout:
+    <record_dir>/<session>/chunk_<index>.npz
+
+`load_records` iterates over the records of a directory in the order in which they were written. It also reads the
+`step_*.npy` files written by earlier versions of `PolicyRecorder`.
+"""
+
+from collections.abc import Iterator
+import io
+import itertools
+import logging
+import os
+import pathlib
+import queue
+import threading
+import time
+
+import flax.traverse_util
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger("openpi")
+
+# Suffixes of the arrays that hold a JPEG encoded column.
+_JPEG_DATA = "#jpeg"
+_JPEG_OFFSETS = "#jpeg_offsets"
+_JPEG_CHW = "#jpeg_chw"
+
+_STOP = object()
+
+
+def _is_image(value: np.ndarray) -> bool:
+    return value.dtype == np.uint8 and value.ndim == 3 and (value.shape[-1] == 3 or value.shape[0] == 3)
+
+
+def _signature(record: dict[str, np.ndarray]) -> tuple:
+    # Strings of different lengths can share a column.
+    return tuple(
+        (key, value.shape, value.dtype.kind if value.dtype.kind in "SU" else value.dtype.str)
+        for key, value in record.items()
+    )
+
+
+def _encode_jpeg(images: list[np.ndarray], quality: int) -> dict[str, np.ndarray]:
+    chw = images[0].shape[-1] != 3
+    encoded = []
+    for image in images:
+        buffer = io.BytesIO()
+        Image.fromarray(image.transpose(1, 2, 0) if chw else image).save(buffer, format="JPEG", quality=quality)
+        encoded.append(np.frombuffer(buffer.getvalue(), dtype=np.uint8))
+    return {
+        _JPEG_DATA: np.concatenate(encoded),
+        _JPEG_OFFSETS: np.cumsum([0] + [len(e) for e in encoded]),
+        _JPEG_CHW: np.asarray(chw),
+    }
+
+
+def _decode_jpeg(data: np.ndarray, offsets: np.ndarray, chw: bool) -> np.ndarray:  # noqa: FBT001
+    images = [
+        np.asarray(Image.open(io.BytesIO(data[start:end].tobytes())))
+        for start, end in itertools.pairwise(offsets)
+    ]
+    images = np.stack(images)
+    return images.transpose(0, 3, 1, 2) if chw else images
+
+
+def write_chunk(path: pathlib.Path, records: list[dict[str, np.ndarray]], *, jpeg_quality: int | None = None) -> None:
+    """Writes flattened records with identical structure to a chunk file."""
+    columns = {}
+    for key in records[0]:
+        values = [record[key] for record in records]
+        if jpeg_quality is not None and _is_image(values[0]):
+            for suffix, array in _encode_jpeg(values, jpeg_quality).items():
+                columns[key + suffix] = array
+        else:
+            columns[key] = np.stack(values)
+
+    # Write to a temporary file first so that readers never see a partial chunk.
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with tmp_path.open("wb") as f:
+        np.savez(f, **columns)
+    os.replace(tmp_path, path)
+
+
+def read_chunk(path: pathlib.Path) -> list[dict[str, np.ndarray]]:
+    """Reads a chunk file and returns its flattened records."""
+    with np.load(path, allow_pickle=True) as data:
+        columns = {}
+        for name in data.files:
+            if name.endswith(_JPEG_DATA):
+                key = name.removesuffix(_JPEG_DATA)
+                columns[key] = _decode_jpeg(data[name], data[key + _JPEG_OFFSETS], bool(data[key + _JPEG_CHW]))
+            elif not name.endswith((_JPEG_OFFSETS, _JPEG_CHW)):
+                columns[name] = data[name]
+    num_records = len(next(iter(columns.values()))) if columns else 0
+    return [{key: column[i] for key, column in columns.items()} for i in range(num_records)]
+
+
+def _flatten(record: dict) -> dict[str, np.ndarray]:
+    return {key: np.asarray(value) for key, value in flax.traverse_util.flatten_dict(record, sep="/").items()}
+
+
+class RecordWriter:
+    """Appends records to a chunked columnar store from a background thread.
+
+    `append` only puts the record into a queue. If the writer falls behind by more than `max_queue_size` records, new
+    records are dropped (and counted) rather than blocking the caller.
+    """
+
+    def __init__(
+        self,
+        session_dir: pathlib.Path | str,
+        *,
+        chunk_size: int = 256,
+        jpeg_quality: int | None = None,
+        flush_interval: float = 10.0,
+        max_queue_size: int = 1024,
+    ):
+        self._session_dir = pathlib.Path(session_dir)
+        self._session_dir.mkdir(parents=True, exist_ok=True)
+        self._chunk_size = chunk_size
+        self._jpeg_quality = jpeg_quality
+        self._flush_interval = flush_interval
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._num_dropped = 0
+        self._num_chunks = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="policy-record-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def num_dropped(self) -> int:
+        return self._num_dropped
+
+    def append(self, record: dict) -> None:
+        """Queues a (nested) record for writing.
+
+        The record is flattened on the caller's thread, so that later changes to the caller's dicts (e.g. the server
+        adding timing info to the outputs) do not race with the writer thread.
+        """
+        try:
+            self._queue.put_nowait(_flatten(record))
+        except queue.Full:
+            self._num_dropped += 1
+            if self._num_dropped == 1 or self._num_dropped % 1000 == 0:
+                logger.warning(f"Policy record writer cannot keep up, dropped {self._num_dropped} records so far")
+
+    def close(self) -> None:
+        """Writes all queued records and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        # Don't block forever on a full queue if the writer thread is gone.
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=1.0)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+
+    def _run(self) -> None:
+        pending: list[dict[str, np.ndarray]] = []
+        signature = None
+        first_pending_time = 0.0
+        while True:
+            timeout = max(self._flush_interval - (time.monotonic() - first_pending_time), 0.0) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # Write partial chunks after `flush_interval` so that they are not lost if the process dies.
+                self._write(pending)
+                pending = []
+                continue
+            if item is _STOP:
+                self._write(pending)
+                return
+
+            try:
+                if pending and _signature(item) != signature:
+                    self._write(pending)
+                    pending = []
+                if not pending:
+                    signature = _signature(item)
+                    first_pending_time = time.monotonic()
+                pending.append(item)
+                if len(pending) >= self._chunk_size:
+                    self._write(pending)
+                    pending = []
+            except Exception:
+                # Keep the thread alive, otherwise the queue fills up and `close` cannot finish.
+                logger.exception("Failed to process a policy record")
+
+    def _write(self, records: list[dict[str, np.ndarray]]) -> None:
+        if not records:
+            return
+        path = self._session_dir / f"chunk_{self._num_chunks:06d}.npz"
+        try:
+            write_chunk(path, records, jpeg_quality=self._jpeg_quality)
+            self._num_chunks += 1
+        except Exception:
+            logger.exception(f"Failed to write policy records to {path}")
+
+
+def load_records(record_dir: pathlib.Path | str, limit: int | None = None) -> Iterator[dict]:
+    """Yields the recorded steps as nested dicts with "inputs" and "outputs".
+
+    `record_dir` may be the directory passed to `PolicyRecorder` (all sessions are read) or a single session directory.
+    """
+    record_dir = pathlib.Path(record_dir)
+    legacy = sorted(record_dir.glob("step_*.npy"), key=lambda p: int(p.stem.split("_")[1]))
+    # Session directories are named after their start time, so sorting them restores the recording order.
+    chunks = sorted(record_dir.glob("chunk_*.npz")) or sorted(record_dir.glob("*/chunk_*.npz"))
+    if not legacy and not chunks:
+        raise FileNotFoundError(f"No policy records found in {record_dir}")
+
+    count = 0
+    for path in legacy:
+        if limit is not None and count >= limit:
+            return
+        yield flax.traverse_util.unflatten_dict(np.load(path, allow_pickle=True).item(), sep="/")
+        count += 1
+    for path in chunks:
+        for record in read_chunk(path):
+            if limit is not None and count >= limit:
+                return
+            yield flax.traverse_util.unflatten_dict(record, sep="/")
+            count += 1
@@ -0,0 +1,83 @@
+import numpy as np
+
+from openpi.policies import policy_records as _policy_records
+
+
+def _make_record(step: int, prompt: str) -> dict:
+    return {
+        "inputs": {
+            "image": np.full((16, 16, 3), step, dtype=np.uint8),
+            "wrist_image": np.full((3, 16, 16), step, dtype=np.uint8),
+            "state": np.arange(4, dtype=np.float32) + step,
+            "prompt": prompt,
+        },
+        "outputs": {"actions": np.ones((5, 4)) * step, "policy_timing": {"infer_ms": 1.5}},
+    }
+
+
+def test_record_roundtrip(tmp_path):
+    writer = _policy_records.RecordWriter(tmp_path / "session", chunk_size=3)
+    records = [_make_record(step, "pick up the cube" if step < 5 else "place") for step in range(8)]
+    # A new key changes the structure of the records and starts a new chunk.
+    records[6]["outputs"]["policy_timing"]["batch_size"] = 2
+    for record in records:
+        writer.append(record)
+    writer.close()
+
+    # 3 + 3 records, then the structure changes at 6 and again at 7.
+    assert len(list((tmp_path / "session").glob("chunk_*.npz"))) == 4
+    loaded = list(_policy_records.load_records(tmp_path))
+    assert len(loaded) == len(records)
+    for expected, actual in zip(records, loaded, strict=True):
+        assert actual["inputs"]["prompt"] == expected["inputs"]["prompt"]
+        np.testing.assert_array_equal(actual["inputs"]["image"], expected["inputs"]["image"])
+        np.testing.assert_array_equal(actual["inputs"]["state"], expected["inputs"]["state"])
+        np.testing.assert_array_equal(actual["outputs"]["actions"], expected["outputs"]["actions"])
+    assert loaded[6]["outputs"]["policy_timing"]["batch_size"] == 2
+
+    assert len(list(_policy_records.load_records(tmp_path, limit=4))) == 4
+
+
+def test_record_jpeg(tmp_path):
+    writer = _policy_records.RecordWriter(tmp_path / "session", jpeg_quality=95)
+    records = [_make_record(step, "pick") for step in range(4)]
+    for record in records:
+        writer.append(record)
+    writer.close()
+
+    loaded = list(_policy_records.load_records(tmp_path / "session"))
+    for expected, actual in zip(records, loaded, strict=True):
+        for key in ("image", "wrist_image"):
+            assert actual["inputs"][key].shape == expected["inputs"][key].shape
+            assert actual["inputs"][key].dtype == np.uint8
+            np.testing.assert_allclose(actual["inputs"][key], expected["inputs"][key], atol=2)
+        np.testing.assert_array_equal(actual["inputs"]["state"], expected["inputs"]["state"])
+
+
+def test_load_legacy_records(tmp_path):
+    np.save(tmp_path / "step_0", np.asarray({"inputs/state": np.zeros(2), "outputs/actions": np.ones(3)}))
+    (record,) = _policy_records.load_records(tmp_path)
+    np.testing.assert_array_equal(record["outputs"]["actions"], np.ones(3))
+
+
+def test_record_snapshot_at_append(tmp_path):
+    writer = _policy_records.RecordWriter(tmp_path / "session", chunk_size=4)
+    records = [_make_record(step, "pick") for step in range(4)]
+    for record in records:
+        writer.append(record)
+        # Like the websocket server adding its timing after `infer` returned.
+        record["outputs"]["server_timing"] = {"infer_ms": 2.0}
+    writer.close()
+
+    assert len(list((tmp_path / "session").glob("chunk_*.npz"))) == 1
+    assert all("server_timing" not in record["outputs"] for record in _policy_records.load_records(tmp_path))
+
+
+def test_close_with_dead_writer_thread(tmp_path):
+    writer = _policy_records.RecordWriter(tmp_path / "session", max_queue_size=1)
+    writer.append(_make_record(0, "pick"))
+    writer._queue.put(_policy_records._STOP)  # noqa: SLF001
+    writer._thread.join()  # noqa: SLF001
+    writer.append(_make_record(1, "pick"))
+    # The queue is full and nobody drains it, close must still return.
+    writer.close()
@@ -1,21 +1,63 @@
 import asyncio
+import collections
+import dataclasses
 import http
+import itertools
+import json
 import logging
 import time
 import traceback
+from typing import Any
 
 from openpi_client import base_policy as _base_policy
+from openpi_client import image_codec as _image_codec
 from openpi_client import msgpack_numpy
+from openpi_client import websocket_client_policy as _websocket_client_policy
 import websockets.asyncio.server as _server
 import websockets.frames
 
 logger = logging.getLogger(__name__)
 
 
+@dataclasses.dataclass
+class _Request:
+    client_id: int
+    payload: Any
+    is_batch: bool
+    # Monotonic time at which the request was received and by which it must be answered (if any).
+    received: float
+    deadline: float | None
+    future: asyncio.Future = dataclasses.field(repr=False)
+    # Time spent decoding compressed images, if the request contained any.
+    decode_ms: float | None = None
+
+
+@dataclasses.dataclass
+class ServerStats:
+    queue_depth: int = 0
+    num_served: int = 0
+    # Requests answered as stale because they could not meet their deadline.
+    num_expired: int = 0
+    # Requests answered as stale because a newer request of the same client replaced them.
+    num_coalesced: int = 0
+    # Requests answered as stale because the queue was full.
+    num_rejected: int = 0
+    # Moving average of the inference time, used to predict whether a request can still meet its deadline.
+    infer_ms: float = 0.0
+
+
 class WebsocketPolicyServer:
     """Serves a policy using the websocket protocol. See websocket_client_policy.py for a client implementation.
 
     Currently only implements the `load` and `infer` methods.
+
+    Requests of all connections go through a single queue and are evaluated one at a time. Clients may attach a
+    deadline to a request (see `WebsocketClientPolicy`). Requests with a deadline are answered with an explicit stale
+    response instead of being evaluated if they cannot be answered in time, and a queued request with a deadline is
+    replaced by a newer request of the same client. If the queue is full, new requests with a deadline are rejected as
+    stale. Requests without a deadline are always queued: they may come from clients that predate the stale response,
+    and such clients wait for each response before sending the next request, so they cannot flood the queue. The queue
+    statistics are served as JSON at `/stats`.
     """
 
     def __init__(
@@ -24,87 +66,252 @@ class WebsocketPolicyServer:
         host: str = "0.0.0.0",
         port: int | None = None,
         metadata: dict | None = None,
+        *,
+        max_queue_size: int = 64,
+        max_observation_age_ms: float | None = None,
     ) -> None:
         self._policy = policy
         self._host = host
         self._port = port
-        self._metadata = metadata or {}
+        # Advertise the image codecs that clients may use to compress images.
+        self._metadata = {**(metadata or {}), _image_codec.CODECS_METADATA_KEY: _image_codec.supported_codecs()}
+        self._image_decoder = _image_codec.ImageDecoder()
+        self._max_queue_size = max_queue_size
+        # Deadline for requests that only report when their observation was captured.
+        self._max_observation_age_ms = max_observation_age_ms
         logging.getLogger("websockets.server").setLevel(logging.INFO)
 
+        self._queue: collections.deque[_Request] = collections.deque()
+        self._queue_changed: asyncio.Event | None = None
+        self._client_ids = itertools.count()
+        self._stats = ServerStats()
+
+    @property
+    def stats(self) -> ServerStats:
+        return dataclasses.replace(self._stats, queue_depth=len(self._queue))
+
     def serve_forever(self) -> None:
         asyncio.run(self.run())
 
     async def run(self):
-        async with _server.serve(
-            self._handler,
-            self._host,
-            self._port,
-            compression=None,
-            max_size=None,
-            process_request=_health_check,
-        ) as server:
-            await server.serve_forever()
+        self._queue_changed = asyncio.Event()
+        worker = asyncio.create_task(self._inference_loop())
+        try:
+            async with _server.serve(
+                self._handler,
+                self._host,
+                self._port,
+                compression=None,
+                max_size=None,
+                process_request=self._process_request,
+            ) as server:
+                await server.serve_forever()
+        finally:
+            worker.cancel()
 
     async def _handler(self, websocket: _server.ServerConnection):
         logger.info(f"Connection from {websocket.remote_address} opened")
         packer = msgpack_numpy.Packer()
+        client_id = next(self._client_ids)
 
         await websocket.send(packer.pack(self._metadata))
 
+        # Requests are read while earlier ones are still being evaluated, so that a newer observation can replace a
+        # queued one. Responses are sent in the order of the requests.
+        responses: asyncio.Queue[_Request | None] = asyncio.Queue()
+        sender = asyncio.create_task(self._send_responses(websocket, packer, responses))
+        try:
+            loop = asyncio.get_running_loop()
+            while True:
+                message = await websocket.recv()
+                try:
+                    obs = msgpack_numpy.unpackb(message)
+                    # Compressed images are decoded in parallel, off the event loop and while other requests are
+                    # evaluated.
+                    obs, decode_ms = await loop.run_in_executor(None, self._image_decoder.decode, obs)
+                    request = self._submit(client_id, obs)
+                    request.decode_ms = decode_ms
+                except Exception as e:
+                    # Invalid requests are answered with the traceback, like errors during inference.
+                    request = _Request(
+                        client_id=client_id,
+                        payload=None,
+                        is_batch=False,
+                        received=time.monotonic(),
+                        deadline=None,
+                        future=loop.create_future(),
+                    )
+                    request.future.set_exception(e)
+                await responses.put(request)
+        except websockets.ConnectionClosed:
+            logger.info(f"Connection from {websocket.remote_address} closed")
+        finally:
+            # Nobody is waiting for the remaining requests of this client anymore.
+            for request in [r for r in self._queue if r.client_id == client_id]:
+                self._queue.remove(request)
+                self._reject(request, "client disconnected")
+            await responses.put(None)
+            await sender
+
+    async def _send_responses(
+        self, websocket: _server.ServerConnection, packer: msgpack_numpy.Packer, responses: asyncio.Queue
+    ) -> None:
         prev_total_time = None
-        while True:
+        while (request := await responses.get()) is not None:
             try:
-                start_time = time.monotonic()
-                obs = msgpack_numpy.unpackb(await websocket.recv())
-                # DEBUG: log received observation keys/types to help diagnose missing prompt
-                try:
-                    logger.info(f"Received obs keys: {list(obs.keys())}")
-                    # also log simple summary of 'task'/'prompt' if present
-                    if "task" in obs:
-                        logger.info(f"obs['task'] type={type(obs['task'])} value_sample={str(obs['task'])[:200]}")
-                    if "prompt" in obs:
-                        logger.info(f"obs['prompt'] type={type(obs['prompt'])} value_sample={str(obs['prompt'])[:200]}")
-                    if "image" in obs and isinstance(obs["image"], dict):
-                        logger.info(f"image keys: {list(obs['image'].keys())}")
-                except Exception:
-                    logger.exception("Error logging obs summary")
-
-                infer_time = time.monotonic()
-                # Run blocking inference in a threadpool to avoid blocking the asyncio
-                # event loop (model inference may be slow/heavy). This prevents the
-                # websockets keepalive pings from timing out.
+                action, infer_time = await request.future
+            except asyncio.CancelledError:
+                raise
+            except Exception:
                 try:
-                    loop = asyncio.get_running_loop()
-                    action = await loop.run_in_executor(None, self._policy.infer, obs)
-                except Exception:
-                    # If run_in_executor fails for some reason, fall back to direct call
-                    action = self._policy.infer(obs)
-                infer_time = time.monotonic() - infer_time
-
-                action["server_timing"] = {
-                    "infer_ms": infer_time * 1000,
-                }
-                if prev_total_time is not None:
-                    # We can only record the last total time since we also want to include the send time.
-                    action["server_timing"]["prev_total_ms"] = prev_total_time * 1000
+                    await websocket.send(traceback.format_exc())
+                    await websocket.close(
+                        code=websockets.frames.CloseCode.INTERNAL_ERROR,
+                        reason="Internal server error. Traceback included in previous frame.",
+                    )
+                except websockets.ConnectionClosed:
+                    pass
+                logger.exception("Error while handling request")
+                return
 
-                await websocket.send(packer.pack(action))
-                prev_total_time = time.monotonic() - start_time
+            server_timing = {
+                "infer_ms": infer_time * 1000,
+                "queue_ms": (time.monotonic() - request.received - infer_time) * 1000,
+                "queue_depth": len(self._queue),
+            }
+            if request.decode_ms is not None:
+                server_timing["decode_ms"] = request.decode_ms
+            if prev_total_time is not None:
+                # We can only record the last total time since we also want to include the send time.
+                server_timing["prev_total_ms"] = prev_total_time * 1000
+            for result in action if request.is_batch else [action]:
+                result["server_timing"] = dict(server_timing)
 
+            try:
+                await websocket.send(packer.pack(action))
             except websockets.ConnectionClosed:
-                logger.info(f"Connection from {websocket.remote_address} closed")
-                break
+                return
+            prev_total_time = time.monotonic() - request.received
+
+    def _submit(self, client_id: int, obs: Any) -> _Request:
+        """Adds a request to the queue, or answers it right away if it is stale."""
+        now = time.monotonic()
+        # A list payload is a batch of independent observations (see WebsocketClientPolicy.infer_batch).
+        is_batch = isinstance(obs, list)
+        # DEBUG: log received observation keys/types to help diagnose missing prompt
+        if is_batch:
+            logger.info(f"Received batch of {len(obs)} observations")
+        else:
+            try:
+                logger.info(f"Received obs keys: {list(obs.keys())}")
+                # also log simple summary of 'task'/'prompt' if present
+                if "task" in obs:
+                    logger.info(f"obs['task'] type={type(obs['task'])} value_sample={str(obs['task'])[:200]}")
+                if "prompt" in obs:
+                    logger.info(f"obs['prompt'] type={type(obs['prompt'])} value_sample={str(obs['prompt'])[:200]}")
+                if "image" in obs and isinstance(obs["image"], dict):
+                    logger.info(f"image keys: {list(obs['image'].keys())}")
             except Exception:
-                await websocket.send(traceback.format_exc())
-                await websocket.close(
-                    code=websockets.frames.CloseCode.INTERNAL_ERROR,
-                    reason="Internal server error. Traceback included in previous frame.",
-                )
-                raise
+                logger.exception("Error logging obs summary")
+        deadlines = [self._pop_deadline(o, now) for o in (obs if is_batch else [obs])]
+        deadlines = [d for d in deadlines if d is not None]
+        request = _Request(
+            client_id=client_id,
+            payload=obs,
+            is_batch=is_batch,
+            received=now,
+            deadline=min(deadlines) if deadlines else None,
+            future=asyncio.get_running_loop().create_future(),
+        )
+
+        if request.deadline is not None:
+            # Only the newest observation of a client is worth evaluating.
+            for queued in [r for r in self._queue if r.client_id == client_id and r.deadline is not None]:
+                self._queue.remove(queued)
+                self._stats.num_coalesced += 1
+                self._reject(queued, "replaced by a newer request")
+            if not self._can_meet_deadline(request, now):
+                self._stats.num_expired += 1
+                self._reject(request, "deadline cannot be met")
+                return request
+
+        if request.deadline is not None and len(self._queue) >= self._max_queue_size:
+            self._drop_expired(now)
+        if request.deadline is not None and len(self._queue) >= self._max_queue_size:
+            self._stats.num_rejected += 1
+            self._reject(request, "server queue is full")
+            return request
+
+        self._queue.append(request)
+        self._queue_changed.set()
+        return request
+
+    def _pop_deadline(self, obs: Any, now: float) -> float | None:
+        """Removes the request info from an observation and returns its deadline in monotonic time."""
+        info = obs.pop(_websocket_client_policy.REQUEST_INFO_KEY, None) if isinstance(obs, dict) else None
+        if not info:
+            return None
+        # Absolute timestamps come from the client's clock and assume that it is synchronized with the server.
+        to_monotonic = now - time.time()
+        if "deadline" in info:
+            return info["deadline"] + to_monotonic
+        if "timeout_ms" in info:
+            return now + info["timeout_ms"] / 1000
+        if "capture_time" in info and self._max_observation_age_ms is not None:
+            return info["capture_time"] + to_monotonic + self._max_observation_age_ms / 1000
+        return None
+
+    def _can_meet_deadline(self, request: _Request, now: float) -> bool:
+        return request.deadline is None or now + self._stats.infer_ms / 1000 <= request.deadline
+
+    def _drop_expired(self, now: float) -> None:
+        for request in [r for r in self._queue if not self._can_meet_deadline(r, now)]:
+            self._queue.remove(request)
+            self._stats.num_expired += 1
+            self._reject(request, "deadline cannot be met")
+
+    def _reject(self, request: _Request, reason: str) -> None:
+        num_results = len(request.payload) if request.is_batch else 1
+        results = [{_websocket_client_policy.STALE_KEY: reason} for _ in range(num_results)]
+        request.future.set_result((results if request.is_batch else results[0], 0.0))
+
+    async def _inference_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._queue:
+                self._queue_changed.clear()
+                await self._queue_changed.wait()
+            request = self._queue.popleft()
+            if not self._can_meet_deadline(request, time.monotonic()):
+                self._stats.num_expired += 1
+                self._reject(request, "deadline cannot be met")
+                continue
+
+            # Run blocking inference in a threadpool to avoid blocking the asyncio
+            # event loop (model inference may be slow/heavy). This prevents the
+            # websockets keepalive pings from timing out.
+            infer_fn = self._policy.infer_batch if request.is_batch else self._policy.infer
+            start_time = time.monotonic()
+            try:
+                action = await loop.run_in_executor(None, infer_fn, request.payload)
+            except Exception as e:
+                request.future.set_exception(e)
+                continue
+            infer_time = time.monotonic() - start_time
 
+            self._stats.num_served += 1
+            # Batches take longer than single observations, so only single observations update the estimate.
+            if not request.is_batch:
+                alpha = 0.1 if self._stats.infer_ms else 1.0
+                self._stats.infer_ms += alpha * (infer_time * 1000 - self._stats.infer_ms)
+            request.future.set_result((action, infer_time))
 
-def _health_check(connection: _server.ServerConnection, request: _server.Request) -> _server.Response | None:
-    if request.path == "/healthz":
-        return connection.respond(http.HTTPStatus.OK, "OK\n")
-    # Continue with the normal request handling.
-    return None
+    def _process_request(
+        self, connection: _server.ServerConnection, request: _server.Request
+    ) -> _server.Response | None:
+        if request.path == "/healthz":
+            return connection.respond(http.HTTPStatus.OK, "OK\n")
+        if request.path == "/stats":
+            return connection.respond(http.HTTPStatus.OK, json.dumps(dataclasses.asdict(self.stats)) + "\n")
+        # Continue with the normal request handling.
+        return None
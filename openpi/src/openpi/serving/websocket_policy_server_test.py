@@ -0,0 +1,141 @@
+import asyncio
+import socket
+import threading
+import time
+
+import numpy as np
+from openpi_client import base_policy as _base_policy
+from openpi_client import image_codec
+from openpi_client import msgpack_numpy
+from openpi_client import websocket_client_policy as _websocket_client_policy
+import pytest
+import websockets.sync.client
+
+from openpi.serving import websocket_policy_server as _server
+
+
+class _SlowPolicy(_base_policy.BasePolicy):
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.seen = []
+        self.started = threading.Event()
+
+    def infer(self, obs: dict) -> dict:
+        self.seen.append(obs["step"])
+        self.started.set()
+        time.sleep(self.delay)
+        return {"step": obs["step"]}
+
+
+def _start_server(policy: _base_policy.BasePolicy, **kwargs) -> tuple[_server.WebsocketPolicyServer, int]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = _server.WebsocketPolicyServer(policy, host="127.0.0.1", port=port, **kwargs)
+    threading.Thread(target=lambda: asyncio.run(server.run()), daemon=True).start()
+    # Wait until the server accepts connections.
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            break
+        except ConnectionRefusedError:
+            time.sleep(0.01)
+    return server, port
+
+
+def test_timeout_and_stale_response():
+    policy = _SlowPolicy(delay=0.05)
+    server, port = _start_server(policy)
+    client = _websocket_client_policy.WebsocketClientPolicy("127.0.0.1", port, request_timeout_ms=20)
+
+    # The server has no estimate of the inference time yet, so the first request is evaluated.
+    assert client.infer({"step": 0})["step"] == 0
+    # Now it knows that a request takes longer than the timeout.
+    with pytest.raises(_websocket_client_policy.StaleRequestError):
+        client.infer({"step": 1})
+    assert server.stats.num_expired == 1
+
+    # Requests without a deadline are always evaluated.
+    client = _websocket_client_policy.WebsocketClientPolicy("127.0.0.1", port)
+    assert client.infer({"step": 2})["step"] == 2
+    assert policy.seen == [0, 2]
+
+
+def test_coalesces_queued_requests_of_a_client():
+    policy = _SlowPolicy(delay=0.1)
+    server, port = _start_server(policy)
+    packer = msgpack_numpy.Packer()
+    with websockets.sync.client.connect(f"ws://127.0.0.1:{port}", compression=None, max_size=None) as ws:
+        ws.recv()  # Metadata.
+        # Send several requests without waiting for the responses, like a client that streams observations.
+        for step in range(4):
+            ws.send(packer.pack({"step": step, _websocket_client_policy.REQUEST_INFO_KEY: {"timeout_ms": 10_000}}))
+            policy.started.wait()
+        responses = [msgpack_numpy.unpackb(ws.recv()) for _ in range(4)]
+
+    # The first request is evaluated right away, the next two are replaced by the newest one.
+    assert [_websocket_client_policy.STALE_KEY in r for r in responses] == [False, True, True, False]
+    assert responses[-1]["step"] == 3
+    assert policy.seen == [0, 3]
+    assert server.stats.num_coalesced == 2
+    assert "queue_ms" in responses[-1]["server_timing"]
+
+
+class _ImagePolicy(_base_policy.BasePolicy):
+    def infer(self, obs: dict) -> dict:
+        return {"image_mean": obs["image"].mean(), "image_shape": obs["image"].shape}
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.005)
+
+
+def test_full_queue_only_sheds_requests_with_deadline():
+    policy = _SlowPolicy(delay=0.2)
+    server, port = _start_server(policy, max_queue_size=1)
+    packer = msgpack_numpy.Packer()
+    connections = [
+        websockets.sync.client.connect(f"ws://127.0.0.1:{port}", compression=None, max_size=None) for _ in range(4)
+    ]
+    for ws in connections:
+        ws.recv()  # Metadata.
+    # One request is being evaluated and one fills the queue.
+    connections[0].send(packer.pack({"step": 0}))
+    policy.started.wait()
+    connections[1].send(packer.pack({"step": 1}))
+    _wait_for(lambda: server.stats.queue_depth == 1)
+    # A legacy request without a deadline is queued anyway, the old client does not understand stale responses.
+    connections[2].send(packer.pack({"step": 2}))
+    _wait_for(lambda: server.stats.queue_depth == 2)
+    connections[3].send(packer.pack({"step": 3, _websocket_client_policy.REQUEST_INFO_KEY: {"timeout_ms": 10_000}}))
+
+    responses = [msgpack_numpy.unpackb(ws.recv()) for ws in connections]
+    for ws in connections:
+        ws.close()
+    assert [r.get("step") for r in responses[:3]] == [0, 1, 2]
+    assert _websocket_client_policy.STALE_KEY in responses[3]
+    assert server.stats.num_rejected == 1
+
+
+def test_invalid_request_returns_traceback():
+    policy = _SlowPolicy(delay=0.0)
+    _, port = _start_server(policy)
+    client = _websocket_client_policy.WebsocketClientPolicy("127.0.0.1", port)
+    with pytest.raises(RuntimeError, match="TypeError"):
+        client.infer({"step": 0, _websocket_client_policy.REQUEST_INFO_KEY: {"timeout_ms": "soon"}})
+    assert policy.seen == []
+
+
+def test_compressed_images():
+    _, port = _start_server(_ImagePolicy())
+    client = _websocket_client_policy.WebsocketClientPolicy("127.0.0.1", port, image_codec="jpeg")
+    assert "jpeg" in client.get_server_metadata()[image_codec.CODECS_METADATA_KEY]
+
+    result = client.infer({"image": np.full((224, 224, 3), 100, dtype=np.uint8)})
+    assert tuple(result["image_shape"]) == (224, 224, 3)
+    assert abs(result["image_mean"] - 100) < 1
+    assert "decode_ms" in result["server_timing"]
+    assert result["client_timing"]["request_bytes"] < 224 * 224 * 3 / 10
@@ -19,6 +19,10 @@ def resize_with_pad(
     """Replicates tf.image.resize_with_pad. Resizes an image to a target height and width without distortion
     by padding with black. If the image is float32, it must be in the range [-1, 1].
     """
+    if tuple(images.shape[-3:-1]) == (height, width):
+        # Nothing to do, e.g. for frames that were already resized when building a frame cache.
+        return images
+
     has_batch_dim = images.ndim == 4
     if not has_batch_dim:
         images = images[None]  # type: ignore
@@ -99,6 +99,10 @@ class DataConfig:
     # If true, will use the LeRobot dataset task to define the prompt.
     prompt_from_task: bool = False
 
+    # If set, samples are served from a frame cache built with `scripts/build_frame_cache.py` instead of being decoded
+    # from the LeRobot dataset.
+    frame_cache_dir: str | None = None
+
     # Only used for RLDS data loader (ie currently only used for DROID).
     rlds_data_dir: str | None = None
     # Action space for DROID dataset.
@@ -180,6 +184,8 @@ class DataConfigFactory(abc.ABC):
     assets: AssetsConfig = dataclasses.field(default_factory=AssetsConfig)
     # Base config that will be updated by the factory.
     base_config: tyro.conf.Suppress[DataConfig | None] = None
+    # Directory of a frame cache built with `scripts/build_frame_cache.py`. If set, it replaces the LeRobot dataset.
+    frame_cache_dir: str | None = None
 
     @abc.abstractmethod
     def create(self, assets_dirs: pathlib.Path, model_config: _model.BaseModelConfig) -> DataConfig:
@@ -192,6 +198,7 @@ class DataConfigFactory(abc.ABC):
             self.base_config or DataConfig(),
             repo_id=repo_id,
             asset_id=asset_id,
+            frame_cache_dir=self.frame_cache_dir,
             norm_stats=self._load_norm_stats(epath.Path(self.assets.assets_dir or assets_dirs), asset_id),
             use_quantile_norm=model_config.model_type != ModelType.PI0,
         )
@@ -627,6 +634,9 @@ class TrainConfig:
     # Number of workers to use for the data loader. Increasing this number will speed up data loading but
     # will increase memory and CPU usage.
     num_workers: int = 2
+    # Number of batches that are prefetched to device by a background thread during JAX training. Set to 0 to load
+    # batches synchronously.
+    prefetch_batches: int = 2
     # Number of train steps (batches) to run.
     num_train_steps: int = 30_000
 
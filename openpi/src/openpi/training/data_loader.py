@@ -2,6 +2,9 @@ from collections.abc import Iterator, Sequence
 import logging
 import multiprocessing
 import os
+import queue
+import threading
+import time
 import typing
 from typing import Literal, Protocol, SupportsIndex, TypeVar
 
@@ -14,6 +17,7 @@ import torch
 import openpi.models.model as _model
 import openpi.training.config as _config
 from openpi.training.droid_rlds_dataset import DroidRldsDataset
+import openpi.training.frame_cache as _frame_cache
 import openpi.transforms as _transforms
 
 T_co = TypeVar("T_co", covariant=True)
@@ -137,6 +141,14 @@ def create_torch_dataset(
     if repo_id == "fake":
         return FakeDataset(model_config, num_samples=1024)
 
+    if (frame_cache_dir := getattr(data_config, "frame_cache_dir", None)) is not None:
+        cached_dataset = _frame_cache.CachedLeRobotDataset(
+            frame_cache_dir, action_horizon, data_config.action_sequence_keys
+        )
+        if data_config.prompt_from_task:
+            return TransformedDataset(cached_dataset, [_transforms.PromptFromLeRobotTask(cached_dataset.tasks)])
+        return cached_dataset
+
     dataset_meta = lerobot_dataset.LeRobotDatasetMetadata(repo_id)
     dataset = lerobot_dataset.LeRobotDataset(
         data_config.repo_id,
@@ -538,3 +550,79 @@ class DataLoaderImpl(DataLoader):
     def __iter__(self):
         for batch in self._data_loader:
             yield _model.Observation.from_dict(batch), batch["actions"]
+
+
+class PrefetchIterator(Iterator[T_co]):
+    """Keeps `size` batches ready on device (plus the one being produced), filled by a background thread.
+
+    Batches produced by the data loaders are already sharded JAX arrays, but collation and the host-to-device transfer
+    happen when the next batch is requested. Running the wrapped iterator in a background thread (and waiting for the
+    transfer to complete there) takes both off the critical path of the training loop. With `size=0` the iterator is
+    consumed synchronously.
+
+    The time spent waiting for data in `__next__` is accumulated and can be read with `pop_wait_time`.
+    """
+
+    _DONE = object()
+
+    def __init__(self, iterator: Iterator[T_co], size: int = 2):
+        self._iterator = iterator
+        self._size = size
+        self._wait_time = 0.0
+        self._error: BaseException | None = None
+        self._stop = threading.Event()
+        self._queue: queue.Queue = queue.Queue(maxsize=max(size, 1))
+        self._thread = None
+        if size > 0:
+            self._thread = threading.Thread(target=self._worker, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def _worker(self) -> None:
+        try:
+            for batch in self._iterator:
+                # Wait for the transfer here so that queued batches are resident on device.
+                jax.block_until_ready(batch)
+                if not self._put(batch):
+                    return
+        except BaseException as e:
+            self._error = e
+        self._put(self._DONE)
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self) -> "PrefetchIterator[T_co]":
+        return self
+
+    def __next__(self) -> T_co:
+        start = time.perf_counter()
+        try:
+            if self._thread is None:
+                return next(self._iterator)
+            item = self._queue.get()
+            if item is self._DONE:
+                # Keep returning the sentinel so that repeated calls behave consistently.
+                self._queue.put(self._DONE)
+                if self._error is not None:
+                    raise self._error
+                raise StopIteration
+            return item
+        finally:
+            self._wait_time += time.perf_counter() - start
+
+    def pop_wait_time(self) -> float:
+        """Returns the time (in seconds) spent waiting for data since the last call."""
+        wait_time, self._wait_time = self._wait_time, 0.0
+        return wait_time
+
+    def close(self) -> None:
+        """Stops the background thread. Batches that were already prefetched are dropped."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -1,6 +1,7 @@
 import dataclasses
 
 import jax
+import pytest
 
 from openpi.models import pi0_config
 from openpi.training import config_init_pi05_piper_ok as _config
@@ -82,3 +83,30 @@ def test_with_real_dataset():
 
     for _, actions in batches:
         assert actions.shape == (config.batch_size, config.model.action_horizon, config.model.action_dim)
+
+
+def test_prefetch_iterator():
+    config = pi0_config.Pi0Config(action_dim=24, action_horizon=50, max_token_len=48)
+    dataset = _data_loader.FakeDataset(config, 16)
+    loader = _data_loader.TorchDataLoader(dataset, local_batch_size=4, num_batches=5)
+
+    for size in (0, 2):
+        data_iter = _data_loader.PrefetchIterator(iter(loader), size)
+        batches = list(data_iter)
+        assert len(batches) == 5
+        for batch in batches:
+            assert all(x.shape[0] == 4 for x in jax.tree.leaves(batch))
+        assert data_iter.pop_wait_time() >= 0
+        assert data_iter.pop_wait_time() == 0
+        data_iter.close()
+
+
+def test_prefetch_iterator_propagates_errors():
+    def generate():
+        yield 1
+        raise ValueError("broken")
+
+    data_iter = _data_loader.PrefetchIterator(generate(), 2)
+    assert next(data_iter) == 1
+    with pytest.raises(ValueError, match="broken"):
+        next(data_iter)
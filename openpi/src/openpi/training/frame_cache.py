@@ -0,0 +1,203 @@
+"""Pre-decoded frame cache for LeRobot datasets.
+
+`LeRobotDataset` decodes every camera frame (often from video) at full resolution for each sample, and the model
+transforms then resize it to the model resolution again in every epoch. `build_frame_cache` does this work once: all
+camera frames are written at model resolution into memory-mapped uint8 arrays, next to the low-dimensional features
+(state, actions, indices, ...) of every frame. `CachedLeRobotDataset` serves samples from the cache using plain
+slicing, including the action windows that `LeRobotDataset` produces through `delta_timestamps`.
+
+Cache layout (one `.npy` file per feature, all indexed by the global frame index):
+    meta.json                   Feature names, shapes and dtypes, fps, tasks and the image resolution.
+    <image key>.npy             uint8 [N, C, H, W] camera frames, resized (with padding) to the model resolution.
+    <feature key>.npy           All other numeric features, [N, ...].
+    episode_end.npy             int64 [N], exclusive end index of the episode that each frame belongs to.
+"""
+
+from collections.abc import Sequence
+import json
+import logging
+import pathlib
+import shutil
+from typing import SupportsIndex
+
+import lerobot.common.datasets.lerobot_dataset as lerobot_dataset
+import numpy as np
+import torch
+import tqdm_loggable.auto as tqdm
+
+from openpi.shared import image_tools
+import openpi.shared.download as _download
+
+logger = logging.getLogger("openpi")
+
+_META_FILE = "meta.json"
+_EPISODE_END_FILE = "episode_end.npy"
+_VERSION = 1
+
+
+def default_cache_dir(repo_id: str, resolution: tuple[int, int]) -> pathlib.Path:
+    height, width = resolution
+    return _download.get_cache_dir() / "frame_cache" / repo_id / f"{height}x{width}"
+
+
+def _to_uint8_frames(frames: torch.Tensor, resolution: tuple[int, int]) -> np.ndarray:
+    """Converts a batch of [B, C, H, W] frames to uint8 at the given resolution.
+
+    Matches what the policy input transforms and `ResizeImages` do to every sample, so that serving the cached frames
+    is equivalent to decoding them on the fly.
+    """
+    frames = frames.numpy()
+    if np.issubdtype(frames.dtype, np.floating):
+        frames = (255 * frames).astype(np.uint8)
+    if frames.shape[2:] != tuple(resolution):
+        frames = np.asarray(image_tools.resize_with_pad(frames.transpose(0, 2, 3, 1), *resolution))
+        frames = frames.transpose(0, 3, 1, 2)
+    return frames
+
+
+def _episode_end(episode_index: np.ndarray) -> np.ndarray:
+    """Returns, for every frame, the exclusive end of its episode. Frames of an episode must be contiguous."""
+    boundaries = np.flatnonzero(np.diff(episode_index)) + 1
+    ends = np.append(boundaries, len(episode_index))
+    starts = np.insert(boundaries, 0, 0)
+    return np.repeat(ends, ends - starts).astype(np.int64)
+
+
+def build_frame_cache(
+    repo_id: str,
+    cache_dir: pathlib.Path | str | None = None,
+    *,
+    resolution: tuple[int, int] = (224, 224),
+    batch_size: int = 64,
+    num_workers: int = 8,
+    overwrite: bool = False,
+) -> pathlib.Path:
+    """Decodes all frames of a LeRobot dataset once and writes them to a frame cache. Returns the cache directory."""
+    cache_dir = pathlib.Path(cache_dir) if cache_dir is not None else default_cache_dir(repo_id, resolution)
+    if (cache_dir / _META_FILE).exists():
+        if not overwrite:
+            logger.info(f"Frame cache already exists at {cache_dir}")
+            return cache_dir
+        shutil.rmtree(cache_dir)
+
+    dataset_meta = lerobot_dataset.LeRobotDatasetMetadata(repo_id)
+    dataset = lerobot_dataset.LeRobotDataset(repo_id)
+    image_keys = set(dataset_meta.camera_keys)
+    num_frames = len(dataset)
+
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers, drop_last=False
+    )
+
+    # Write to a temporary directory so that an interrupted build is never mistaken for a complete cache.
+    tmp_dir = cache_dir.with_name(cache_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    arrays: dict[str, np.memmap] = {}
+    start = 0
+    for batch in tqdm.tqdm(loader, total=len(loader), desc="Building frame cache"):
+        columns = {}
+        for key, value in batch.items():
+            if key in image_keys:
+                columns[key] = _to_uint8_frames(value, resolution)
+            elif isinstance(value, torch.Tensor):
+                columns[key] = value.numpy()
+        for key, column in columns.items():
+            if key not in arrays:
+                arrays[key] = np.lib.format.open_memmap(
+                    tmp_dir / f"{key}.npy", mode="w+", dtype=column.dtype, shape=(num_frames, *column.shape[1:])
+                )
+            arrays[key][start : start + len(column)] = column
+        start += len(next(iter(columns.values())))
+
+    for array in arrays.values():
+        array.flush()
+    np.save(tmp_dir / _EPISODE_END_FILE, _episode_end(np.asarray(arrays["episode_index"])))
+
+    meta = {
+        "version": _VERSION,
+        "repo_id": repo_id,
+        "fps": dataset_meta.fps,
+        "num_frames": num_frames,
+        "resolution": list(resolution),
+        "image_keys": sorted(image_keys),
+        "features": {key: {"dtype": str(a.dtype), "shape": list(a.shape[1:])} for key, a in arrays.items()},
+        "tasks": {str(k): v for k, v in dataset_meta.tasks.items()},
+    }
+    (tmp_dir / _META_FILE).write_text(json.dumps(meta, indent=2))
+    del arrays
+
+    tmp_dir.rename(cache_dir)
+    logger.info(f"Wrote frame cache with {num_frames} frames to {cache_dir}")
+    return cache_dir
+
+
+class CachedLeRobotDataset:
+    """Serves LeRobot samples from a frame cache written by `build_frame_cache`.
+
+    Samples have the same keys as those of `LeRobotDataset` with `delta_timestamps` set for `action_sequence_keys`.
+    Camera frames are uint8 [C, H, W] at the cache resolution instead of float [0, 1] at the original resolution.
+    """
+
+    def __init__(self, cache_dir: pathlib.Path | str, action_horizon: int, action_sequence_keys: Sequence[str]):
+        self._cache_dir = pathlib.Path(cache_dir)
+        if not (self._cache_dir / _META_FILE).exists():
+            raise FileNotFoundError(
+                f"No frame cache found at {self._cache_dir}. Run `scripts/build_frame_cache.py` to create it."
+            )
+        self._meta = json.loads((self._cache_dir / _META_FILE).read_text())
+        if self._meta["version"] != _VERSION:
+            raise ValueError(f"Unsupported frame cache version {self._meta['version']}, please rebuild the cache.")
+
+        missing = set(action_sequence_keys) - set(self._meta["features"])
+        if missing:
+            raise ValueError(f"Action sequence keys {sorted(missing)} not found in the frame cache.")
+        self._action_sequence_keys = tuple(action_sequence_keys)
+        self._window = np.arange(action_horizon)
+        # Opened lazily so that the dataset can be sent to data loader workers without copying the arrays.
+        self._arrays: dict[str, np.ndarray] | None = None
+        self._episode_end: np.ndarray | None = None
+
+    @property
+    def tasks(self) -> dict[int, str]:
+        return {int(k): v for k, v in self._meta["tasks"].items()}
+
+    @property
+    def resolution(self) -> tuple[int, int]:
+        return tuple(self._meta["resolution"])
+
+    def _open(self) -> dict[str, np.ndarray]:
+        if self._arrays is None:
+            self._arrays = {
+                key: np.load(self._cache_dir / f"{key}.npy", mmap_mode="r") for key in self._meta["features"]
+            }
+            self._episode_end = np.load(self._cache_dir / _EPISODE_END_FILE)
+        return self._arrays
+
+    def __getstate__(self):
+        return {**self.__dict__, "_arrays": None, "_episode_end": None}
+
+    def __getitem__(self, index: SupportsIndex) -> dict:
+        index = index.__index__()
+        arrays = self._open()
+
+        # Frames past the end of the episode repeat the last frame, like in LeRobotDataset.
+        window = index + self._window
+        is_pad = window >= self._episode_end[index]
+        window = np.minimum(window, self._episode_end[index] - 1)
+
+        item = {}
+        for key, array in arrays.items():
+            if key in self._action_sequence_keys:
+                item[key] = array[window]
+                item[f"{key}_is_pad"] = is_pad
+            else:
+                item[key] = np.array(array[index])
+        if "task_index" in item:
+            item["task"] = self._meta["tasks"][str(int(item["task_index"]))]
+        return item
+
+    def __len__(self) -> int:
+        return self._meta["num_frames"]
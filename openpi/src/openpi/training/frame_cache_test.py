@@ -0,0 +1,63 @@
+import numpy as np
+import torch
+
+import openpi.training.frame_cache as _frame_cache
+
+_EPISODE_LENGTHS = (3, 4)
+_TASKS = {0: "pick", 1: "place"}
+
+
+class _FakeMetadata:
+    fps = 10
+    camera_keys = ("observation.images.top",)
+    tasks = _TASKS
+
+    def __init__(self, repo_id: str):
+        pass
+
+
+class _FakeLeRobotDataset(torch.utils.data.Dataset):
+    def __init__(self, repo_id: str):
+        self._episode_index = np.repeat(np.arange(len(_EPISODE_LENGTHS)), _EPISODE_LENGTHS)
+
+    def __len__(self):
+        return len(self._episode_index)
+
+    def __getitem__(self, index: int) -> dict:
+        episode = int(self._episode_index[index])
+        return {
+            "observation.images.top": torch.full((3, 48, 64), index / 10),
+            "observation.state": torch.tensor([index, -index], dtype=torch.float32),
+            "actions": torch.tensor([index, 2 * index], dtype=torch.float32),
+            "episode_index": torch.tensor(episode),
+            "index": torch.tensor(index),
+            "task_index": torch.tensor(episode),
+            "task": _TASKS[episode],
+        }
+
+
+def test_frame_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(_frame_cache.lerobot_dataset, "LeRobotDatasetMetadata", _FakeMetadata)
+    monkeypatch.setattr(_frame_cache.lerobot_dataset, "LeRobotDataset", _FakeLeRobotDataset)
+
+    cache_dir = _frame_cache.build_frame_cache(
+        "fake/repo", tmp_path / "cache", resolution=(32, 32), batch_size=2, num_workers=0
+    )
+    dataset = _frame_cache.CachedLeRobotDataset(cache_dir, action_horizon=3, action_sequence_keys=("actions",))
+
+    assert len(dataset) == sum(_EPISODE_LENGTHS)
+    assert dataset.tasks == _TASKS
+
+    # Second frame of the first episode: the action window runs past the end of the episode and is padded.
+    item = dataset[1]
+    assert item["observation.images.top"].shape == (3, 32, 32)
+    assert item["observation.images.top"].dtype == np.uint8
+    np.testing.assert_array_equal(item["observation.state"], [1, -1])
+    np.testing.assert_array_equal(item["actions"], [[1, 2], [2, 4], [2, 4]])
+    np.testing.assert_array_equal(item["actions_is_pad"], [False, False, True])
+    assert item["task"] == "pick"
+
+    item = dataset[3]
+    np.testing.assert_array_equal(item["actions"][:, 0], [3, 4, 5])
+    assert not item["actions_is_pad"].any()
+    assert item["task"] == "place"